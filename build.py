@@ -187,7 +187,13 @@ def get_active_test_filepaths():
         'tests/test_globalization.py '
         'tests/test_interactive_mode.py '
         'tests/test_noninteractive_mode.py '
-        'tests/test_special.py'
+        'tests/test_special.py '
+        'tests/test_outputwriter.py '
+        'tests/test_mssqlexport.py '
+        'tests/test_nameindex.py '
+        'tests/test_daemon.py '
+        'tests/test_startupprofile.py '
+        'tests/parseutils/test_splitter.py'
     )
 
 
@@ -0,0 +1,108 @@
+"""
+    On-demand loading of column metadata.
+
+    In lazy column mode the completion refresher only loads the names of tables and views. The
+    columns of a relation are queried in a background thread the first time a query refers to
+    it, and only the columns of the most recently used relations are kept.
+"""
+from collections import OrderedDict
+from queue import Queue
+import logging
+import threading
+
+from mssqlcli.mssqlcompleter import MssqlCompleter
+from mssqlcli.packages.parseutils.meta import ColumnMetadata
+
+logger = logging.getLogger(u'mssqlcli.columnloader')
+
+DEFAULT_MAX_RELATIONS = 1000
+
+
+class ColumnLoader(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Loads the columns of tables and views on first use, keeping those of the max_relations
+        most recently used relations. Relations are identified by their kind ('tables' or
+        'views'), and escaped schema and relation names, as in MssqlCompleter.dbmetadata.
+    """
+
+    def __init__(self, mssqlcliclient, max_relations=DEFAULT_MAX_RELATIONS):
+        self.mssqlcliclient = mssqlcliclient
+        self.max_relations = max_relations
+        # Columns by relation, least recently used first.
+        self.columns = OrderedDict()
+        self.pending = set()
+        self.requests = Queue()
+        self.lock = threading.Lock()
+        self.loader_thread = None
+        self.closed = False
+
+    def get_columns(self, kind, schema, relname):
+        """
+            Returns the {column_name: ColumnMetadata} of a relation, or None if they are not
+            loaded yet, in which case they are loaded in the background.
+        """
+        key = (kind, schema, relname)
+        with self.lock:
+            columns = self.columns.pop(key, None)
+            if columns is not None:
+                self.columns[key] = columns
+                return columns
+
+            if key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+                self._start()
+        return None
+
+    def clear(self):
+        """ Drops the loaded columns, so they are loaded again on next use. """
+        with self.lock:
+            self.columns.clear()
+
+    def close(self):
+        """
+            Stops the background thread once the pending relations are loaded, then releases
+            the connection of the client to its pool.
+        """
+        with self.lock:
+            self.closed = True
+            started = self.loader_thread is not None
+        if started:
+            self.requests.put(None)
+        else:
+            self.mssqlcliclient.release_connection()
+
+    def _start(self):
+        if self.loader_thread is None and not self.closed:
+            self.loader_thread = threading.Thread(target=self._load_columns,
+                                                  name=u'column_loader')
+            self.loader_thread.daemon = True
+            self.loader_thread.start()
+
+    def _load_columns(self):
+        unescape = MssqlCompleter.unescape_name
+        escape = MssqlCompleter.escape_name
+
+        while True:
+            key = self.requests.get()
+            if key is None:
+                self.mssqlcliclient.release_connection()
+                return
+
+            _, schema, relname = key
+            columns = OrderedDict()
+            try:
+                for colname, datatype, default in self.mssqlcliclient.get_relation_columns(
+                        unescape(schema), unescape(relname)):
+                    colname = escape(colname)
+                    columns[colname] = ColumnMetadata(name=colname, datatype=datatype,
+                                                      has_default=default, default=default)
+            except Exception as e:     # pylint: disable=broad-except
+                logger.error(u'Loading the columns of %s.%s failed: %s', schema, relname, e)
+
+            with self.lock:
+                self.pending.discard(key)
+                self.columns[key] = columns
+                while len(self.columns) > self.max_relations:
+                    self.columns.popitem(last=False)
@@ -1,7 +1,10 @@
 from collections import OrderedDict
+from queue import Empty, Queue
 import logging
 import threading
 import mssqlcli.decorators as decorators
+from .columnloader import DEFAULT_MAX_RELATIONS, ColumnLoader
+from .metadatacache import METADATA_METHODS, COLUMN_METHODS, CachedMetadata, MetadataRecorder
 from .mssqlcompleter import MssqlCompleter
 
 logger = logging.getLogger(u'mssqlcli.completion_refresher')
@@ -11,9 +14,13 @@ class CompletionRefresher:
 
     refreshers = OrderedDict()
 
-    def __init__(self):
+    def __init__(self, metadata_cache=None, connections=1):
         self._completer_thread = None
         self._restart_refresh = threading.Event()
+        # MetadataCache the refreshed metadata is read from and written to, if any.
+        self.metadata_cache = metadata_cache
+        # Number of connections the metadata is queried on in parallel.
+        self.connections = connections
 
     def refresh(self, mssqcliclient, callbacks, history=None,
                 settings=None):
@@ -41,6 +48,38 @@ class CompletionRefresher:
         return [(None, None, None,
                  'Auto-completion refresh started in the background.')]
 
+    def refresh_delta(self, mssqcliclient, completer, completer_lock, callbacks,
+                      settings=None):
+        """
+        Updates a copy of the metadata of an existing MssqlCompleter with the
+        tables and views created, altered or dropped since it was refreshed, in
+        a background thread. The completer itself is left as is, so it can be
+        used for completions meanwhile.
+
+        mssqlcliclient - used to extract the credentials to connect
+                   to the database.
+        completer - MssqlCompleter to update.
+        completer_lock - Lock held while the completer is copied.
+        callbacks - A function or a list of functions to call after the thread
+                    has completed the refresh. The updated copy of the
+                    completer is passed in as an argument to each callback. If
+                    the changes cannot be found, a full refresh passes a new
+                    completer instead.
+        settings - dict of settings for the completer object of a full refresh.
+        """
+        if self.is_refreshing():
+            self._restart_refresh.set()
+            return [(None, None, None, 'Auto-completion refresh restarted.')]
+
+        self._completer_thread = threading.Thread(
+            target=self._bg_refresh_delta,
+            args=(mssqcliclient, completer, completer_lock, callbacks, settings),
+            name='completion_refresh')
+        self._completer_thread.setDaemon(True)
+        self._completer_thread.start()
+        return [(None, None, None,
+                 'Auto-completion refresh started in the background.')]
+
     def is_refreshing(self):
         return self._completer_thread and self._completer_thread.is_alive()
 
@@ -55,15 +94,27 @@ class CompletionRefresher:
         if not owner_uri:
             # If we were unable to connect, do not break the experience for the user.
             # Return nothing, smart completion can maintain the keywords and functions completions.
-            logger.error(u'Completion refresher connection failure.'.join(error_messages))
+            logger.error(u'Completion refresher connection failure: %s', u' '.join(error_messages))
             return
         # If callbacks is a single function then push it into a list.
         if callable(callbacks):
             callbacks = [callbacks]
 
+        methods = METADATA_METHODS
+        if completer.lazy_columns:
+            methods = tuple(name for name in methods if name not in COLUMN_METHODS)
+
         while 1:
+            metadata_source = self._get_metadata_source(executor, methods)
+            if metadata_source is None:
+                # The refresh was restarted while the metadata was queried.
+                self._restart_refresh.clear()
+                continue
+
+            # Taken first, so changes made during the refresh are found by the next delta refresh.
+            refresh_relation_objects(completer, metadata_source)
             for refresh in self.refreshers.values():
-                refresh(completer, executor)
+                refresh(completer, metadata_source)
                 if self._restart_refresh.is_set():
                     self._restart_refresh.clear()
                     break
@@ -76,6 +127,19 @@ class CompletionRefresher:
             # break statement.
             continue
 
+        if isinstance(metadata_source, MetadataRecorder) \
+                and metadata_source.is_complete(methods):
+            server, database = self._get_cache_key(executor)
+            self.metadata_cache.save(server, database, metadata_source.version,
+                                     metadata_source.metadata)
+
+        if completer.lazy_columns:
+            # The refresher's connection is kept to load columns, until the loader is closed.
+            completer.column_loader = ColumnLoader(
+                executor, settings.get('column_cache_size', DEFAULT_MAX_RELATIONS))
+        else:
+            executor.release_connection()
+
         # Load history into mssqlcompleter so it can learn user preferences
         n_recent = 100
         if history:
@@ -85,6 +149,178 @@ class CompletionRefresher:
         for callback in callbacks:
             callback(completer)
 
+    def _bg_refresh_delta(self, mssqlcliclient, completer, completer_lock, callbacks,
+                          settings=None):
+        if callable(callbacks):
+            callbacks = [callbacks]
+
+        try:
+            updated_completer = self._apply_delta(mssqlcliclient, completer, completer_lock)
+        except Exception as e:   # pylint: disable=broad-except
+            logger.error(u'Completion delta refresh failure: %s', e)
+            updated_completer = None
+
+        # Fall back to a full refresh, which is also restarted by a refresh requested meanwhile.
+        if updated_completer is None or self._restart_refresh.is_set():
+            self._restart_refresh.clear()
+            self._bg_refresh(mssqlcliclient, callbacks, settings=settings)
+            return
+
+        mssqlcliclient.release_connection()
+        for callback in callbacks:
+            callback(updated_completer)
+
+    @staticmethod
+    def _apply_delta(executor, completer, completer_lock):
+        """
+        Queries the metadata changed since the completer was refreshed, and
+        returns a copy of the completer updated with it, or None if the changes
+        cannot be found.
+        """
+        since = completer.metadata_modified
+        if since is None:
+            return None
+
+        owner_uri, error_messages = executor.connect_to_database()
+        if not owner_uri:
+            logger.error(u'Completion refresher connection failure: %s', u' '.join(error_messages))
+            return None
+
+        with completer_lock:
+            completer = completer.clone()
+
+        known_objects = completer.relation_objects
+        changed_objects = list(executor.get_relation_changes(since))
+
+        # Objects were dropped if some of the known or changed objects no longer exist.
+        object_ids = set(known_objects).union(row[0] for row in changed_objects)
+        dropped_ids = set()
+        if executor.get_relation_count() != len(object_ids):
+            dropped_ids = object_ids - executor.get_relation_object_ids()
+
+        columns, foreign_keys = [], []
+        if not completer.lazy_columns:
+            columns = list(executor.get_relation_column_changes(since))
+            foreign_keys = list(executor.get_foreign_key_changes(since))
+        schemas = executor.get_schemas()
+        datatypes = list(executor.get_user_defined_types())
+        databases = executor.get_databases()
+
+        # Remove the dropped and changed objects, including changed ones whose name
+        # or schema was altered, and add the changed objects back.
+        removed = [known_objects[object_id]
+                   for object_id in dropped_ids.union(row[0] for row in changed_objects)
+                   if object_id in known_objects]
+        for kind in (u'tables', u'views'):
+            completer.remove_relations(
+                [(schema, relname) for relname_kind, schema, relname in removed
+                 if relname_kind == kind], kind=kind)
+        for object_id in dropped_ids:
+            known_objects.pop(object_id, None)
+
+        completer.update_schemas(schemas)
+        for kind in (u'tables', u'views'):
+            completer.extend_relations(
+                [(schema, relname) for _, schema, relname, relname_kind, _ in changed_objects
+                 if relname_kind == kind], kind=kind)
+            completer.extend_columns(
+                [row[:5] for row in columns if row[5] == kind], kind=kind)
+        completer.extend_foreignkeys(foreign_keys)
+        completer.extend_relation_objects(changed_objects)
+        if completer.column_loader:
+            completer.column_loader.clear()
+
+        for schema_datatypes in completer.dbmetadata[u'datatypes'].values():
+            schema_datatypes.clear()
+        completer.extend_datatypes(datatypes)
+        completer.databases = []
+        completer.extend_database_names(databases)
+
+        logger.info(u'Completion metadata updated with %s changed and %s dropped objects.',
+                    len(changed_objects), len(dropped_ids))
+        return completer
+
+    def _get_metadata_source(self, executor, methods):
+        """
+        Returns the cached metadata if it is up to date, the metadata queried in parallel
+        if several connections are used, or the executor, recording the metadata queried
+        through it if the cache is enabled. Returns None if the refresh was restarted.
+
+        methods - names of the metadata methods the refreshers call.
+        """
+        version = None
+        if self.metadata_cache:
+            version = executor.get_metadata_version()
+            if version:
+                server, database = self._get_cache_key(executor)
+                metadata = self.metadata_cache.load(server, database, version)
+                if metadata is not None and all(name in metadata for name in methods):
+                    logger.info(u'Completion metadata loaded from cache.')
+                    return CachedMetadata(metadata)
+
+        if self.connections > 1:
+            metadata = self._query_metadata(executor, methods)
+            if metadata is None:
+                return None
+            if version and all(name in metadata for name in methods):
+                server, database = self._get_cache_key(executor)
+                self.metadata_cache.save(server, database, version, metadata)
+            return CachedMetadata(metadata)
+
+        return MetadataRecorder(executor, version) if version else executor
+
+    def _query_metadata(self, executor, methods):
+        """
+        Runs the metadata methods on the executor and on clones of it, each
+        connection taking the next method once it is done with the previous
+        one. Returns the results by method name, or None if the refresh was
+        restarted.
+        """
+        pending = Queue()
+        for name in methods:
+            pending.put(name)
+        metadata = {}
+
+        def query_pending(mssqlcliclient):
+            if mssqlcliclient is not executor:
+                owner_uri, error_messages = mssqlcliclient.connect_to_database()
+                if not owner_uri:
+                    # The other connections take over the pending methods.
+                    logger.error(u'Completion refresher connection failure: %s',
+                                 u' '.join(error_messages))
+                    return
+
+            while not self._restart_refresh.is_set():
+                try:
+                    name = pending.get_nowait()
+                except Empty:
+                    break
+                try:
+                    metadata[name] = list(getattr(mssqlcliclient, name)() or ())
+                except Exception as e:   # pylint: disable=broad-except
+                    logger.error(u'Completion metadata query %s failure: %s', name, e)
+
+            if mssqlcliclient is not executor:
+                mssqlcliclient.release_connection()
+
+        threads = [threading.Thread(target=query_pending, args=(mssqlcliclient,),
+                                    name='completion_refresh_query')
+                   for mssqlcliclient in [executor] + [executor.clone()
+                                                       for _ in range(self.connections - 1)]]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._restart_refresh.is_set():
+            return None
+        return metadata
+
+    @staticmethod
+    def _get_cache_key(executor):
+        return executor.server_name, executor.connected_database or executor.database or u''
+
 
 def refresher(name, refreshers=CompletionRefresher.refreshers):
     """Decorator to populate the dictionary of refreshers with the current
@@ -96,6 +332,11 @@ def refresher(name, refreshers=CompletionRefresher.refreshers):
     return wrapper
 
 
+@decorators.suppress_all_exceptions()
+def refresh_relation_objects(completer, mssqlcliclient):
+    completer.extend_relation_objects(mssqlcliclient.get_relation_objects())
+
+
 @refresher('schemas')
 @decorators.suppress_all_exceptions()
 def refresh_schemas(completer, mssqlcliclient):
@@ -106,15 +347,17 @@ def refresh_schemas(completer, mssqlcliclient):
 @decorators.suppress_all_exceptions()
 def refresh_tables(completer, mssqlcliclient):
     completer.extend_relations(mssqlcliclient.get_tables(), kind='tables')
-    completer.extend_columns(mssqlcliclient.get_table_columns(), kind='tables')
-    completer.extend_foreignkeys(mssqlcliclient.get_foreign_keys())
+    if not completer.lazy_columns:
+        completer.extend_columns(mssqlcliclient.get_table_columns(), kind='tables')
+        completer.extend_foreignkeys(mssqlcliclient.get_foreign_keys())
 
 
 @refresher('views')
 @decorators.suppress_all_exceptions()
 def refresh_views(completer, mssqlcliclient):
     completer.extend_relations(mssqlcliclient.get_views(), kind='views')
-    completer.extend_columns(mssqlcliclient.get_view_columns(), kind='views')
+    if not completer.lazy_columns:
+        completer.extend_columns(mssqlcliclient.get_view_columns(), kind='views')
 
 
 @refresher('databases')
@@ -0,0 +1,338 @@
+"""
+    Daemon serving non-interactive invocations of mssql-cli.
+
+    mssql-cli --daemon runs a long-lived process owning a SqlToolsClient. mssql-cli
+    --use-daemon forwards the options of a -Q or -i invocation over a Unix socket, along with
+    the input file as it is read, and writes the output the daemon streams back, so it does
+    not start a service process. Each invocation opens its own connection, which is closed
+    when it ends, unless the daemon reuses connections: then the session is reset and the
+    connection is kept for the next invocation connecting with the same options. The daemon
+    requires Python 3 and Unix sockets.
+
+    Messages are JSON objects, one per line. The client sends {"options": ...}, then
+    {"input": text} for each chunk of the input file, then {"end": true}. The daemon sends
+    {"out": text} and {"err": text} for the output of the invocation, then {"exit": code}.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+from argparse import Namespace
+from contextlib import contextmanager
+
+from mssqlcli.config import config_location, ensure_dir_exists
+
+logger = logging.getLogger(u'mssqlcli.daemon')
+
+# Characters of the input file sent per message.
+INPUT_CHUNK_SIZE = 64 * 1024
+
+
+def get_socket_path():
+    return config_location() + u'daemon.sock'
+
+
+def is_supported():
+    return sys.version_info >= (3,) and hasattr(socket, 'AF_UNIX')
+
+
+def forward_to_daemon(options, socket_path=None):
+    """
+        Runs a non-interactive invocation on the daemon, writing its output to the output file
+        or stdout. Returns the exit code of the invocation, or None if no daemon is listening.
+    """
+    if not is_supported():
+        return None
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path or get_socket_path())
+    except OSError:
+        connection.close()
+        return None
+
+    # The input and output files are read and written here, the daemon only sees their text.
+    request = dict(vars(options), output_file=False)
+    with connection, connection.makefile('r', encoding='utf-8') as responses, \
+            connection.makefile('w', encoding='utf-8') as requests, \
+            _open_or_default(options.input_file, 'r', io.StringIO()) as input_file, \
+            _open_or_default(options.output_file, 'w', sys.stdout) as output_file:
+        writer = _MessageWriter(requests)
+        writer.send(options=request)
+
+        # Sent from another thread, so output is read while the daemon still reads the input.
+        def send_input():
+            try:
+                for chunk in iter(lambda: input_file.read(INPUT_CHUNK_SIZE), u''):
+                    writer.send(input=chunk)
+                writer.send(end=True)
+            except (OSError, ValueError) as e:
+                # The daemon ended the invocation before reading all of the input.
+                logger.info(u'Sending input to the daemon stopped: %s', e)
+
+        input_thread = threading.Thread(target=send_input, name=u'daemon_input')
+        input_thread.daemon = True
+        input_thread.start()
+
+        for line in responses:
+            message = json.loads(line)
+            if u'out' in message:
+                output_file.write(message[u'out'])
+            elif u'err' in message:
+                sys.stderr.write(message[u'err'])
+            elif u'exit' in message:
+                return message[u'exit']
+
+    sys.stderr.write(u'The daemon closed the connection.\n')
+    return 1
+
+
+@contextmanager
+def _open_or_default(file_name, mode, default):
+    """ Opens a file if a name is given, else yields the default stream without closing it. """
+    if not file_name:
+        yield default
+        return
+    with open(file_name, mode, encoding='utf-8') as f:
+        yield f
+
+
+class Daemon(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Serves invocations forwarded by forward_to_daemon() on a Unix socket, each in its own
+        thread, on a connection of its own. With reuse_connections, the connection is taken
+        from a pool of the connections of earlier invocations with the same options.
+    """
+
+    def __init__(self, socket_path=None, reuse_connections=False, **sqltoolsclient_args):
+        # pylint: disable=import-outside-toplevel
+        from mssqlcli.mssqlcliclient import ConnectionPool
+
+        self.socket_path = socket_path or get_socket_path()
+        self.sqltoolsclient_args = sqltoolsclient_args
+        self.sqltoolsclient = None
+        self.listener = None
+        self.connection_pool = ConnectionPool() if reuse_connections else None
+
+    def serve_forever(self):
+        """ Listens on the socket until shutdown() is called. """
+        if not is_supported():
+            raise RuntimeError(u'The daemon requires Python 3 and Unix sockets.')
+
+        self.listener = self._listen()
+        try:
+            self.sqltoolsclient = self._start_service()
+            _RoutedStream.install()
+            logger.info(u'Daemon listening on %s', self.socket_path)
+            while True:
+                try:
+                    connection, _ = self.listener.accept()
+                except OSError:
+                    # The listener was closed by shutdown().
+                    break
+
+                request_thread = threading.Thread(target=self._serve, args=(connection,),
+                                                  name=u'daemon_request')
+                request_thread.daemon = True
+                request_thread.start()
+        finally:
+            self._stop()
+
+    def shutdown(self):
+        """ Stops accepting invocations. """
+        if self.listener:
+            try:
+                # Wakes up accept(), which closing the listener alone does not on Linux.
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.listener.close()
+
+    def _listen(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Left behind by a daemon that did not exit cleanly.
+                os.remove(self.socket_path)
+            else:
+                raise RuntimeError(u'A daemon is already listening on {}.'.format(
+                    self.socket_path))
+            finally:
+                probe.close()
+
+        ensure_dir_exists(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user may connect, as invocations carry credentials.
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        listener.listen(socket.SOMAXCONN)
+        return listener
+
+    def _start_service(self):
+        # pylint: disable=import-outside-toplevel
+        from mssqlcli.sqltoolsclient import SqlToolsClient
+        return SqlToolsClient(**self.sqltoolsclient_args)
+
+    def _stop(self):
+        logger.info(u'Daemon stopping.')
+        self.listener.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        # Closes the connections of the service.
+        if self.sqltoolsclient:
+            self.sqltoolsclient.shutdown()
+
+    def _serve(self, connection):
+        with connection, connection.makefile('r', encoding='utf-8') as requests, \
+                connection.makefile('w', encoding='utf-8') as responses:
+            writer = _MessageWriter(responses)
+            try:
+                options = Namespace(**json.loads(requests.readline())[u'options'])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error(u'Invalid request to the daemon: %s', e)
+                return
+
+            _RoutedStream.route(lambda text: writer.send(out=text),
+                                lambda text: writer.send(err=text))
+            try:
+                self.run(options, _InputStream(requests))
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception(u'Invocation failed on the daemon.')
+                exit_code = 1
+                try:
+                    sys.stderr.write(u'{}\n'.format(e))
+                except OSError:
+                    pass
+            finally:
+                _RoutedStream.route(None, None)
+
+            try:
+                writer.send(exit=exit_code)
+            except OSError:
+                logger.info(u'The client left before the invocation ended.')
+
+    def run(self, options, input_stream):
+        """ Runs an invocation on a new or pooled connection. """
+        # pylint: disable=import-outside-toplevel
+        from mssqlcli.mssql_cli import MssqlCli
+        from mssqlcli.mssqlcliclient import MssqlCliClient
+
+        client = MssqlCliClient(options, self.sqltoolsclient)
+        if self.connection_pool:
+            client.connection_pool = self.connection_pool
+        try:
+            mssqlcli = MssqlCli(options, mssqlcliclient=client)
+            mssqlcli.connect_to_database()
+
+            if options.input_file:
+                mssqlcli.execute_query_stream(input_stream)
+            else:
+                mssqlcli.execute_query_to_output(options.query)
+        finally:
+            if self.connection_pool:
+                # Closed instead if the session may keep temporary objects.
+                client.release_connection(reset_session=True)
+            elif client.is_connected:
+                # The next invocation would see the transactions, SET options and temporary
+                # tables this one left.
+                client.disconnect()
+
+
+class _MessageWriter(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """
+        Writes messages to a text stream, one per line, from any thread.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def send(self, **message):
+        line = json.dumps(message) + u'\n'
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+
+class _InputStream(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """
+        Reads the input file of an invocation from its input messages.
+    """
+
+    def __init__(self, requests):
+        self.requests = requests
+        self.ended = False
+
+    def read(self, _size=-1):
+        """ Returns the next chunk of input, of any size, or an empty string at the end. """
+        while not self.ended:
+            line = self.requests.readline()
+            message = json.loads(line) if line else {}
+            if message.get(u'input'):
+                return message[u'input']
+            if u'input' not in message:
+                self.ended = True
+        return u''
+
+
+class _RoutedStream(io.TextIOBase):
+    """
+        Replaces stdout or stderr in the daemon, passing what each request thread writes to the
+        function it routed the stream to, or to the original stream.
+    """
+    _routes = threading.local()
+
+    def __init__(self, name, original):
+        super(_RoutedStream, self).__init__()
+        self.name = name
+        self.original = original
+
+    @property
+    def encoding(self):
+        return u'utf-8'
+
+    @classmethod
+    def install(cls):
+        if not isinstance(sys.stdout, cls):
+            sys.stdout = cls(u'out', sys.stdout)
+        if not isinstance(sys.stderr, cls):
+            sys.stderr = cls(u'err', sys.stderr)
+
+    @classmethod
+    def route(cls, out, err):
+        """ Routes the output of the current thread to functions, or back with None. """
+        cls._routes.out = out
+        cls._routes.err = err
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        # Raising on bytes lets click know this is a text stream.
+        if not isinstance(s, str):
+            raise TypeError(u'write() argument must be str, not {}'.format(type(s).__name__))
+        write = getattr(self._routes, self.name, None)
+        if write is None:
+            return self.original.write(s)
+        if s:
+            write(s)
+        return len(s)
+
+    def flush(self):
+        if getattr(self._routes, self.name, None) is None:
+            self.original.flush()
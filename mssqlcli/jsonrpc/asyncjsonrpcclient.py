@@ -0,0 +1,221 @@
+"""
+    asyncio transport for the SqlToolsService.
+
+    The service runs as an asyncio subprocess and every AsyncJsonRpcClient shares one event loop
+    running in a single background thread, instead of starting a request and a response thread
+    per client. Requires Python 3.8 or later, where subprocesses can be started from a loop that
+    does not run in the main thread.
+"""
+from queue import Queue
+
+import asyncio
+import json
+import logging
+import threading
+
+from mssqlcli.jsonrpc.jsonrpcclient import JsonRpcClient, JsonRpcReader, JsonRpcWriter
+
+logger = logging.getLogger(u'mssqlcli.jsonrpc.asyncjsonrpcclient')
+
+LOOP_THREAD_NAME = u'Json_Rpc_Event_Loop_Thread'
+
+_shared_loop = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_loop():
+    """
+        Returns the event loop shared by all asyncio clients, starting its thread on first use.
+    """
+    global _shared_loop     # pylint: disable=global-statement
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            loop_thread = threading.Thread(
+                target=loop.run_forever,
+                name=LOOP_THREAD_NAME)
+            loop_thread.daemon = True
+            loop_thread.start()
+            _shared_loop = loop
+
+    return _shared_loop
+
+
+class EventIterator:
+    """
+        Async iterator over the events received for an owner uri. Iteration stops when the
+        iterator is closed or the service stops responding.
+    """
+
+    def __init__(self, client, owner_uri):
+        self.client = client
+        self.owner_uri = owner_uri
+        self.queue = asyncio.Queue()
+        client.event_queues[owner_uri] = self.queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self.queue.get()
+        if event is None:
+            self.close()
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        """
+            Stop receiving events. Later events for the owner uri go to the sync facade.
+        """
+        if self.client.event_queues.get(self.owner_uri) is self.queue:
+            del self.client.event_queues[self.owner_uri]
+
+
+class AsyncJsonRpcClient(JsonRpcClient):    # pylint: disable=too-many-instance-attributes
+    """
+        Runs the SqlToolsService as an asyncio subprocess.
+
+        request() and events() are the native API and must be awaited on the client's loop. The
+        JsonRpcClient methods are kept as a sync facade for the request contracts: responses and
+        events nobody awaits are stored in the response map like JsonRpcClient does.
+    """
+
+    def __init__(self, process_args, process_options=None, loop=None):
+        # pylint: disable=super-init-not-called
+        self.process_args = process_args
+        # Other arguments of the subprocess.
+        self.process_options = process_options or {}
+        self.loop = loop or get_shared_loop()
+        self.process = None
+        self.writer = JsonRpcWriter(None)
+
+        # Response map intialized with event queue.
+        self.response_map = {0: Queue()}
+        self.exception_queue = Queue()
+        # Notified whenever a response, event or exception is enqueued.
+        self.response_available = threading.Condition()
+        # Futures of requests awaited through request(), by request id.
+        self.pending_requests = {}
+        # Queues of event iterators returned by events(), by owner uri.
+        self.event_queues = {}
+        self.response_task = None
+
+        self.cancel = False
+
+    def start(self):
+        """
+            Starts the SqlToolsService process and listens for its responses on the loop.
+        """
+        self._run(self._start())
+        logger.debug('Async Json Rpc client started.')
+
+    def submit_request(self, method, params, request_id=None):
+        """
+            Submit json rpc request to input stream.
+        """
+        if not method or not params:
+            raise ValueError(u'Method or Parameter was not found in request')
+
+        asyncio.run_coroutine_threadsafe(self._send(method, params, request_id), self.loop)
+
+    async def request(self, method, params, request_id):
+        """
+            Send a request and return its response.
+        """
+        future = self.loop.create_future()
+        self.pending_requests[request_id] = future
+        try:
+            await self._send(method, params, request_id)
+            return await future
+        finally:
+            del self.pending_requests[request_id]
+
+    def events(self, owner_uri):
+        """
+            Return an async iterator over the events received for owner_uri from now on.
+        """
+        return EventIterator(self, owner_uri)
+
+    def shutdown(self):
+        """
+            Stop listening for responses and shut down the SqlToolsService process.
+        """
+        self.cancel = True
+        # Wake up callers waiting on a response.
+        with self.response_available:
+            self.response_available.notify_all()
+
+        if self.process:
+            self._run(self._shutdown())
+        logger.info('Shutting down async Json rpc client.')
+
+    def _run(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def _start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.process_args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            **self.process_options)
+        self.response_task = self.loop.create_task(self._listen_for_response())
+
+    async def _shutdown(self):
+        self.response_task.cancel()
+        self.process.stdin.close()
+        try:
+            self.process.kill()
+        except ProcessLookupError:
+            # Process already exited.
+            pass
+        await self.process.wait()
+
+    async def _send(self, method, params, request_id):
+        try:
+            self.process.stdin.write(self.writer.format_request(method, params, request_id))
+            await self.process.stdin.drain()
+        except Exception as error:
+            self._record_exception(error, LOOP_THREAD_NAME)
+            raise
+
+    async def _listen_for_response(self):
+        """
+            Read responses and hand them to their awaiting request, event iterator or the
+            response map.
+        """
+        stdout = self.process.stdout
+        while not self.cancel:
+            try:
+                headers = await stdout.readuntil(JsonRpcReader.HEADER_END)
+                content_length = JsonRpcReader.parse_content_length(
+                    headers[:-len(JsonRpcReader.HEADER_END)])
+                content = await stdout.readexactly(content_length)
+                self._dispatch_response(json.loads(content.decode(u'UTF-8')))
+
+            except asyncio.IncompleteReadError:
+                self._record_exception(
+                    EOFError(u'End of stream reached, no output.'), LOOP_THREAD_NAME)
+                break
+            except asyncio.CancelledError:
+                break
+            except Exception as error:      # pylint: disable=broad-except
+                # Catch generic exceptions.
+                self._record_exception(error, LOOP_THREAD_NAME)
+                break
+
+        # End iteration over events.
+        for queue in list(self.event_queues.values()):
+            queue.put_nowait(None)
+
+    def _dispatch_response(self, response):
+        params = response.get(u'params')
+        if params is None:
+            future = self.pending_requests.get(response.get(u'id'))
+            if future is not None and not future.done():
+                future.set_result(response)
+                return
+        elif u'ownerUri' in params and params[u'ownerUri'] in self.event_queues:
+            self.event_queues[params[u'ownerUri']].put_nowait(response)
+            return
+
+        self._enqueue_response(response)
@@ -43,6 +43,31 @@ class ConnectionRequest(Request):
         return response
 
 
+class DisconnectRequest(Request):
+    """
+        SqlToolsService Disconnect request.
+    """
+
+    def __init__(self, request_id, owner_uri, json_rpc_client, parameters):
+        super(DisconnectRequest, self).__init__(request_id, owner_uri, json_rpc_client,
+                                                DisconnectParams(parameters),
+                                                u'connection/disconnect',
+                                                DisconnectResponse)
+
+    @classmethod
+    def response_error(cls, error):
+        return DisconnectResponse(None, error_message=str(error))
+
+    @staticmethod
+    def decode_response(response):
+        if u'result' in response:
+            return DisconnectResponse(response)
+        if u'error' in response:
+            return DisconnectResponse(None, error_message=response[u'error'][u'message'])
+
+        return response
+
+
 class ConnectionDetails:
     """
         Connection details params.
@@ -83,6 +108,14 @@ class ConnectionParams:
                 u'Connection': self.connection_details.format()}
 
 
+class DisconnectParams:
+    def __init__(self, parameters):
+        self.owner_uri = parameters[u'OwnerUri']
+
+    def format(self):
+        return {u'OwnerUri': self.owner_uri}
+
+
 #
 #   The Connection Events.
 #
@@ -112,3 +145,10 @@ class ConnectionResponse:
     def __init__(self, params):
         self.result = params[u'result']
         self.request_id = params[u'id']
+
+
+class DisconnectResponse:
+    def __init__(self, params, error_message=None):
+        # False if the owner Uri was not connected.
+        self.result = params[u'result'] if params else False
+        self.error_message = error_message
@@ -80,6 +80,8 @@ class BatchSummary:
         self.has_error = parameters[u'hasError']
         self.request_id = parameters[u'id']
         self.execution_time_elapsed = parameters[u'executionElapsed']
+        selection = parameters.get(u'selection')
+        self.selection_start_line = selection[u'startLine'] if selection else None
         self.result_set_summaries = []
         for result_set_summary in parameters[u'resultSetSummaries']:
             self.result_set_summaries.append(
@@ -102,6 +104,47 @@ class Column:
         self.data_type_name = parameters[u'dataTypeName']
 
 
+class QueryCancelRequest(Request):
+    """
+        SqlToolsService QueryCancel Request.
+    """
+
+    def __init__(self, request_id, owner_uri, json_rpc_client, parameters):
+        super(QueryCancelRequest, self).__init__(request_id, owner_uri, json_rpc_client,
+                                                 QueryCancelParams(parameters),
+                                                 u'query/cancel', QueryCancelResult)
+
+    @classmethod
+    def response_error(cls, error):
+        return QueryCancelResult(None, error_message=str(error))
+
+    @staticmethod
+    def decode_response(response):
+        if u'result' in response:
+            return QueryCancelResult(response)
+        if u'error' in response:
+            return QueryCancelResult(None, error_message=response[u'error'][u'message'])
+
+        return response
+
+
+class QueryCancelParams:
+    def __init__(self, parameters):
+        self.owner_uri = parameters[u'OwnerUri']
+
+    def format(self):
+        return {u'OwnerUri': self.owner_uri}
+
+
+class QueryCancelResult:
+    def __init__(self, parameters, error_message=None):
+        # Messages are returned when the query could not be cancelled, for instance because it
+        # already completed.
+        self.messages = parameters[u'result'].get(u'messages') \
+            if parameters and parameters[u'result'] else None
+        self.error_message = error_message
+
+
 class QuerySubsetRequest(Request):
     """
         SqlToolsService QuerySubset Request.
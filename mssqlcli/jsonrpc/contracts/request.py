@@ -43,12 +43,14 @@ class Request(ABC):
         self.json_rpc_client.submit_request(
             self.method_name, self.params.format(), self.request_id)
 
-    def get_response(self):
+    def get_response(self, timeout=None):
         """
-            Get latest response, event or exception if it occured.
+            Get latest response, event or exception if it occured, waiting up to timeout
+            seconds for one to arrive.
         """
         try:
-            response = self.json_rpc_client.get_response(self.request_id, self.owner_uri)
+            response = self.json_rpc_client.get_response(self.request_id, self.owner_uri,
+                                                         timeout)
             decoded_response = None
             if response:
                 logger.debug(response)
@@ -1,10 +1,12 @@
 from __future__ import division
 from queue import Queue
 
+import codecs
 import enum
 import json
 import logging
 import threading
+import time
 
 logger = logging.getLogger(u'mssqlcli.jsonrpc.jsonrpcclient')
 
@@ -25,6 +27,8 @@ class JsonRpcClient:    # pylint: disable=too-many-instance-attributes
         # Response map intialized with event queue.
         self.response_map = {0: Queue()}
         self.exception_queue = Queue()
+        # Notified whenever a response, event or exception is enqueued.
+        self.response_available = threading.Condition()
 
         self.cancel = False
 
@@ -61,14 +65,33 @@ class JsonRpcClient:    # pylint: disable=too-many-instance-attributes
         """
             Remove request id response entry.
         """
-        if id in self.response_map:
-            logger.debug('Request with id: %s has completed.', request_id)
-            del self.response_map[request_id]
+        with self.response_available:
+            # The event queue is shared by all requests.
+            if request_id and request_id in self.response_map:
+                logger.debug('Request with id: %s has completed.', request_id)
+                del self.response_map[request_id]
 
-    def get_response(self, request_id=0, owner_uri=0):
+    def get_response(self, request_id=0, owner_uri=0, timeout=None):
         """
             Get latest response. Priority order: Response, Event, Exception.
+            If timeout is given, block for up to timeout seconds until one is available.
         """
+        with self.response_available:
+            response = self._dequeue_response(request_id, owner_uri)
+            if response is not None or not timeout:
+                return response
+
+            deadline = time.time() + timeout
+            while response is None and not self.cancel:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.response_available.wait(remaining)
+                response = self._dequeue_response(request_id, owner_uri)
+
+            return response
+
+    def _dequeue_response(self, request_id, owner_uri):
         if request_id in self.response_map:
             if not self.response_map[request_id].empty():
                 return self.response_map[request_id].get()
@@ -122,25 +145,7 @@ class JsonRpcClient:    # pylint: disable=too-many-instance-attributes
         while not self.cancel:
             try:
                 response = self.reader.read_response()
-                logger.info(dict(response))
-                response_id_str = None
-
-                if u'params' in response:
-                    if u'ownerUri' in response.get(u'params'):
-                        response_id_str = response[u'params'][u'ownerUri']
-                else:
-                    response_id_str = response.get(u'id')
-
-                if response_id_str:
-                    # we have a id, map it with a new queue if it doesn't
-                    # exist.
-                    if response_id_str not in self.response_map:
-                        self.response_map[response_id_str] = Queue()
-                    # Enqueue the response.
-                    self.response_map[response_id_str].put(response)
-                else:
-                    # Event was returned.
-                    self.response_map[0].put(response)
+                self._enqueue_response(response)
 
             except EOFError as error:
                 # Thread fails once we reach EOF.
@@ -159,12 +164,40 @@ class JsonRpcClient:    # pylint: disable=too-many-instance-attributes
                 self._record_exception(error, self.RESPONSE_THREAD_NAME)
                 break
 
+    def _enqueue_response(self, response):
+        """
+            Store response or event in the queue of its request id or owner uri.
+        """
+        logger.info(dict(response))
+        response_id_str = None
+
+        if u'params' in response:
+            if u'ownerUri' in response.get(u'params'):
+                response_id_str = response[u'params'][u'ownerUri']
+        else:
+            response_id_str = response.get(u'id')
+
+        with self.response_available:
+            if response_id_str:
+                # we have a id, map it with a new queue if it doesn't
+                # exist.
+                if response_id_str not in self.response_map:
+                    self.response_map[response_id_str] = Queue()
+                # Enqueue the response.
+                self.response_map[response_id_str].put(response)
+            else:
+                # Event was returned.
+                self.response_map[0].put(response)
+            self.response_available.notify_all()
+
     def _record_exception(self, ex, thread_name):
         """
             Record exception to allow main thread to access.
         """
         logger.debug(u'Thread: %s encountered exception %s', thread_name, ex)
-        self.exception_queue.put(ex)
+        with self.response_available:
+            self.exception_queue.put(ex)
+            self.response_available.notify_all()
 
     def shutdown(self):
         """
@@ -174,6 +207,9 @@ class JsonRpcClient:    # pylint: disable=too-many-instance-attributes
         # Enqueue None to optimistically unblock background threads so
         # they can check for the cancellation flag.
         self.request_queue.put(None)
+        # Wake up callers waiting on a response.
+        with self.response_available:
+            self.response_available.notify_all()
 
         # Wait for request thread to finish with a timeout in seconds.
         self.request_thread.join(1)
@@ -205,6 +241,19 @@ class JsonRpcWriter:
             ValueError
                 If the stream was closed externally.
         """
+        message = self.format_request(method, params, request_id)
+        try:
+            self.stream.write(message)
+            self.stream.flush()
+
+        except ValueError as ex:
+            logger.debug(u'Send Request encountered exception %s', ex)
+            raise
+
+    def format_request(self, method, params, request_id=None):
+        """
+            Return the encoded JSON RPC request message, including its header.
+        """
         # Perhaps move to a different def to add some validation
         content_body = {
             u'jsonrpc': u'2.0',
@@ -215,14 +264,7 @@ class JsonRpcWriter:
 
         json_content = json.dumps(content_body, sort_keys=True)
         header = self.HEADER.format(str(len(json_content)))
-        try:
-            self.stream.write(header.encode(u'ascii'))
-            self.stream.write(json_content.encode(self.encoding))
-            self.stream.flush()
-
-        except ValueError as ex:
-            logger.debug(u'Send Request encountered exception %s', ex)
-            raise
+        return header.encode(u'ascii') + json_content.encode(self.encoding)
 
     def close(self):
         """
@@ -238,11 +280,13 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
     """
         Read JSON RPC message from output stream.
     """
-    # \r\n
-    CR = 13
-    LF = 10
+    HEADER_END = b'\r\n\r\n'
+    CONTENT_LENGTH_HEADER = b'content-length:'
     BUFFER_RESIZE_TRIGGER = 0.25
     DEFAULT_BUFFER_SIZE = 8192
+    # A drained buffer larger than this is replaced by a default sized one, so a single
+    # large message does not hold on to its memory for the rest of the session.
+    MAX_IDLE_BUFFER_SIZE = 1024 * 1024
 
     def __init__(self, stream, encoding=None):
         self.encoding = encoding or u'UTF-8'
@@ -254,9 +298,12 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
         # Pointer to where we have read up to.
         self.read_offset = 0
         self.expected_content_length = 0
-        self.headers = {}
+        # Number of bytes after read_offset already scanned for the end of the headers.
+        self.header_scan_length = 0
         self.read_state = ReadState.Header
         self.needs_more_data = True
+        # Number of unread bytes moved within or between buffers so far.
+        self.bytes_copied = 0
 
     def read_response(self):
         """
@@ -287,8 +334,13 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
                 # We have the  content
                 break
 
-            # Resize buffer and remove bytes we have read
-            self.trim_buffer_and_resize(self.read_offset)
+            # Rewind the pointers once everything buffered has been read. Unread bytes stay
+            # where they are until read_next_chunk needs the room.
+            if self.read_offset == self.buffer_end_offset:
+                self.read_offset = 0
+                self.buffer_end_offset = 0
+                if len(self.buffer) > self.MAX_IDLE_BUFFER_SIZE:
+                    self.buffer = bytearray(self.DEFAULT_BUFFER_SIZE)
             return json.loads(content[0])
         except ValueError as ex:
             # response has invalid json object.
@@ -304,15 +356,9 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
             ValueError
                 Stream was closed externally.
         """
-        # Check if we need to resize.
-        current_buffer_size = len(self.buffer)
-        if ((current_buffer_size - self.buffer_end_offset) /
-                current_buffer_size) < self.BUFFER_RESIZE_TRIGGER:
-            resized_buffer = bytearray(current_buffer_size * 2)
-            # copy current buffer content to new buffer.
-            resized_buffer[0:current_buffer_size] = self.buffer
-            # point to new buffer.
-            self.buffer = resized_buffer
+        # Check if we need to make room.
+        if self.needs_room():
+            self.compact_buffer()
 
         # Memory view is required in order to read into a subset of a byte
         # array
@@ -341,57 +387,77 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
             ValueError
                 The content-length contained a invalid literal for int.
         """
-        # Scan the buffer up until right before the CRLFCRLF.
-        scan_offset = self.read_offset
-        while (scan_offset + 3 < self.buffer_end_offset and
-               (self.buffer[scan_offset] != self.CR or
-                self.buffer[scan_offset + 1] != self.LF or
-                self.buffer[scan_offset + 2] != self.CR or
-                self.buffer[scan_offset + 3] != self.LF)):
-            scan_offset += 1
+        # Find the CRLFCRLF, resuming where the previous attempt on this message stopped. The
+        # last 3 bytes scanned are scanned again as they may be the start of a CRLFCRLF.
+        scan_offset = self.buffer.find(
+            self.HEADER_END,
+            self.read_offset + max(self.header_scan_length - 3, 0),
+            self.buffer_end_offset)
 
         # if we reached the end
-        if scan_offset + 3 >= self.buffer_end_offset:
+        if scan_offset == -1:
+            self.header_scan_length = self.buffer_end_offset - self.read_offset
             return False
 
-        # Split the headers by new line
+        self.header_scan_length = 0
+        headers_read = bytes(self.buffer[self.read_offset:scan_offset])
+
         try:
-            headers_read = self.buffer[self.read_offset:scan_offset].decode(
-                u'ascii')
-            for header in headers_read.split(u'\n'):
-                colon_index = header.find(u':')
+            self.expected_content_length = self.parse_content_length(headers_read)
+        except ValueError:
+            # Content-length contained invalid literal for int. Skip the headers.
+            self.read_offset = scan_offset + 4
+            raise
 
-                if colon_index == -1:
-                    logger.debug(
-                        u'JSON RPC Reader encountered missing colons in try_read_headers()')
-                    raise KeyError(
-                        u'Colon missing from Header: {}.'.format(header))
+        # Pushing read pointer past the newline characters.
+        self.read_offset = scan_offset + 4
+        self.read_state = ReadState.Content
 
-                # Case insensitive.
-                header_key = header[:colon_index].lower()
-                header_value = header[colon_index + 1:]
+        return True
+
+    @classmethod
+    def parse_content_length(cls, headers_read):
+        """
+        Return the content length given in the headers, excluding the final CRLFCRLF.
+        Exceptions:
+            KeyError
+                A header was missing a colon.
+            LookupError
+                The content-length header was not found.
+            ValueError
+                The content-length contained a invalid literal for int.
+        """
+        # Messages from the tools service only have a Content-Length header, which is
+        # parsed directly.
+        if (headers_read[:len(cls.CONTENT_LENGTH_HEADER)].lower() ==
+                cls.CONTENT_LENGTH_HEADER and b'\n' not in headers_read):
+            return int(headers_read[len(cls.CONTENT_LENGTH_HEADER):])
 
-                self.headers[header_key] = header_value
+        headers = {}
+        # Split the headers by new line
+        for header in headers_read.decode(u'ascii').split(u'\n'):
+            colon_index = header.find(u':')
 
-            # Was content-length header found?
-            if 'content-length' not in self.headers:
+            if colon_index == -1:
                 logger.debug(
-                    u'JSON RPC Reader did not find Content-Length in the headers')
-                raise LookupError(
-                    u'Content-Length was not found in headers received.')
+                    u'JSON RPC Reader encountered missing colons in try_read_headers()')
+                raise KeyError(
+                    u'Colon missing from Header: {}.'.format(header))
 
-            self.expected_content_length = int(self.headers[u'content-length'])
+            # Case insensitive.
+            header_key = header[:colon_index].lower()
+            header_value = header[colon_index + 1:]
 
-        except ValueError:
-            # Content-length contained invalid literal for int.
-            self.trim_buffer_and_resize(scan_offset + 4)
-            raise
+            headers[header_key] = header_value
 
-        # Pushing read pointer past the newline characters.
-        self.read_offset = scan_offset + 4
-        self.read_state = ReadState.Content
+        # Was content-length header found?
+        if 'content-length' not in headers:
+            logger.debug(
+                u'JSON RPC Reader did not find Content-Length in the headers')
+            raise LookupError(
+                u'Content-Length was not found in headers received.')
 
-        return True
+        return int(headers[u'content-length'])
 
     def try_read_content(self, content):
         """
@@ -402,36 +468,64 @@ class JsonRpcReader:    # pylint: disable=too-many-instance-attributes
             # We buffered less than the expected content length.
             return False
 
-        content[0] = self.buffer[self.read_offset:self.read_offset +
-                                 self.expected_content_length].decode(self.encoding)
+        # Decode straight from a view of the buffer instead of slicing out a bytes copy.
+        content[0] = codecs.decode(
+            memoryview(self.buffer)[self.read_offset:self.read_offset +
+                                    self.expected_content_length],
+            self.encoding)
         self.read_offset += self.expected_content_length
 
         self.read_state = ReadState.Header
 
         return True
 
-    def trim_buffer_and_resize(self, bytes_to_remove):
+    def needs_room(self):
         """
-        Trim the buffer by the passed in bytes_to_remove by creating a new buffer
-        that is at a minimum the default max size.
+        Whether the buffer has to be compacted or grown before reading the next chunk. While
+        reading content, that is only when the rest of the message does not fit after it.
         """
         current_buffer_size = len(self.buffer)
-        # Create a new buffer with either minumum size or leftover size.
-        new_buffer = bytearray(max(current_buffer_size -
-                                   bytes_to_remove, self.DEFAULT_BUFFER_SIZE))
+        if self.read_state is ReadState.Content:
+            return self.read_offset + self.expected_content_length > current_buffer_size
 
-        # if we have content we did not read, copy that portion to the new
-        # buffer.
-        if bytes_to_remove <= current_buffer_size:
-            new_buffer[:self.buffer_end_offset -
-                       bytes_to_remove] = self.buffer[bytes_to_remove:self.buffer_end_offset]
+        return ((current_buffer_size - self.buffer_end_offset) /
+                current_buffer_size) < self.BUFFER_RESIZE_TRIGGER
 
-        # Point to the new buffer.
-        self.buffer = new_buffer
+    def compact_buffer(self):
+        """
+        Make room at the end of the buffer. Bytes that were already read are dropped by moving
+        the unread bytes to the front of the buffer. The buffer is only reallocated when that
+        does not free enough room, and then it is sized to hold the whole message being read,
+        so the buffer is reused across messages and only unread bytes are ever copied.
+        read_response shrinks the buffer back to the default size once it is drained.
+        """
+        current_buffer_size = len(self.buffer)
+        unread_bytes = self.buffer_end_offset - self.read_offset
+        unread_view = memoryview(self.buffer)[self.read_offset:self.buffer_end_offset]
+
+        if self.read_state is ReadState.Content:
+            required_size = self.expected_content_length
+            fits = required_size <= current_buffer_size
+        else:
+            required_size = unread_bytes
+            fits = ((current_buffer_size - unread_bytes) / current_buffer_size >=
+                    self.BUFFER_RESIZE_TRIGGER)
+
+        if fits:
+            if unread_bytes <= self.read_offset:
+                self.buffer[:unread_bytes] = unread_view
+            else:
+                # The unread bytes overlap their destination, move them through a copy.
+                self.buffer[:unread_bytes] = unread_view.tobytes()
+                self.bytes_copied += unread_bytes
+        else:
+            resized_buffer = bytearray(max(current_buffer_size * 2, required_size))
+            resized_buffer[:unread_bytes] = unread_view
+            self.buffer = resized_buffer
 
-        # reset pointers after the shift.
+        self.bytes_copied += unread_bytes
         self.read_offset = 0
-        self.buffer_end_offset -= bytes_to_remove
+        self.buffer_end_offset = unread_bytes
 
     def close(self):
         """
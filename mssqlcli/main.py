@@ -1,13 +1,13 @@
 from __future__ import unicode_literals
 from __future__ import print_function
 
+from mssqlcli import startupprofile
 import getpass
 import io
 import os
 import sys
 from builtins import input
 import click
-import six
 from mssqlcli.config import config_location
 from mssqlcli.__init__ import __version__
 from mssqlcli.mssqlclioptionsparser import create_parser
@@ -35,42 +35,95 @@ def run_cli_with(options):
         display_telemetry_message()
 
     display_version_message(options)
+    startupprofile.mark(u'config dir')
+
+    if options.daemon:
+        run_daemon(options)
+        return
 
     configure_and_update_options(options)
+    startupprofile.mark(u'credentials')
+
+    # set interactive mode to false if -Q or -i is specified
+    if options.query or options.input_file:
+        options.interactive_mode = False
+
+    if options.use_daemon and not options.interactive_mode:
+        exit_code = forward_to_daemon(options)
+        startupprofile.mark(u'run on daemon')
+        if exit_code is not None:
+            sys.exit(exit_code)
 
     # Importing MssqlCli creates a config dir by default.
     # Moved import here so we can create the config dir for first use prior.
     # pylint: disable=import-outside-toplevel
     from mssqlcli.mssql_cli import MssqlCli
-
-    # set interactive mode to false if -Q or -i is specified
-    if options.query or options.input_file:
-        options.interactive_mode = False
+    startupprofile.mark(u'import mssql_cli')
 
     mssqlcli = MssqlCli(options)
+    startupprofile.mark(u'initialize, start service')
     try:
         mssqlcli.connect_to_database()
+        startupprofile.mark(u'connect')
         telemetry_session.set_server_information(mssqlcli.mssqlcliclient_main)
 
         if mssqlcli.interactive_mode:
             mssqlcli.run()
+            startupprofile.mark(u'interactive session')
         else:
-            text = options.query
             if options.input_file:
-                # get query text from input file
+                # execute statements while they are read from the input file
                 try:
-                    if six.PY2:
+                    if sys.version_info < (3,):
                         with io.open(options.input_file, 'r', encoding='utf-8') as f:
-                            text = f.read()
+                            mssqlcli.execute_query_stream(f)
                     else:
                         with open(options.input_file, 'r', encoding='utf-8') as f:
-                            text = f.read()
+                            mssqlcli.execute_query_stream(f)
                 except OSError as e:
                     click.secho(str(e), err=True, fg='red')
                     sys.exit(1)
-            mssqlcli.execute_query(text)
+            else:
+                mssqlcli.execute_query_to_output(options.query)
+            startupprofile.mark(u'run query')
     finally:
         mssqlcli.shutdown()
+        startupprofile.mark(u'shutdown')
+
+
+def run_daemon(options):
+    # pylint: disable=import-outside-toplevel
+    from mssqlcli.daemon import Daemon, is_supported
+
+    if not is_supported():
+        click.secho(u'--daemon requires Python 3 and Unix sockets.', err=True, fg='red')
+        sys.exit(1)
+
+    daemon = Daemon(options.daemon_socket, options.daemon_reuse_connections,
+                    enable_logging=options.enable_sqltoolsservice_logging,
+                    enable_asyncio_transport=options.enable_asyncio_transport)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except (RuntimeError, EnvironmentError) as e:
+        click.secho(str(e), err=True, fg='red')
+        sys.exit(1)
+
+
+def forward_to_daemon(options):
+    """
+        Runs a non-interactive invocation on the daemon. Returns its exit code, or None if no
+        daemon is running, so the invocation runs in this process instead.
+    """
+    # pylint: disable=import-outside-toplevel
+    from mssqlcli.daemon import forward_to_daemon as forward
+
+    try:
+        return forward(options, options.daemon_socket)
+    except (IOError, OSError) as e:
+        click.secho(str(e), err=True, fg='red')
+        return 1
 
 
 def configure_and_update_options(options):
@@ -108,10 +161,17 @@ def display_telemetry_message():
 
 
 def main():
+    startupprofile.mark(u'import main')
+    if u'--profile-startup' in sys.argv[1:]:
+        # The invocation runs in a child process, which sends the telemetry.
+        sys.exit(startupprofile.profile_startup(
+            [arg for arg in sys.argv[1:] if arg != u'--profile-startup']))
+
     try:
         telemetry_session.start()
         mssqlcli_options_parser = create_parser()
         mssqlcli_options = mssqlcli_options_parser.parse_args(sys.argv[1:])
+        startupprofile.mark(u'parse arguments')
         run_cli_with(mssqlcli_options)
     finally:
         # Upload telemetry async in a separate process.
@@ -0,0 +1,143 @@
+"""
+    On-disk cache of the metadata queried for completions.
+
+    The results of the metadata queries the completion refreshers run are stored in a SQLite
+    database under the config location, per server and database, together with the metadata
+    version reported by the server. A refresh whose version matches the cached one replays the
+    cached results instead of querying the catalog.
+"""
+import json
+import logging
+import sqlite3
+import zlib
+from contextlib import closing
+
+from mssqlcli.config import config_location, ensure_dir_exists
+from mssqlcli.packages.parseutils.meta import ForeignKey
+
+logger = logging.getLogger(u'mssqlcli.metadatacache')
+
+# MssqlCliClient methods whose results are cached, slowest first so they start first when
+# queried in parallel.
+METADATA_METHODS = (
+    u'get_table_columns',
+    u'get_view_columns',
+    u'get_foreign_keys',
+    u'get_relation_objects',
+    u'get_tables',
+    u'get_views',
+    u'get_schemas',
+    u'get_user_defined_types',
+    u'get_databases',
+)
+# Methods not called in lazy column mode.
+COLUMN_METHODS = (
+    u'get_table_columns',
+    u'get_view_columns',
+    u'get_foreign_keys',
+)
+
+_CREATE_TABLE = u'''
+    CREATE TABLE IF NOT EXISTS metadata (
+        server TEXT NOT NULL,
+        database TEXT NOT NULL,
+        version TEXT NOT NULL,
+        metadata BLOB NOT NULL,
+        PRIMARY KEY (server, database))'''
+
+
+def get_cache_file():
+    return config_location() + u'metadata_cache.db'
+
+
+class MetadataCache(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Stores the results of metadata queries per server and database. Errors reading or
+        writing the cache are logged and treated as a cache miss.
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or get_cache_file()
+
+    def load(self, server, database, version):
+        """ Returns the cached results by method name, or None if they are missing or stale. """
+        try:
+            with closing(self._connect()) as connection:
+                row = connection.execute(
+                    u'SELECT version, metadata FROM metadata WHERE server = ? AND database = ?',
+                    (server.lower(), database.lower())).fetchone()
+        except sqlite3.Error as error:
+            logger.error(u'Reading the metadata cache failed: %s', error)
+            return None
+
+        if row is None or row[0] != version:
+            return None
+        return json.loads(zlib.decompress(row[1]).decode(u'utf-8'))
+
+    def save(self, server, database, version, metadata):
+        """ Stores the results by method name of the metadata queries. """
+        blob = zlib.compress(json.dumps(metadata, separators=(u',', u':')).encode(u'utf-8'))
+        try:
+            with closing(self._connect()) as connection:
+                with connection:
+                    connection.execute(
+                        u'INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)',
+                        (server.lower(), database.lower(), version, sqlite3.Binary(blob)))
+        except sqlite3.Error as error:
+            logger.error(u'Writing the metadata cache failed: %s', error)
+
+    def _connect(self):
+        ensure_dir_exists(self.cache_file)
+        connection = sqlite3.connect(self.cache_file)
+        connection.execute(_CREATE_TABLE)
+        return connection
+
+
+class MetadataRecorder(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Wraps a MssqlCliClient, keeping the results of the metadata methods called on it.
+    """
+
+    def __init__(self, mssqlcliclient, version):
+        self.mssqlcliclient = mssqlcliclient
+        # Metadata version the results are cached with.
+        self.version = version
+        self.metadata = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self.mssqlcliclient, name)
+        if name not in METADATA_METHODS:
+            return attribute
+
+        def record():
+            results = list(attribute() or ())
+            self.metadata[name] = results
+            return results
+        return record
+
+    def is_complete(self, methods=METADATA_METHODS):
+        """ Returns True once every method given has returned its results. """
+        return all(name in self.metadata for name in methods)
+
+
+class CachedMetadata(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """
+        Serves the metadata methods of a MssqlCliClient from results cached or queried earlier.
+    """
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+    def __getattr__(self, name):
+        if name not in METADATA_METHODS:
+            raise AttributeError(name)
+
+        # Rows were stored as lists.
+        results = [tuple(row) if isinstance(row, list) else row
+                   for row in self.metadata[name]]
+        if name == u'get_foreign_keys':
+            results = [ForeignKey(*row) for row in results]
+        return lambda: results
@@ -11,43 +11,39 @@ import traceback
 from codecs import open
 from collections import namedtuple
 from time import time
-from cli_helpers.tabular_output import TabularOutputFormatter
-from cli_helpers.tabular_output.preprocessors import (align_decimals,
-                                                      format_numbers)
-import humanize
 import click
-from prompt_toolkit.shortcuts import PromptSession, CompleteStyle
-from prompt_toolkit.completion import DynamicCompleter, ThreadedCompleter
-from prompt_toolkit.enums import DEFAULT_BUFFER, EditingMode
-from prompt_toolkit.document import Document
-from prompt_toolkit.filters import HasFocus, IsDone
-from prompt_toolkit.lexers import PygmentsLexer
-from prompt_toolkit.layout.processors import (ConditionalProcessor,
-                                              HighlightMatchingBracketProcessor,
-                                              TabsProcessor)
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-from pygments.lexers.sql import PostgresLexer
 from mssqlcli.config import (
     get_casing_file,
     config_location,
     ensure_dir_exists,
     get_config,
 )
-from mssqlcli.completion_refresher import CompletionRefresher
 from mssqlcli.__init__ import __version__
 from mssqlcli.encodingutils import text_type
-from mssqlcli.key_bindings import mssqlcli_bindings
-from mssqlcli.mssqlcliclient import MssqlCliClient
-from mssqlcli.mssqlcompleter import MssqlCompleter
-from mssqlcli.mssqlstyle import style_factory, style_factory_output
-from mssqlcli.mssqltoolbar import create_toolbar_tokens_func
-from mssqlcli.sqltoolsclient import SqlToolsClient
+from mssqlcli.mssqlcliclient import MssqlCliClient, ResultSetFetchError
+from mssqlcli.mssqlexport import export_rows
+from mssqlcli.sqltoolsclient import SqlToolsClient, SqlToolsClientPool
 from mssqlcli.packages import special
-from mssqlcli.mssqlbuffer import mssql_is_multiline
-from mssqlcli.util import is_command_valid
+from mssqlcli.packages.parseutils.splitter import iter_statements
+from mssqlcli.outputwriter import OutputWriter
+from mssqlcli.util import is_command_valid, security_words_found_in
 import mssqlcli.localized_strings as localized
 
+# Modules only used by the interactive mode, such as prompt_toolkit and the completer, and
+# by table output are imported where they are used, so -Q and -i runs start faster.
+# pylint: disable=import-outside-toplevel
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # MssqlFileHistory is still importable from here, without importing prompt_toolkit
+        # until it is used.
+        if name == 'MssqlFileHistory':
+            from mssqlcli.mssqlhistory import MssqlFileHistory
+            return MssqlFileHistory
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    from mssqlcli.mssqlhistory import MssqlFileHistory
+
 # Query tuples are used for maintaining history
 MetaQuery = namedtuple(
     'Query',
@@ -60,8 +56,9 @@ MetaQuery = namedtuple(
         'path_changed',                 # True if any subquery changed the search path
         'mutated',                      # True if any subquery executed insert/update/delete
         'contains_secure_statement',    # True if any subquery contains the security statement
+        'results_incomplete',           # True if the rows of a result could not all be fetched
     ])
-MetaQuery.__new__.__defaults__ = ('', False, 0, False, False, False, False, False)
+MetaQuery.__new__.__defaults__ = ('', False, 0, False, False, False, False, False, False)
 
 OutputSettings = namedtuple(
     'OutputSettings',
@@ -71,24 +68,6 @@ OutputSettings.__new__.__defaults__ = (
     None, None, None, '<null>', False, None, lambda x: x
 )
 
-security_keywords = ['password', 'secret', 'encrypted_value']
-
-
-def security_words_found_in(query):
-    try:
-        tokens = query.lower()
-        return any([keyword for keyword in security_keywords if keyword in tokens])
-    except AttributeError:
-        return False
-
-
-class MssqlFileHistory(FileHistory):
-    def append_string(self, string):
-        if security_words_found_in(string):
-            return
-
-        super(MssqlFileHistory, self).append_string(string)
-
 
 class MssqlCli(object):
     # pylint: disable=too-many-instance-attributes, useless-object-inheritance
@@ -124,7 +103,7 @@ class MssqlCli(object):
             os.environ['PAGER'] = default_pager
         return default_pager
 
-    def __init__(self, options):
+    def __init__(self, options, mssqlcliclient=None):
 
         # Load config.
         c = self.config = get_config(options.mssqlclirc_file)
@@ -155,9 +134,17 @@ class MssqlCli(object):
             'single_connection': False,
             'less_chatty': self.less_chatty,
             'keyword_casing': keyword_casing,
+            'lazy_columns': c['main'].as_bool('lazy_columns'),
+            'column_cache_size': c['main'].as_int('column_cache_size'),
+            'completion_top_k': c['main'].as_int('completion_top_k'),
         }
 
         if self.interactive_mode:
+            from mssqlcli.completion_refresher import CompletionRefresher
+            from mssqlcli.metadatacache import MetadataCache
+            from mssqlcli.mssqlcompleter import MssqlCompleter
+            from mssqlcli.mssqlstyle import style_factory_output
+
             pager = self.set_default_pager(c)
             self.prompt_session = None
 
@@ -179,7 +166,10 @@ class MssqlCli(object):
 
             self.now = dt.datetime.today()
 
-            self.completion_refresher = CompletionRefresher()
+            metadata_cache = MetadataCache() if c['main'].as_bool('metadata_cache') else None
+            self.completion_refresher = CompletionRefresher(
+                metadata_cache=metadata_cache,
+                connections=c['main'].as_int('completion_refresh_connections'))
 
             self.query_history = []
 
@@ -192,17 +182,37 @@ class MssqlCli(object):
         # input and output file are for non-interactive mode
         self.input_file = options.input_file
         self.output_file = options.output_file
+        self.export_format = options.export_format
 
         self.query = options.query
 
-        self.sqltoolsclient = SqlToolsClient(enable_logging=options.enable_sqltoolsservice_logging)
-        self.mssqlcliclient_main = MssqlCliClient(options, self.sqltoolsclient)
+        self.enable_asyncio_transport = options.enable_asyncio_transport
+        sqltoolsclient_args = {
+            'enable_logging': options.enable_sqltoolsservice_logging,
+            'enable_asyncio_transport': self.enable_asyncio_transport,
+        }
+        # Keep a spare service running, which the client switches to on reset.
+        self.sqltoolsclient_pool = None
+        if mssqlcliclient:
+            # The client and its service are owned by the caller, such as the daemon.
+            self.sqltoolsclient = None
+        elif self.interactive_mode and c['main'].as_bool('prewarm_service'):
+            self.sqltoolsclient_pool = SqlToolsClientPool(**sqltoolsclient_args)
+            self.sqltoolsclient = self.sqltoolsclient_pool.get_client()
+        else:
+            self.sqltoolsclient = SqlToolsClient(**sqltoolsclient_args)
+        self.mssqlcliclient_main = mssqlcliclient or MssqlCliClient(options, self.sqltoolsclient)
 
         # exit and return error if user enters interactive mode with -i or -o arguments enabled
         if self.interactive_mode and (self.input_file or self.output_file):
             raise ValueError("Invalid arguments: -i and -o can only be used in non-interactive "
                              "mode.")
 
+        # exit and return error if user enters interactive mode with an export format
+        if self.interactive_mode and self.export_format:
+            raise ValueError("Invalid arguments: --format can only be used in non-interactive "
+                             "mode.")
+
         # exit and return error if both query text and an input file are specified
         if self.query and self.input_file:
             raise ValueError("Invalid arguments: either query [-Q] or input file [-i] may be "
@@ -232,6 +242,11 @@ class MssqlCli(object):
     #     return [(None, None, None, message, '', True)]
 
     def initialize_logging(self):
+        root_logger = logging.getLogger('mssqlcli')
+        if root_logger.handlers:
+            # Logging was initialized by an earlier instance in this process.
+            return
+
         log_file = self.config['main']['log_file']
         if log_file == 'default':
             log_file = config_location() + 'mssqlcli.log'
@@ -264,7 +279,6 @@ class MssqlCli(object):
 
         handler.setFormatter(formatter)
 
-        root_logger = logging.getLogger('mssqlcli')
         root_logger.addHandler(handler)
         root_logger.setLevel(log_level)
 
@@ -283,6 +297,10 @@ class MssqlCli(object):
             self.logger.debug('Database connection failed: %r.', error_messages)
             sys.exit(1)
 
+        if self.sqltoolsclient_pool:
+            # The spare service is used by the next reset.
+            self.sqltoolsclient_pool.start_spare()
+
     def handle_editor_command(self, text):
         r"""
         Editor command is any query that is prefixed or suffixed
@@ -329,12 +347,8 @@ class MssqlCli(object):
         try:
             output, query = self._evaluate_command(text)
         except KeyboardInterrupt:
-            # Issue where Ctrl+C propagates to sql tools service process and kills it,
-            # so that query/cancel request can't be sent.
-            # Right now the sql_tools_service process is killed and we restart
-            # it with a new connection.
             click.secho(u'Cancelling query...', err=True, fg='red')
-            self.reset()
+            self.cancel_query()
             logger.debug("cancelled query, sql: %r", text)
             click.secho("Query cancelled.", err=True, fg='red')
 
@@ -342,6 +356,7 @@ class MssqlCli(object):
             click.secho('Not Yet Implemented.', fg="yellow")
         else:
             if query.total_time > 1:
+                import humanize
                 # pylint: disable=no-member
                 print('Time: %0.03fs (%s)' % (query.total_time,
                                               humanize.time.naturaldelta(query.total_time)))
@@ -355,7 +370,7 @@ class MssqlCli(object):
                     self.completer.reset_completions()
                 self.refresh_completions(persist_priorities='keywords')
             elif query.meta_changed:
-                self.refresh_completions(persist_priorities='all')
+                self.refresh_completions_delta()
 
         if not query.contains_secure_statement:
             # Allow MssqlCompleter to learn user's preferred keywords, etc.
@@ -377,20 +392,67 @@ class MssqlCli(object):
         self._output_query(output)
         return output
 
+    def execute_query_to_output(self, text):
+        """
+            Executes a query in non-interactive mode, writing its results to the output file or
+            stdout as they are formatted instead of collecting them first.
+        """
+        self._connect_or_exit()
+        query = self._write_output(
+            lambda writer: self._evaluate_results(
+                text, self.mssqlcliclient_main.execute_query(text), writer.write_lines))
+        self._exit_if_incomplete(query)
+        return query
+
+    def execute_query_stream(self, stream):
+        """
+            Executes the statements of a text stream in non-interactive mode while it is read,
+            writing the results of each statement as soon as they are formatted.
+        """
+        self._connect_or_exit()
+        query = self._write_output(
+            lambda writer: self._evaluate_results(
+                None, self.mssqlcliclient_main.execute_statements(iter_statements(stream)),
+                writer.write_lines))
+        self._exit_if_incomplete(query)
+        return query
+
+    @staticmethod
+    def _exit_if_incomplete(query):
+        # The output written so far is kept, the exit code tells it is missing rows.
+        if query.results_incomplete:
+            sys.exit(1)
+
     def _output_query(self, output):
         """ Specifies how query output is handled """
         if self.interactive_mode:
             click.echo_via_pager('\n'.join(output))
         else:
-            if self.output_file:
-                try:
-                    with open(self.output_file, 'w', encoding='utf-8') as f:
-                        click.echo('\n'.join(output), file=f)
-                except IOError as e:
-                    click.secho(str(e), err=True, fg='red')
-                    sys.exit(1)
-            else:
-                click.echo('\n'.join(output))
+            self._write_output(lambda writer: writer.write_lines(output))
+
+    def _write_output(self, write):
+        """ Calls write with an OutputWriter for the output file, or stdout. """
+        output_file = None
+        if self.output_file:
+            try:
+                output_file = open(self.output_file, 'w', encoding='utf-8')
+            except IOError as e:
+                click.secho(str(e), err=True, fg='red')
+                sys.exit(1)
+
+        writer = OutputWriter(output_file)
+        try:
+            result = write(writer)
+            writer.close()
+            return result
+        finally:
+            if output_file:
+                output_file.close()
+
+    def _connect_or_exit(self):
+        if not self.mssqlcliclient_main.connect_to_database():
+            click.secho(u'No connection to server. Exiting.')
+            sys.exit(1)
 
     def run(self):
         """ Spins up CLI. """
@@ -408,6 +470,7 @@ class MssqlCli(object):
         history_file = self.config['main']['history_file']
         if history_file == 'default':
             history_file = config_location() + 'history'
+        from mssqlcli.mssqlhistory import MssqlFileHistory
         history = MssqlFileHistory(os.path.expanduser(history_file))
 
         self.refresh_completions(history=history,
@@ -455,6 +518,21 @@ class MssqlCli(object):
             Builds prompt session.
             NOTE: PROMPT-SESSION USES THIS AS DEPENDENCY.
         """
+        from prompt_toolkit.shortcuts import PromptSession, CompleteStyle
+        from prompt_toolkit.completion import ThreadedCompleter
+        from prompt_toolkit.enums import DEFAULT_BUFFER, EditingMode
+        from prompt_toolkit.filters import HasFocus, IsDone
+        from prompt_toolkit.lexers import PygmentsLexer
+        from prompt_toolkit.layout.processors import (ConditionalProcessor,
+                                                      HighlightMatchingBracketProcessor,
+                                                      TabsProcessor)
+        from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+        from pygments.lexers.sql import PostgresLexer
+        from mssqlcli.key_bindings import mssqlcli_bindings
+        from mssqlcli.mssqlbuffer import mssql_is_multiline
+        from mssqlcli.mssqlcompleter import CancellableCompleter
+        from mssqlcli.mssqlstyle import style_factory
+        from mssqlcli.mssqltoolbar import create_toolbar_tokens_func
 
         def get_message():
             prompt = self.get_prompt(self.prompt_format)
@@ -475,6 +553,8 @@ class MssqlCli(object):
         else:
             complete_style = CompleteStyle.COLUMN
 
+        completer = CancellableCompleter(lambda: self.completer)
+
         with self._completer_lock:
             self.prompt_session = PromptSession(
                 message=get_message,
@@ -497,8 +577,7 @@ class MssqlCli(object):
 
                 # Buffer options.
                 multiline=mssql_is_multiline(self),
-                completer=ThreadedCompleter(
-                    DynamicCompleter(lambda: self.completer)),
+                completer=ThreadedCompleter(completer),
                 history=history, auto_suggest=AutoSuggestFromHistory(),
                 complete_while_typing=True,
 
@@ -511,6 +590,11 @@ class MssqlCli(object):
                 editing_mode=EditingMode.VI if self.vi_mode else EditingMode.EMACS,
                 search_ignore_case=True)
 
+            # Stop computing the completions of a text once it is edited, so
+            # the completions of the new text can start.
+            self.prompt_session.default_buffer.on_text_changed += \
+                lambda _: completer.cancel()
+
             return self.prompt_session
 
     def _should_show_limit_prompt(self, status, rows):
@@ -530,6 +614,21 @@ class MssqlCli(object):
 
             returns (results, MetaQuery)
         """
+        output = []
+
+        # mssql-cli
+        self._connect_or_exit()
+
+        query = self._evaluate_results(text, self.mssqlcliclient_main.execute_query(text),
+                                       output.extend)
+        return output, query
+
+    def _evaluate_results(self, text, results, write):
+        """
+            Formats query results, passing the formatted lines of each result to write.
+
+            returns MetaQuery
+        """
         # pylint: disable=too-many-locals
 
         all_success = True
@@ -538,19 +637,13 @@ class MssqlCli(object):
         db_changed = False
         contains_secure_statement = False
         path_changed = False
-        output = []
+        results_incomplete = False
         total = 0
 
         # Run the query.
         start = time()
 
-        # mssql-cli
-        if not self.mssqlcliclient_main.connect_to_database():
-            click.secho(u'No connection to server. Exiting.')
-            sys.exit(1)
-
-        for rows, columns, status, sql, is_error in \
-                self.mssqlcliclient_main.execute_query(text):
+        for rows, columns, status, sql, is_error in results:
 
             total = time() - start
             if self._should_show_limit_prompt(status, rows):
@@ -563,32 +656,24 @@ class MssqlCli(object):
             contains_secure_statement = security_words_found_in(sql)
 
             if is_error:
-                output.append(status)
+                if self.export_format:
+                    click.secho(status, err=True, fg='red')
+                else:
+                    write([status])
                 all_success = False
                 continue
 
-            if self.interactive_mode and self.auto_expand and self.prompt_session:
-                max_width = self.prompt_session.output.get_size().columns
-            else:
-                max_width = None
-
-            settings = OutputSettings(
-                table_format=self.table_format,
-                dcmlfmt=self.decimal_format,
-                floatfmt=self.float_format,
-                missingval=self.null_string,
-                expanded=self.expanded_output,
-                max_width=max_width,
-                case_function=(
-                    self.completer.case if self.interactive_mode and
-                    self.settings['case_column_headers']
-                    else
-                    lambda x: x
-                )
-            )
-
-            formatted = self.format_output(None, rows, columns, status, settings)
-            output.extend(formatted)
+            try:
+                write(self._format_result(rows, columns, status))
+            except ResultSetFetchError as e:
+                # The lines formatted before the error were written.
+                if self.export_format:
+                    click.secho(str(e), err=True, fg='red')
+                else:
+                    write([str(e)])
+                all_success = False
+                results_incomplete = True
+                continue
 
             db_changed, new_db_name = self.has_change_db_cmd(sql)
 
@@ -599,9 +684,39 @@ class MssqlCli(object):
             if all_success:
                 meta_changed = meta_changed or self.has_meta_cmd(text)
 
-        return output, MetaQuery(
+        return MetaQuery(
             text, all_success, total, meta_changed, db_changed, path_changed, mutated,
-            contains_secure_statement)
+            contains_secure_statement, results_incomplete)
+
+    def _format_result(self, rows, columns, status):
+        """ Returns the lines of output for a result. """
+        if self.export_format:
+            # Keep messages out of the exported data.
+            if status:
+                click.echo(status, err=True)
+            return export_rows(self.export_format, rows, columns) if columns else []
+
+        if self.interactive_mode and self.auto_expand and self.prompt_session:
+            max_width = self.prompt_session.output.get_size().columns
+        else:
+            max_width = None
+
+        settings = OutputSettings(
+            table_format=self.table_format,
+            dcmlfmt=self.decimal_format,
+            floatfmt=self.float_format,
+            missingval=self.null_string,
+            expanded=self.expanded_output,
+            max_width=max_width,
+            case_function=(
+                self.completer.case if self.interactive_mode and
+                self.settings['case_column_headers']
+                else
+                lambda x: x
+            )
+        )
+
+        return self.format_output(None, rows, columns, status, settings)
 
     def _handle_server_closed_connection(self):
         """Used during CLI execution"""
@@ -615,13 +730,34 @@ class MssqlCli(object):
     def shutdown(self):
         """ API for shutting down client """
         self.mssqlcliclient_main.shutdown()
+        if self.sqltoolsclient_pool:
+            self.sqltoolsclient_pool.shutdown()
+
+    def cancel_query(self):
+        """
+        Cancel the query running on the main connection. The client is reset if the query
+        cannot be cancelled.
+        """
+        try:
+            error_message = self.mssqlcliclient_main.cancel_query()
+        except KeyboardInterrupt:
+            error_message = u'Interrupted while cancelling the query.'
+
+        if error_message:
+            self.logger.warning(u'Resetting the connection, query cancel failed: %s',
+                                error_message)
+            self.reset()
 
     def reset(self):
         """
         Reset mssqlcli client with a new sql tools service and connection.
         """
         self.sqltoolsclient.shutdown()
-        self.sqltoolsclient = SqlToolsClient()
+        if self.sqltoolsclient_pool:
+            self.sqltoolsclient = self.sqltoolsclient_pool.get_client()
+        else:
+            self.sqltoolsclient = SqlToolsClient(
+                enable_asyncio_transport=self.enable_asyncio_transport)
 
         self.mssqlcliclient_main = self.mssqlcliclient_main.clone(self.sqltoolsclient)
 
@@ -644,6 +780,9 @@ class MssqlCli(object):
                 self.logger.error(u'Error in reset : %s', error_messages)
                 raise ConnectionResetError(error_messages)
 
+            if self.sqltoolsclient_pool:
+                self.sqltoolsclient_pool.start_spare()
+
     def refresh_completions(self, history=None, persist_priorities='all'):
         # Clone mssqlcliclient to create a new connection with a new owner Uri.
         mssqlclclient_completion_refresher = self.mssqlcliclient_main.clone()
@@ -659,6 +798,23 @@ class MssqlCli(object):
         return [(None, None, None,
                  'Auto-completion refresh started in the background.')]
 
+    def refresh_completions_delta(self):
+        """ Updates the completer with the tables and views created, altered or dropped. """
+        mssqlclclient_completion_refresher = self.mssqlcliclient_main.clone()
+
+        callback = functools.partial(self._on_completions_refreshed,
+                                     persist_priorities='all')
+
+        with self._completer_lock:
+            completer = self.completer
+
+        return self.completion_refresher.refresh_delta(
+            mssqcliclient=mssqlclclient_completion_refresher,
+            completer=completer,
+            completer_lock=self._completer_lock,
+            callbacks=callback,
+            settings=self.settings)
+
     def _on_completions_refreshed(self, new_completer, persist_priorities):
         self._swap_completer_objects(new_completer, persist_priorities)
 
@@ -685,6 +841,11 @@ class MssqlCli(object):
             old_completer = self.completer
             self.completer = new_completer
 
+            # A completer updated by a delta refresh keeps the column loader.
+            if old_completer.column_loader \
+                    and old_completer.column_loader is not new_completer.column_loader:
+                old_completer.column_loader.close()
+
             if persist_priorities == 'all':
                 # Just swap over the entire prioritizer
                 new_completer.prioritizer = old_completer.prioritizer
@@ -704,9 +865,10 @@ class MssqlCli(object):
             self.completer = new_completer
 
     def get_completions(self, text, cursor_position):
+        from prompt_toolkit.document import Document
         with self._completer_lock:
-            return self.completer.get_completions(
-                Document(text=text, cursor_position=cursor_position), None)
+            return list(self.completer.get_completions(
+                Document(text=text, cursor_position=cursor_position), None))
 
     def get_prompt(self, string):
         string = string.replace('\\t', self.now.strftime('%x %X'))
@@ -753,6 +915,8 @@ class MssqlCli(object):
     @staticmethod
     def format_output(title, cur, headers, status, settings):
         # pylint: disable=too-many-locals
+        from cli_helpers.tabular_output import TabularOutputFormatter
+        from cli_helpers.tabular_output.preprocessors import align_decimals, format_numbers
 
         output = []
         expanded = (settings.expanded or settings.table_format == 'vertical')
@@ -1,26 +1,118 @@
 import sys
+import bisect
 import copy
+import functools
+import itertools
+import json
 import logging
+import threading
 import time
-from time import sleep
 import uuid
-import sqlparse
 import click
 from mssqlcli import mssqlqueries
 from mssqlcli.jsonrpc.contracts import connectionservice, queryexecutestringservice as queryservice
 from mssqlcli.packages import special
+from mssqlcli.packages.parseutils.splitter import split_statements
 from mssqlcli.packages.parseutils.meta import ForeignKey
 
 logger = logging.getLogger(u'mssqlcli.mssqlcliclient')
-time_wait_if_no_response = 0.05
+# Seconds to block waiting for a response before checking whether the request completed.
+response_wait_timeout = 1
+# Seconds to wait for a cancelled query to complete.
+query_cancel_timeout = 10
+# Seconds to wait for the service to close a connection.
+disconnect_timeout = 10
 
 
 def generate_owner_uri():
     return u'mssql-cli-' + uuid.uuid4().urn
 
 
+class ResultSetFetchError(Exception):
+    """ Raised while iterating over result set rows when a page of rows could not be fetched. """
+
+
+class ResultSetRows(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """
+        Rows of a single result set, fetched from the tools service in pages of at most
+        page_size rows while iterating. Only the first page and the page being iterated are
+        kept in memory, so memory use is bounded by the page size instead of the size of the
+        result set, as long as the consumer does not keep the rows. The exports of --format
+        stream them, while table output is formatted once all rows are read.
+
+        Each iteration starts with the first page it was created with, if any, and fetches
+        the other pages again.
+    """
+
+    def __init__(self, fetch_page, row_count, page_size, first_page=None):
+        self._fetch_page = fetch_page
+        self._first_page = first_page
+        self.row_count = row_count
+        self.page_size = page_size or row_count
+
+    def __len__(self):
+        return self.row_count
+
+    def __iter__(self):
+        return self._iter_rows(
+            lambda result_row: [cell.display_value for cell in result_row.result_cells])
+
+    def values(self):
+        """
+            Iterates over the rows like iter() does, with None instead of the display value of
+            null cells.
+        """
+        return self._iter_rows(
+            lambda result_row: [None if cell.is_null else cell.display_value
+                                for cell in result_row.result_cells])
+
+    def _iter_rows(self, row_values):
+        rows_start_index = 0
+        page = self._first_page
+
+        while rows_start_index < self.row_count:
+            if page is None:
+                page, _ = self._fetch_page(
+                    rows_start_index, min(self.page_size, self.row_count - rows_start_index))
+
+            if page.error_message or not page.rows:
+                logger.error(u'Fetching result set of %s rows stopped at row %s: %s',
+                             self.row_count, rows_start_index, page.error_message)
+                raise ResultSetFetchError(
+                    u'Fetching the result set of {} rows stopped at row {}: {}'.format(
+                        self.row_count, rows_start_index,
+                        page.error_message or u'no rows returned'))
+
+            for result_row in page.rows:
+                yield row_values(result_row)
+
+            rows_start_index += len(page.rows)
+            page = None
+
+
 class MssqlCliClient:
     # pylint: disable=too-many-instance-attributes
+    BATCH_SEPARATOR = u'\nGO\n'
+    # Maximum number of statements sent as batches of one request when pipelining.
+    PIPELINE_STATEMENT_COUNT = 1000
+    # Undoes the session state a connection may be left with that can be undone, and counts
+    # the temporary objects created since the session logged in, which cannot. Other sessions'
+    # objects are counted too, and dropped temporary tables cached by the server are not.
+    SESSION_RESET_QUERY = (
+        u'IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;\n'
+        u'SET ROWCOUNT 0;\n'
+        u'SET NOCOUNT OFF;\n'
+        u'SET XACT_ABORT OFF;\n'
+        u'SET IMPLICIT_TRANSACTIONS OFF;\n'
+        u'SET LOCK_TIMEOUT -1;\n'
+        u'SET TRANSACTION ISOLATION LEVEL READ COMMITTED;\n'
+        u'SELECT COUNT(*) FROM tempdb.sys.objects\n'
+        u"WHERE name LIKE N'#%'\n"
+        u"AND name NOT LIKE N'#[0-9A-F][0-9A-F][0-9A-F][0-9A-F][0-9A-F][0-9A-F][0-9A-F][0-9A-F]'\n"
+        u'AND create_date >= (SELECT login_time FROM sys.dm_exec_sessions '
+        u'WHERE session_id = @@SPID);'
+    )
 
     def __init__(self, mssqlcli_options, sql_tools_client, owner_uri=None, **kwargs):
 
@@ -43,15 +135,24 @@ class MssqlCliClient:
         self.application_intent = mssqlcli_options.application_intent
         self.multi_subnet_failover = mssqlcli_options.multi_subnet_failover
         self.packet_size = mssqlcli_options.packet_size
+        self.fetch_page_size = mssqlcli_options.fetch_page_size
+        self.pipeline_statements = mssqlcli_options.pipeline_statements
 
         self.owner_uri = owner_uri if owner_uri else generate_owner_uri()
         self.sql_tools_client = sql_tools_client
         self.is_connected = False
+        # Request of the query running on the connection.
+        self.active_query_request = None
         self.server_version = None
         self.server_edition = None
         self.is_cloud = False
 
         self.extra_params = kwargs
+        # Idle connections shared with clones, which connect with them when they can.
+        self.connection_pool = ConnectionPool()
+        # Key and database of the connection when it was opened.
+        self.connection_key = None
+        self.connection_database = None
 
         logger.info(u'Initialized MssqlCliClient with owner Uri %s', self.owner_uri)
 
@@ -84,14 +185,129 @@ class MssqlCliClient:
 
         return base_connection_params
 
+    def get_connection_key(self):
+        """ Returns a string identifying the connection parameters, without the owner Uri. """
+        connection_params = self.add_optional_connection_params(
+            self.get_base_connection_params())
+        del connection_params[u'OwnerUri']
+        return json.dumps(connection_params, sort_keys=True)
+
     def connect_to_database(self):
+        if self.is_connected:
+            return self.owner_uri, []
+
+        key = self.get_connection_key()
+        pooled_client = self.connection_pool.acquire(key)
+        if pooled_client:
+            self._take_connection(pooled_client)
+            return self.owner_uri, []
+
         connection_params = self.get_base_connection_params()
         connection_params = self.add_optional_connection_params(connection_params)
 
         owner_uri, error_messages = self._execute_connection_request_with(connection_params)
+        if owner_uri:
+            self.connection_key = key
+            self.connection_database = self.connected_database
 
         return owner_uri, error_messages
 
+    def release_connection(self, reset_session=False):
+        """
+            Returns the connection to the pool, for the next clone connecting with the same
+            parameters, or closes it if a transaction may be open on it. The client must not be
+            used afterwards. The next client sees the session state left on the connection, so
+            connections that ran user queries should be closed with disconnect() instead, or
+            reset with reset_session, which closes them if temporary objects may be left.
+        """
+        if not self.is_connected or self.cancel_query() is not None:
+            return
+
+        if reset_session and not self.reset_session():
+            logger.info(u'Closing the connection of owner Uri %s, whose session was not reset.',
+                        self.owner_uri)
+            self.disconnect()
+            return
+
+        transaction_count = self.get_transaction_count()
+        if transaction_count != 0:
+            # The next client would run in the transaction, which closing the connection rolls
+            # back now rather than once the pool evicts it.
+            logger.info(u'Closing the connection of owner Uri %s, with %s open transactions.',
+                        self.owner_uri, transaction_count)
+            self.disconnect()
+            return
+
+        # A connection whose database changed with USE is reused for that database.
+        key = self.connection_key if self.connected_database == self.connection_database \
+            else self.get_connection_key()
+        self.connection_pool.release(key, self)
+
+    def ping(self):
+        """ Returns True if a trivial query succeeds on the connection. """
+        try:
+            return all(not is_error for _, _, _, _, is_error in self._execute_query(u'SELECT 1'))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.info(u'Ping of owner Uri %s failed: %s', self.owner_uri, e)
+            return False
+
+    def reset_session(self):
+        """
+            Rolls back open transactions and resets the SET options a query is most likely to
+            change. Returns True if no temporary objects may be left on the session, which the
+            reset does not drop. The SET options not reset, such as LANGUAGE or DATEFORMAT, and
+            SESSION_CONTEXT are kept.
+        """
+        try:
+            for rows, _, _, _, is_error in self._execute_query(self.SESSION_RESET_QUERY):
+                if is_error:
+                    return False
+                for row in rows or ():
+                    return int(row[0]) == 0
+        except Exception as e:  # pylint: disable=broad-except
+            logger.info(u'Session reset of owner Uri %s failed: %s', self.owner_uri, e)
+        return False
+
+    def get_transaction_count(self):
+        """ Returns the number of transactions open on the connection, or None if unknown. """
+        try:
+            for rows, _, _, _, is_error in self.execute_query(u'SELECT @@TRANCOUNT'):
+                if is_error or not rows:
+                    break
+                for row in rows:
+                    return int(row[0])
+        except Exception as e:  # pylint: disable=broad-except
+            logger.info(u'Transaction count of owner Uri %s failed: %s', self.owner_uri, e)
+        return None
+
+    def disconnect(self):
+        """ Closes the connection. """
+        disconnect_request = self.sql_tools_client.create_request(
+            self.sql_tools_client.DISCONNECT_REQUEST,
+            {u'OwnerUri': self.owner_uri},
+            # Only match the response by request id, as for query/cancel.
+            None
+        )
+        disconnect_request.execute()
+        self.is_connected = False
+
+        deadline = time.time() + disconnect_timeout
+        while not disconnect_request.completed() and time.time() < deadline:
+            response = disconnect_request.get_response(response_wait_timeout)
+            if isinstance(response, connectionservice.DisconnectResponse) \
+                    and response.error_message:
+                logger.error(u'Disconnect of owner Uri %s failed: %s', self.owner_uri,
+                             response.error_message)
+        logger.info(u'Disconnected owner Uri %s', self.owner_uri)
+
+    def _take_connection(self, mssqlcliclient):
+        """ Uses the connection of a client released to the pool. """
+        for name in (u'owner_uri', u'is_connected', u'server_version', u'server_edition',
+                     u'is_cloud', u'connected_database', u'connection_key',
+                     u'connection_database'):
+            setattr(self, name, getattr(mssqlcliclient, name))
+        logger.info(u'Reusing the connection of owner Uri %s', self.owner_uri)
+
     def execute_query(self, query):
         # Try to run first as special command
         try:
@@ -104,16 +320,48 @@ class MssqlCliClient:
             if not query:
                 yield None, None, None, query, False
             else:
-                for single_query in sqlparse.split(query):
-                    # Remove spaces, EOL and semi-colons from end
-                    single_query = single_query.strip()
-                    if single_query:
-                        for rows, columns, status, statement, is_error \
-                            in self._execute_query(single_query):
-                            yield rows, columns, status, statement, is_error
-                    else:
-                        yield None, None, None, None, False
-                        continue
+                for rows, columns, status, statement, is_error \
+                        in self.execute_statements(split_statements(query)):
+                    yield rows, columns, status, statement, is_error
+
+    def execute_statements(self, statements):
+        """
+            Executes sql statements from an iterable, which may lazily read them from a file
+            with iter_statements(), and yields the results of each statement. Statements that
+            are special commands are run as such.
+        """
+        queries = []
+        for statement in statements:
+            if statement and special.is_special_command(statement):
+                # Queries before the special command run first.
+                for result in self._execute_queries(queries):
+                    yield result
+                queries = []
+                for result in special.execute(self, statement):
+                    yield result
+                continue
+
+            queries.append(statement)
+            if not self.pipeline_statements or len(queries) == self.PIPELINE_STATEMENT_COUNT:
+                for result in self._execute_queries(queries):
+                    yield result
+                queries = []
+
+        for result in self._execute_queries(queries):
+            yield result
+
+    def _execute_queries(self, queries):
+        if len(queries) > 1:
+            results = self._execute_pipelined_queries(queries)
+        elif queries and queries[0]:
+            results = self._execute_query(queries[0])
+        elif queries:
+            results = [(None, None, None, None, False)]
+        else:
+            results = []
+
+        for rows, columns, status, statement, is_error in results:
+            yield rows, columns, status, statement, is_error
 
     def _execute_query(self, query):
         query_response, query_messages, query_had_error \
@@ -125,16 +373,82 @@ class MssqlCliClient:
                                                          is_error=query_had_error)
             return
 
-        if self._no_results_found_in(query_response) or self._no_rows_found_in(query_response):
+        batch_summary = query_response.batch_summaries[0] \
+            if query_response.batch_summaries else None
+
+        for result in self._generate_batch_results(query, query_response.owner_uri, batch_summary,
+                                                   query_messages, query_had_error):
+            yield result
+
+    def _execute_pipelined_queries(self, queries):
+        """
+            Executes the queries as GO separated batches of a single request instead of one
+            request per query, and yields the results of each query in order. Batches are
+            matched to their query by the line they start on.
+        """
+        batch_queries = [query for query in queries if query]
+        start_lines = []
+        line = 0
+        for batch_query in batch_queries:
+            start_lines.append(line)
+            # Skip the lines of the query and the separator.
+            line += batch_query.count(u'\n') + 2
+
+        query_response, query_messages, query_had_error \
+            = self._execute_query_execute_request_for(self.BATCH_SEPARATOR.join(batch_queries))
+
+        if self._exception_found_in(query_response):
+            yield self._generate_query_results_to_tuples(query=batch_queries[0],
+                                                         message=query_response.exception_message,
+                                                         is_error=query_had_error)
+            return
+
+        batch_summaries_by_query = [[] for _ in batch_queries]
+        for batch_summary in query_response.batch_summaries:
+            batch_start_line = batch_summary.selection_start_line \
+                if batch_summary.selection_start_line is not None \
+                else start_lines[min(batch_summary.request_id, len(start_lines) - 1)]
+            # A query the service split into several batches gets all of them.
+            query_index = max(bisect.bisect_right(start_lines, batch_start_line) - 1, 0)
+            batch_summaries_by_query[query_index].append(batch_summary)
+
+        messages_by_batch = {}
+        for query_message in query_messages:
+            messages_by_batch.setdefault(query_message.batch_id, []).append(query_message)
+
+        batch_summaries = iter(batch_summaries_by_query)
+        for query in queries:
+            if not query:
+                yield None, None, None, None, False
+                continue
+
+            query_batch_summaries = next(batch_summaries)
+            if not query_batch_summaries:
+                yield self._generate_query_results_to_tuples(query=query, message=u'')
+
+            for batch_summary in query_batch_summaries:
+                batch_messages = messages_by_batch.get(batch_summary.request_id, [])
+                batch_had_error = batch_summary.has_error or \
+                    (batch_messages[0].is_error if batch_messages else False)
+
+                for result in self._generate_batch_results(query, query_response.owner_uri,
+                                                           batch_summary, batch_messages,
+                                                           batch_had_error):
+                    yield result
+
+    def _generate_batch_results(self, query, owner_uri, batch_summary, query_messages,
+                                query_had_error):
+        # pylint: disable=too-many-arguments
+        if self._no_results_found_in(batch_summary) or self._no_rows_found_in(batch_summary):
             query_message = query_messages[0].message if query_messages else u''
             yield self._generate_query_results_to_tuples(query=query,
                                                          message=query_message,
                                                          is_error=query_had_error)
         else:
             query_subset_responses_and_summaries \
-                = self._execute_query_subset_request_for(query_response)
+                = self._execute_query_subset_request_for(owner_uri, batch_summary)
 
-            for query_subset_response, result_set_summary, query_subset_error \
+            for query_subset_response, result_set_summary, query_subset_error, rows \
                 in query_subset_responses_and_summaries:
                 if self._error_message_found_in(query_subset_response):
                     yield self._generate_query_results_to_tuples(query=query,
@@ -148,7 +462,7 @@ class MssqlCliClient:
 
                 yield self._generate_query_results_to_tuples(
                     column_info=result_set_summary.column_info,
-                    result_rows=query_subset_response.rows,
+                    result_rows=rows,
                     query=query,
                     message=query_message_for_current_result_set
                 )
@@ -157,9 +471,14 @@ class MssqlCliClient:
         cloned_mssqlcli_client = copy.copy(self)
         cloned_mssqlcli_client.owner_uri = generate_owner_uri()
         cloned_mssqlcli_client.is_connected = False
+        cloned_mssqlcli_client.active_query_request = None
+        cloned_mssqlcli_client.connection_key = None
+        cloned_mssqlcli_client.connection_database = None
 
         if sqltoolsclient:
             cloned_mssqlcli_client.sql_tools_client = sqltoolsclient
+            # The connections of the pool belong to the previous service.
+            cloned_mssqlcli_client.connection_pool = ConnectionPool()
 
         return cloned_mssqlcli_client
 
@@ -177,15 +496,13 @@ class MssqlCliClient:
         response = None
 
         while not connection_request.completed():
-            response = connection_request.get_response()
+            response = connection_request.get_response(response_wait_timeout)
 
             if isinstance(response, connectionservice.ConnectionCompleteEvent):
                 if response.error_message:
                     error_messages.append(u'Error message: {}'.format(response.error_message))
                 if response.messages:
                     logger.error(response.messages)
-            else:
-                time.sleep(time_wait_if_no_response)
 
         if response and response.connection_id:
             assert response.owner_uri == self.owner_uri
@@ -217,15 +534,16 @@ class MssqlCliClient:
             },
             self.owner_uri
         )
+        # Kept until the query completes, so it can be cancelled if waiting is interrupted.
+        self.active_query_request = query_request
         query_request.execute()
         query_response = None
         query_messages = []
         while not query_request.completed():
-            query_response = query_request.get_response()
+            query_response = query_request.get_response(response_wait_timeout)
             if isinstance(query_response, queryservice.QueryMessageEvent):
                 query_messages.append(query_response)
-            else:
-                sleep(time_wait_if_no_response)
+        self.active_query_request = None
 
         query_has_exception = query_response.exception_message
         query_has_error_messages = query_messages[0].is_error if query_messages else False
@@ -237,36 +555,89 @@ class MssqlCliClient:
 
         return query_response, query_messages, query_failed
 
-    def _execute_query_subset_request_for(self, query_response):
-        subset_responses_and_summaries = []
-        for result_set_summary in query_response.batch_summaries[0].result_set_summaries:
-            query_subset_request = self.sql_tools_client.create_request(
-                self.sql_tools_client.QUERY_SUBSET_REQUEST,
-                {
-                    u'OwnerUri': query_response.owner_uri,
-                    u'BatchIndex': result_set_summary.batch_id,
-                    u'ResultSetIndex': result_set_summary.request_id,
-                    u'RowsStartIndex': 0,
-                    u'RowCount': result_set_summary.row_count
-                },
-                self.owner_uri)
-
-            query_subset_request.execute()
-
-            query_subset_response = None
-            while not query_subset_request.completed():
-                query_subset_response = query_subset_request.get_response()
-                if not query_subset_response:
-                    sleep(time_wait_if_no_response)
-
-            query_subset_had_error = query_subset_request.error_message \
-                if hasattr(query_subset_request, 'error_message') else False
-
-            subset_responses_and_summaries.append(
-                (query_subset_response, result_set_summary, query_subset_had_error)
-            )
-
-        return subset_responses_and_summaries
+    def cancel_query(self):
+        """
+            Cancels the query whose execution was interrupted, and waits for it to complete so
+            its events are not taken for those of the next query. Returns an error message if
+            the query could not be cancelled in time.
+        """
+        query_request = self.active_query_request
+        if query_request is None or query_request.completed():
+            self.active_query_request = None
+            return None
+
+        cancel_request = self.sql_tools_client.create_request(
+            self.sql_tools_client.QUERY_CANCEL_REQUEST,
+            {u'OwnerUri': self.owner_uri},
+            # Only match the response by request id, leaving the events of the query to it.
+            None
+        )
+        cancel_request.execute()
+        deadline = time.time() + query_cancel_timeout
+
+        for request in (cancel_request, query_request):
+            while not request.completed():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return u'The query was not cancelled within {} seconds.'.format(
+                        query_cancel_timeout)
+
+                response = request.get_response(min(remaining, response_wait_timeout))
+                if isinstance(response, queryservice.QueryCancelResult):
+                    if response.error_message:
+                        return response.error_message
+                    if response.messages:
+                        # The query completed before it could be cancelled.
+                        logger.info(u'Query cancel: %s', response.messages)
+
+        self.active_query_request = None
+        logger.info(u'Cancelled query of owner Uri %s', self.owner_uri)
+        return None
+
+    def _execute_query_subset_request_for(self, owner_uri, batch_summary):
+        """
+            Yields (first_page, result_set_summary, error, rows) for every result set. Only the
+            first page of each result set is requested up front; `rows` fetches the remaining
+            pages on demand while it is iterated.
+        """
+        for result_set_summary in batch_summary.result_set_summaries:
+            page_size = self.fetch_page_size or result_set_summary.row_count
+
+            query_subset_response, query_subset_had_error = self._execute_query_subset_page(
+                owner_uri, result_set_summary, 0,
+                min(page_size, result_set_summary.row_count))
+
+            rows = ResultSetRows(
+                functools.partial(self._execute_query_subset_page, owner_uri, result_set_summary),
+                result_set_summary.row_count,
+                page_size,
+                first_page=query_subset_response)
+
+            yield query_subset_response, result_set_summary, query_subset_had_error, rows
+
+    def _execute_query_subset_page(self, owner_uri, result_set_summary, rows_start_index,
+                                   row_count):
+        query_subset_request = self.sql_tools_client.create_request(
+            self.sql_tools_client.QUERY_SUBSET_REQUEST,
+            {
+                u'OwnerUri': owner_uri,
+                u'BatchIndex': result_set_summary.batch_id,
+                u'ResultSetIndex': result_set_summary.request_id,
+                u'RowsStartIndex': rows_start_index,
+                u'RowCount': row_count
+            },
+            self.owner_uri)
+
+        query_subset_request.execute()
+
+        query_subset_response = None
+        while not query_subset_request.completed():
+            query_subset_response = query_subset_request.get_response(response_wait_timeout)
+
+        query_subset_had_error = query_subset_request.error_message \
+            if hasattr(query_subset_request, 'error_message') else False
+
+        return query_subset_response, query_subset_had_error
 
     @staticmethod
     def _error_message_found_in(query_subset_response):
@@ -277,13 +648,12 @@ class MssqlCliClient:
         return query_response.exception_message
 
     @staticmethod
-    def _no_results_found_in(query_response):
-        return not query_response.batch_summaries \
-               or not query_response.batch_summaries[0].result_set_summaries
+    def _no_results_found_in(batch_summary):
+        return not batch_summary or not batch_summary.result_set_summaries
 
     @staticmethod
-    def _no_rows_found_in(query_response):
-        return query_response.batch_summaries[0].result_set_summaries[0].row_count == 0
+    def _no_rows_found_in(batch_summary):
+        return batch_summary.result_set_summaries[0].row_count == 0
 
     @staticmethod
     def _generate_query_results_to_tuples(query, message, column_info=None, result_rows=None, \
@@ -295,8 +665,7 @@ class MssqlCliClient:
 
         columns = [col.column_name for col in column_info] if column_info else None
 
-        rows = ([[cell.display_value for cell in result_row.result_cells]
-                 for result_row in result_rows]) if result_rows else ()
+        rows = result_rows if result_rows else ()
 
         return rows, columns, message, query, is_error
 
@@ -363,6 +732,132 @@ class MssqlCliClient:
             for row in tabular_result[0]:
                 yield ForeignKey(*row)
 
+    def get_relation_columns(self, schema, name):
+        """ Yields (column_name, data_type, column_default) tuples of a table or view"""
+        query = mssqlqueries.get_relation_columns(schema, name)
+        logger.info(u'Relation columns query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                yield (row[0], row[1], row[2])
+
+    def get_relation_objects(self):
+        """ Yields (object_id, schema_name, table_name, kind, modify_date) tuples of tables and
+            views, where kind is 'tables' or 'views'"""
+        query = mssqlqueries.get_relation_objects()
+        logger.info(u'Relation objects query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                yield (int(row[0]), row[1], row[2], row[3], row[4])
+
+    def get_relation_changes(self, since):
+        """ Yields (object_id, schema_name, table_name, kind, modify_date) tuples of tables and
+            views created or altered since the modify_date given"""
+        query = mssqlqueries.get_relation_changes(since)
+        logger.info(u'Relation changes query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                yield (int(row[0]), row[1], row[2], row[3], row[4])
+
+    def get_relation_column_changes(self, since):
+        """ Yields (schema_name, table_name, column_name, data_type, column_default, kind) tuples
+            of tables and views created or altered since the modify_date given"""
+        query = mssqlqueries.get_relation_column_changes(since)
+        logger.info(u'Relation column changes query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                yield (row[0], row[1], row[2], row[3], row[4], row[5])
+
+    def get_foreign_key_changes(self, since):
+        """ Yields the foreign keys of tables created or altered since the modify_date given, or
+            referencing them"""
+        query = mssqlqueries.get_foreignkey_changes(since)
+        logger.info(u'Foreign key changes query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                yield ForeignKey(*row)
+
+    def get_relation_count(self):
+        """ Returns the number of tables and views"""
+        query = mssqlqueries.get_relation_count()
+        logger.info(u'Relation count query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                return int(row[0])
+        return None
+
+    def get_relation_object_ids(self):
+        """ Returns the set of object ids of tables and views"""
+        query = mssqlqueries.get_relation_object_ids()
+        logger.info(u'Relation object ids query: %s', query)
+        for tabular_result in self.execute_query(query):
+            return set(int(row[0]) for row in tabular_result[0])
+        return set()
+
+    def get_metadata_version(self):
+        """ Returns a string that changes when the metadata used for completions changes"""
+        query = mssqlqueries.get_metadata_version()
+        logger.info(u'Metadata version query: %s', query)
+        for tabular_result in self.execute_query(query):
+            for row in tabular_result[0]:
+                return u':'.join(row)
+        return None
+
     def shutdown(self):
         self.sql_tools_client.shutdown()
         logger.info(u'Shutdown MssqlCliClient')
+
+
+class ConnectionPool(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Keeps the connections released by clients, keyed by their connection parameters, so
+        the next client connecting with the same parameters uses a connected owner Uri instead
+        of opening a new session on the server. A connection idle for more than ping_idle_time
+        seconds is pinged before it is reused, and one idle for more than max_idle_time seconds
+        is closed the next time the pool is used.
+    """
+    max_idle_time = 300
+    ping_idle_time = 10
+
+    def __init__(self):
+        # Lists of (client, release time) by key, most recently released last.
+        self.idle_clients = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key):
+        """ Returns a client whose connection has the key, or None if there is none. """
+        self.evict()
+        while True:
+            with self.lock:
+                idle_clients = self.idle_clients.get(key)
+                if not idle_clients:
+                    return None
+                mssqlcliclient, released = idle_clients.pop()
+
+            if time.time() - released < self.ping_idle_time or mssqlcliclient.ping():
+                return mssqlcliclient
+            logger.info(u'Closing the connection of owner Uri %s, which failed a ping.',
+                        mssqlcliclient.owner_uri)
+            mssqlcliclient.disconnect()
+
+    def release(self, key, mssqlcliclient):
+        """ Keeps the connection of a client for reuse. """
+        with self.lock:
+            self.idle_clients.setdefault(key, []).append((mssqlcliclient, time.time()))
+        self.evict()
+
+    def evict(self):
+        """ Closes the connections idle for more than max_idle_time seconds. """
+        expired = []
+        oldest = time.time() - self.max_idle_time
+        with self.lock:
+            for key, idle_clients in list(self.idle_clients.items()):
+                expired.extend(client for client, released in idle_clients if released < oldest)
+                idle_clients[:] = [(client, released) for client, released in idle_clients
+                                   if released >= oldest]
+                if not idle_clients:
+                    del self.idle_clients[key]
+
+        for mssqlcliclient in expired:
+            logger.info(u'Closing the idle connection of owner Uri %s', mssqlcliclient.owner_uri)
+            mssqlcliclient.disconnect()
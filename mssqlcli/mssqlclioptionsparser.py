@@ -78,6 +78,15 @@ def create_parser():
         metavar=u'',
         help=u'Set threshold for row limit prompt. Use 0 to disable prompt.')
 
+    args_parser.add_argument(
+        u'--fetch-page-size',
+        dest=u'fetch_page_size',
+        default=get_config()['main'].as_int('fetch_page_size'),
+        type=check_fetch_page_size,
+        metavar=u'',
+        help=u'Number of rows fetched from the server per page. Use 0 to fetch whole result '
+             u'sets at once.')
+
     args_parser.add_argument(
         u'--less-chatty',
         dest=u'less_chatty',
@@ -169,6 +178,23 @@ def create_parser():
         help=u'Specifies the file that receives output from a query.'
     )
 
+    args_parser.add_argument(
+        u'--format',
+        dest=u'export_format',
+        choices=[u'csv', u'tsv', u'jsonl'],
+        metavar=u'',
+        default=None,
+        help=u'Writes the rows of result sets as csv, tsv or jsonl instead of tables, in '
+             u'non-interactive mode. Messages are written to stderr.')
+
+    args_parser.add_argument(
+        u'--pipeline-statements',
+        dest=u'pipeline_statements',
+        action=u'store_true',
+        default=get_config()['main'].as_bool('pipeline_statements'),
+        help=u'Sends the statements of a query or input file to the server as GO separated '
+             u'batches of a single request, instead of one request per statement.')
+
     args_parser.add_argument(
         u'--enable-sqltoolsservice-logging',
         dest=u'enable_sqltoolsservice_logging',
@@ -176,6 +202,55 @@ def create_parser():
         default=False,
         help=u'Enables diagnostic logging for the SqlToolsService.')
 
+    args_parser.add_argument(
+        u'--enable-asyncio-transport',
+        dest=u'enable_asyncio_transport',
+        action=u'store_true',
+        default=False,
+        help=u'Communicates with the SqlToolsService on an asyncio event loop instead of '
+             u'background threads. Requires Python 3.8 or later.')
+
+    args_parser.add_argument(
+        u'--daemon',
+        dest=u'daemon',
+        action=u'store_true',
+        default=False,
+        help=u'Runs a daemon serving the queries and input files of invocations with '
+             u'--use-daemon, so they do not start the SQL Tools Service. Requires Python 3 and '
+             u'Unix sockets.')
+
+    args_parser.add_argument(
+        u'--use-daemon',
+        dest=u'use_daemon',
+        action=u'store_true',
+        default=False,
+        help=u'Runs a query or input file on the daemon started with --daemon, if it is '
+             u'running.')
+
+    args_parser.add_argument(
+        u'--daemon-reuse-connections',
+        dest=u'daemon_reuse_connections',
+        action=u'store_true',
+        default=False,
+        help=u'Keeps the connections of invocations on the daemon for the next ones with the '
+             u'same connection options. Open transactions are rolled back and common SET '
+             u'options reset, but other session state is carried over.')
+
+    args_parser.add_argument(
+        u'--daemon-socket',
+        dest=u'daemon_socket',
+        metavar=u'',
+        default=None,
+        help=u'Location of the Unix socket of the daemon.')
+
+    args_parser.add_argument(
+        u'--profile-startup',
+        dest=u'profile_startup',
+        action=u'store_true',
+        default=False,
+        help=u'Reports the import time of each package and the time of each startup phase '
+             u'to stderr, once the invocation ends.')
+
     args_parser.add_argument(
         u'--prompt',
         dest=u'prompt',
@@ -211,3 +286,21 @@ def check_row_limit(row_limit):
                         u'argument or by setting row_limit in the config file.', fg='red')
             sys.exit(1)
         return row_limit_int
+
+
+def check_fetch_page_size(fetch_page_size):
+    """
+    Validates fetch_page_size option has valid non-negative integer
+    """
+
+    try:
+        fetch_page_size_int = int(fetch_page_size)
+    except ValueError:
+        fetch_page_size_int = -1
+
+    if fetch_page_size_int < 0:
+        click.secho(u'Error: fetch-page-size has been set to an invalid value.\nPlease '
+                    u'specify a non-negative integer using the --fetch-page-size command-line '
+                    u'argument or by setting fetch_page_size in the config file.', fg='red')
+        sys.exit(1)
+    return fetch_page_size_int
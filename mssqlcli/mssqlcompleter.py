@@ -5,8 +5,11 @@
 # pylint: disable=too-many-statements
 
 from __future__ import print_function, unicode_literals
+import copy
+import heapq
 import logging
 import re
+import threading
 from itertools import count, chain
 import operator
 from collections import namedtuple, defaultdict, OrderedDict
@@ -21,11 +24,21 @@ from mssqlcli.packages.parseutils.meta import ColumnMetadata, ForeignKey
 from mssqlcli.packages.parseutils.utils import last_word
 from mssqlcli.packages.parseutils.tables import TableReference
 from mssqlcli.packages.mssqlliterals.main import get_literals
+from mssqlcli.packages.nameindex import NameIndex
 from mssqlcli.packages.prioritization import PrevalenceCounter
 from mssqlcli.util import decode
 
 _logger = logging.getLogger('mssqlcli.mssqlcompleter')
 
+# Collections smaller than this are matched without the name index.
+NAME_INDEX_MIN_CANDIDATES = 500
+# The caches of values derived from candidate names are cleared when they
+# grow larger than this.
+MATCH_CACHE_MAX_SIZE = 100000
+# Number of candidates find_matches goes through between checks for
+# cancellation.
+CANCELLATION_CHECK_INTERVAL = 1000
+
 Match = namedtuple('Match', ['completion', 'priority'])
 
 _SchemaObject = namedtuple('SchemaObject', 'name schema meta')
@@ -68,6 +81,49 @@ def generate_alias(tbl):
                    [l for l, prev in zip(tbl, '_' + tbl) if prev == '_' and l != '_'])
 
 
+class CompletionCancelled(Exception):
+    """Raised by the matchers of a completion that was cancelled."""
+
+
+class _KeyedCandidates(object):
+    # pylint: disable=useless-object-inheritance
+    """Candidates of find_matches grouped by the lower-cased name the name
+    index knows them by, so only the candidates of names matching the text
+    are created and matched.
+
+    :param keyed_items: {lower-cased name: [item]}, with every name in the
+    name index
+    :param count: number of items
+    :param make_candidate: function returning the Candidate of an item
+    :param unkeyed: Candidates of names not in the name index, which are
+    always matched
+    """
+
+    def __init__(self, keyed_items, count, make_candidate, unkeyed=()):
+        self.keyed_items = keyed_items
+        self.count = count
+        self.make_candidate = make_candidate
+        self.unkeyed = unkeyed
+
+    def __len__(self):
+        return self.count + len(self.unkeyed)
+
+    def __iter__(self):
+        return chain((self.make_candidate(item)
+                      for items in self.keyed_items.values() for item in items),
+                     self.unkeyed)
+
+    def matching(self, keys):
+        """Returns the candidates of the names in keys, and the unkeyed ones."""
+        keyed_items = self.keyed_items
+        if len(keys) < len(keyed_items):
+            items = (item for key in keys for item in keyed_items.get(key, ()))
+        else:
+            items = (item for key, key_items in keyed_items.items() if key in keys
+                     for item in key_items)
+        return chain((self.make_candidate(item) for item in items), self.unkeyed)
+
+
 class MssqlCompleter(Completer):
     # keywords_tree: A dict mapping keywords to well known following keywords.
     # e.g. 'CREATE': ['TABLE', 'USER', ...],
@@ -106,6 +162,16 @@ class MssqlCompleter(Completer):
             'qualify_columns', 'if_more_than_one_table')
         self.asterisk_column_order = settings.get(
             'asterisk_column_order', 'table_order')
+        # In lazy column mode, columns are not refreshed with the relations
+        # but loaded on first use by column_loader.
+        self.lazy_columns = settings.get('lazy_columns', False)
+        # When there are more matches than this, only the highest priority
+        # ones are selected, with a heap instead of sorting all matches.
+        # Use 0 to return all matches.
+        self.completion_top_k = settings.get('completion_top_k', 0)
+        self.column_loader = None
+        # Cancellation event of the completion running in each thread.
+        self._cancellation = threading.local()
 
         keyword_casing = settings.get('keyword_casing', 'upper').lower()
         if keyword_casing not in ('upper', 'lower', 'auto'):
@@ -118,13 +184,44 @@ class MssqlCompleter(Completer):
                            'datatypes': {}}
         self.search_path = []
         self.casing = {}
+        # {object_id: (kind, schema_name, rel_name)} of tables and views, and their latest
+        # modify_date, which delta refreshes are queried against.
+        self.relation_objects = {}
+        self.metadata_modified = None
+        # {(obj_type, schema): ({lower-cased name: [SchemaObject]}, count)} of
+        # populate_schema_objects, kept until tables, views or schemas change.
+        self._keyed_schema_objects = {}
 
         self.all_completions = set(self.keywords + self.functions)
+        self.name_index = NameIndex(self.all_completions)
+        self._clear_match_caches()
 
         # initialize attributes to be set later
         self._arg_list_cache = None
         self.special_commands = None
 
+    def clone(self):
+        """Returns a completer with the same settings and a copy of the
+        metadata, which can be updated while this one is used for completions.
+        The prioritizer and column loader are shared."""
+        completer = copy.copy(self)
+        completer.databases = list(self.databases)
+        completer.search_path = list(self.search_path)
+        # Function metadata is only added, and keys the argument list cache.
+        completer.dbmetadata = copy.deepcopy(
+            {kind: metadata for kind, metadata in self.dbmetadata.items()
+             if kind != 'functions'})
+        completer.dbmetadata['functions'] = {
+            schema: dict(functions)
+            for schema, functions in self.dbmetadata['functions'].items()}
+        completer.relation_objects = dict(self.relation_objects)
+        completer.all_completions = set(self.all_completions)
+        completer.name_index = self.name_index.copy()
+        completer._keyed_schema_objects = {}
+        completer._cancellation = threading.local()
+        completer._clear_match_caches()
+        return completer
+
     @staticmethod
     def escape_name(name):
         if name:
@@ -151,10 +248,12 @@ class MssqlCompleter(Completer):
     def extend_database_names(self, databases):
         databases = self.escaped_names(databases)
         self.databases.extend(databases)
+        self.name_index.add(databases)
 
     def extend_keywords(self, additional_keywords):
         self.keywords = self.keywords + additional_keywords
         self.all_completions.update(additional_keywords)
+        self.name_index.add(additional_keywords)
 
     def extend_schemas(self, schemas):
 
@@ -170,6 +269,25 @@ class MssqlCompleter(Completer):
                 metadata[schema] = {}
 
         self.all_completions.update(schemas)
+        self.name_index.add(schemas)
+        self._keyed_schema_objects = {}
+
+    def update_schemas(self, schemas):
+        """add new schemas and remove dropped ones, keeping the objects of
+        existing schemas.
+
+        :param schemas: list of all schema names
+        """
+        schemas = set(self.escaped_names(schemas))
+        for metadata in self.dbmetadata.values():
+            for schema in set(metadata) - schemas:
+                del metadata[schema]
+            for schema in schemas:
+                metadata.setdefault(schema, {})
+
+        self.all_completions.update(schemas)
+        self.name_index.add(schemas)
+        self._keyed_schema_objects = {}
 
     def extend_casing(self, words):
         """ extend casing data
@@ -178,6 +296,14 @@ class MssqlCompleter(Completer):
         """
         # casing should be a dict {lowercasename:PreferredCasingName}
         self.casing = dict((word.lower(), word) for word in words)
+        self._clear_match_caches()
+
+    def _clear_match_caches(self):
+        # {item or (item, display): (lexical_priority, cased item,
+        #                            decoded item, decoded display)}
+        self._name_cache = {}
+        # {(item, display, display_meta, text_len): Completion}
+        self._completion_cache = {}
 
     def extend_relations(self, data, kind):
         """extend metadata for tables or views.
@@ -201,6 +327,47 @@ class MssqlCompleter(Completer):
                 _logger.error('%r %r listed in unrecognized schema %r',
                               kind, relname, schema)
             self.all_completions.add(relname)
+        self.name_index.add(relname for _, relname in data)
+        self._keyed_schema_objects = {}
+
+    def remove_relations(self, data, kind):
+        """remove tables or views, and the foreign keys referencing them.
+
+        :param data: list of (schema_name, rel_name) tuples
+        :param kind: either 'tables' or 'views'
+        """
+        metadata = self.dbmetadata[kind]
+        removed = set()
+        for schema, relname in (self.escaped_names(d) for d in data):
+            if relname in metadata.get(schema, {}):
+                del metadata[schema][relname]
+                removed.add((schema, relname))
+        self._keyed_schema_objects = {}
+
+        if kind != 'tables' or not removed:
+            return
+
+        def references_removed(fk):
+            return (fk.parentschema, fk.parenttable) in removed \
+                or (fk.childschema, fk.childtable) in removed
+
+        for relations in metadata.values():
+            for columns in relations.values():
+                for column in columns.values():
+                    if any(references_removed(fk) for fk in column.foreignkeys):
+                        column.foreignkeys[:] = [
+                            fk for fk in column.foreignkeys if not references_removed(fk)]
+
+    def extend_relation_objects(self, object_data):
+        """extend the object ids of tables and views, and the latest
+        modification date of their metadata.
+
+        :param object_data: list of (object_id, schema_name, rel_name, kind,
+        modify_date) tuples
+        """
+        for object_id, schema, relname, kind, modify_date in object_data:
+            self.relation_objects[object_id] = (kind, schema, relname)
+            self.metadata_modified = max(self.metadata_modified or modify_date, modify_date)
 
     def extend_columns(self, column_data, kind):
         """extend column metadata.
@@ -213,6 +380,7 @@ class MssqlCompleter(Completer):
 
         """
         metadata = self.dbmetadata[kind]
+        colnames = set()
         for schema, relname, colname, datatype, default in column_data:
             (schema, relname, colname) = self.escaped_names(
                 [schema, relname, colname])
@@ -223,7 +391,9 @@ class MssqlCompleter(Completer):
                 default=default
             )
             metadata[schema][relname][colname] = column
-            self.all_completions.add(colname)
+            colnames.add(colname)
+        self.all_completions.update(colnames)
+        self.name_index.add(colnames)
 
     def extend_functions(self, func_data):
 
@@ -233,6 +403,7 @@ class MssqlCompleter(Completer):
         # the function metadata namedtuple for the corresponding function
         metadata = self.dbmetadata['functions']
 
+        funcs = set()
         for f in func_data:
             schema, func = self.escaped_names([f.schema_name, f.func_name])
 
@@ -241,7 +412,9 @@ class MssqlCompleter(Completer):
             else:
                 metadata[schema][func] = [f]
 
-            self.all_completions.add(func)
+            funcs.add(func)
+        self.all_completions.update(funcs)
+        self.name_index.add(funcs)
 
         self._refresh_arg_list_cache()
 
@@ -289,10 +462,13 @@ class MssqlCompleter(Completer):
         # storing any metadata beyond typename, so just store None
         meta = self.dbmetadata['datatypes']
 
+        type_names = set()
         for t in type_data:
             schema, type_name = self.escaped_names(t)
             meta[schema][type_name] = None
-            self.all_completions.add(type_name)
+            type_names.add(type_name)
+        self.all_completions.update(type_names)
+        self.name_index.add(type_names)
 
     def extend_query_history(self, text, is_init=False):
         if is_init:
@@ -304,6 +480,7 @@ class MssqlCompleter(Completer):
 
     def set_search_path(self, search_path):
         self.search_path = self.escaped_names(search_path)
+        self._keyed_schema_objects = {}
 
     def reset_completions(self):
         self.databases = []
@@ -311,7 +488,15 @@ class MssqlCompleter(Completer):
         self.search_path = []
         self.dbmetadata = {'tables': {}, 'views': {}, 'functions': {},
                            'datatypes': {}}
+        self.relation_objects = {}
+        self.metadata_modified = None
+        self._keyed_schema_objects = {}
         self.all_completions = set(self.keywords + self.functions)
+        self.name_index = NameIndex(self.all_completions)
+        self._clear_match_caches()
+        if self.column_loader:
+            self.column_loader.close()
+            self.column_loader = None
 
     def find_matches(self, text, collection, mode='fuzzy', meta=None):
         """Find completion matches for the given text.
@@ -387,10 +572,33 @@ class MssqlCompleter(Completer):
                     match_item = -float('Infinity'), -match_point
                 return match_item
 
+        # Indexed names that do not contain the text as a subsequence cannot
+        # match it. The other synonyms of a candidate are aliases generated
+        # from its first one, so they cannot match either.
+        name_index = self.name_index
+        index_matches = None
+        if fuzzy and text and hasattr(collection, '__len__') \
+                and len(collection) >= NAME_INDEX_MIN_CANDIDATES:
+            index_matches = name_index.matching(text)
+            if isinstance(collection, _KeyedCandidates):
+                # Only go through the candidates of the matching names.
+                collection = collection.matching(index_matches)
+                index_matches = None
+
+        cancelled = getattr(self._cancellation, 'event', None)
+        name_cache = self._name_cache
+        completion_cache = self._completion_cache
         matches = []
-        for cand in collection:
+        for i, cand in enumerate(collection):
+            if cancelled is not None and not i % CANCELLATION_CHECK_INTERVAL \
+                    and cancelled.is_set():
+                raise CompletionCancelled()
             if isinstance(cand, _Candidate):
                 item, prio, display_meta, synonyms, prio2, display = cand
+                if index_matches is not None:
+                    key = synonyms[0].lower()
+                    if key not in index_matches and key in name_index:
+                        continue
                 if display_meta is None:
                     display_meta = meta
                 syn_matches = (_match(x) for x in synonyms)
@@ -398,6 +606,10 @@ class MssqlCompleter(Completer):
                 syn_matches = [m for m in syn_matches if m]
                 sort_key = max(syn_matches) if syn_matches else None
             else:
+                if index_matches is not None:
+                    key = cand.lower()
+                    if key not in index_matches and key in name_index:
+                        continue
                 item, display_meta, prio, prio2, display = cand, meta, 0, 0, cand
                 sort_key = _match(cand)
 
@@ -406,49 +618,77 @@ class MssqlCompleter(Completer):
                     # Truncate meta-text to 50 characters, if necessary
                     display_meta = display_meta[:47] + u'...'
 
-                # Lexical order of items in the collection, used for
-                # tiebreaking items with the same match group length and start
-                # position. Since we use *higher* priority to mean "more
-                # important," we use -ord(c) to prioritize "aa" > "ab" and end
-                # with 1 to prioritize shorter strings (ie "user" > "users").
-                # We first do a case-insensitive sort and then a
-                # case-sensitive one as a tie breaker.
-                # We also use the unescape_name to make sure quoted names have
-                # the same priority as unquoted names.
-                lexical_priority = (tuple(0 if c in(' _') else -ord(c) \
-                                    for c in self.unescape_name(item.lower())) +
-                                    (1,) + tuple(c for c in item))
-
-                item = self.case(item)
-                display = self.case(display)
+                # Values derived from the item and display only are computed
+                # once per name, until the casing or metadata changes.
+                name_key = item if display == item else (item, display)
+                derived = name_cache.get(name_key)
+                if derived is None:
+                    derived = self._derive_name_values(item, display)
+                    if len(name_cache) >= MATCH_CACHE_MAX_SIZE:
+                        name_cache.clear()
+                    name_cache[name_key] = derived
+                lexical_priority, item, decoded_item, display = derived
+
                 priority = (
                     sort_key, type_priority, prio, priority_func(item),
                     prio2, lexical_priority
                 )
 
-                item = decode(item)
-                display_meta = decode(display_meta)
-                display = decode(display)
-
-                matches.append(
-                    Match(
-                        completion=Completion(
-                            text=item,
-                            start_position=-text_len,
-                            display_meta=display_meta,
-                            display=display
-                        ),
-                        priority=priority
+                completion_key = (decoded_item, display, display_meta, text_len)
+                completion = completion_cache.get(completion_key)
+                if completion is None:
+                    completion = Completion(
+                        text=decoded_item,
+                        start_position=-text_len,
+                        display_meta=decode(display_meta),
+                        display=display
                     )
-                )
+                    if len(completion_cache) >= MATCH_CACHE_MAX_SIZE:
+                        completion_cache.clear()
+                    completion_cache[completion_key] = completion
+
+                matches.append(Match(completion=completion, priority=priority))
         return matches
 
+    def _derive_name_values(self, item, display):
+        """Returns the lexical priority of an item, the cased item, and the
+        cased and decoded item and display."""
+        # Lexical order of items in the collection, used for
+        # tiebreaking items with the same match group length and start
+        # position. Since we use *higher* priority to mean "more
+        # important," we use -ord(c) to prioritize "aa" > "ab" and end
+        # with 1 to prioritize shorter strings (ie "user" > "users").
+        # We first do a case-insensitive sort and then a
+        # case-sensitive one as a tie breaker.
+        # We also use the unescape_name to make sure quoted names have
+        # the same priority as unquoted names.
+        lexical_priority = (tuple(0 if c in(' _') else -ord(c) \
+                            for c in self.unescape_name(item.lower())) +
+                            (1,) + tuple(c for c in item))
+        item = self.case(item)
+        return lexical_priority, item, decode(item), decode(self.case(display))
+
     def case(self, word):
         return self.casing.get(word, word)
 
-    def get_completions(self, document, complete_event, smart_completion=None):
+    def get_completions(self, document, complete_event, smart_completion=None,
+                        cancelled=None):
+        """Returns an iterator over the completions of document, highest
+        priority first.
+
+        cancelled is an optional threading.Event, which makes the matchers and
+        the iterator raise CompletionCancelled once it is set.
+        """
         # pylint: disable=arguments-differ
+        self._cancellation.event = cancelled
+        try:
+            matches = self._get_matches(document, smart_completion)
+        finally:
+            self._cancellation.event = None
 
+        return self._by_priority(matches, cancelled)
+
+    def _get_matches(self, document, smart_completion):
         word_before_cursor = document.get_word_before_cursor(WORD=True)
 
         if smart_completion is None:
@@ -463,6 +703,7 @@ class MssqlCompleter(Completer):
         suggestions = suggest_type(document.text, document.text_before_cursor)
 
         for suggestion in suggestions:
+            self._check_cancelled()
             suggestion_type = type(suggestion)
             _logger.debug('Suggestion type: %r', suggestion_type)
 
@@ -471,11 +712,39 @@ class MssqlCompleter(Completer):
             matcher = self.suggestion_matchers[suggestion_type]
             matches.extend(matcher(self, suggestion, word_before_cursor))
 
-        # Sort matches so highest priorities are first
-        matches = sorted(matches, key=operator.attrgetter('priority'),
-                         reverse=True)
+        return matches
 
-        return [m.completion for m in matches]
+    def _by_priority(self, matches, cancelled):
+        """Yields the completions of matches, highest priority first.
+
+        When there are more than completion_top_k matches, the first ones are
+        selected without sorting all matches, which are only sorted once the
+        rest of the completions is read.
+        """
+        if not self.completion_top_k or len(matches) <= self.completion_top_k:
+            # Sort matches so highest priorities are first
+            for match in sorted(matches, key=operator.attrgetter('priority'), reverse=True):
+                yield match.completion
+            return
+
+        # nlargest is equivalent to the first items of a stable sort, so the
+        # sorted rest of the matches follows them.
+        top = heapq.nlargest(self.completion_top_k, range(len(matches)),
+                             key=lambda i: matches[i].priority)
+        for i in top:
+            yield matches[i].completion
+
+        if cancelled is not None and cancelled.is_set():
+            raise CompletionCancelled()
+        top = set(top)
+        rest = [m for i, m in enumerate(matches) if i not in top]
+        for match in sorted(rest, key=operator.attrgetter('priority'), reverse=True):
+            yield match.completion
+
+    def _check_cancelled(self):
+        cancelled = getattr(self._cancellation, 'event', None)
+        if cancelled is not None and cancelled.is_set():
+            raise CompletionCancelled()
 
     def get_column_matches(self, suggestion, word_before_cursor):
         tables = suggestion.table_refs
@@ -789,17 +1058,37 @@ class MssqlCompleter(Completer):
         return Candidate(item, synonyms=synonyms, prio2=prio2, display=display)
 
     def get_table_matches(self, suggestion, word_before_cursor, alias=False):
-        tables = self.populate_schema_objects(suggestion.schema, 'tables')
-        tables.extend(SchemaObject(tbl.name)
-                      for tbl in suggestion.local_tables)
-        tables = [self._make_cand(t, alias, suggestion) for t in tables]
+        tables = self._get_keyed_candidates(
+            suggestion, 'tables', alias,
+            [self._make_cand(SchemaObject(tbl.name), alias, suggestion)
+             for tbl in suggestion.local_tables])
         return self.find_matches(word_before_cursor, tables, meta='table')
 
     def get_view_matches(self, suggestion, word_before_cursor, alias=False):
-        views = self.populate_schema_objects(suggestion.schema, 'views')
-        views = [self._make_cand(v, alias, suggestion) for v in views]
+        views = self._get_keyed_candidates(suggestion, 'views', alias)
         return self.find_matches(word_before_cursor, views, meta='view')
 
+    def _get_keyed_candidates(self, suggestion, obj_type, alias, unkeyed=()):
+        """Returns the candidates of the tables or views of
+        populate_schema_objects, which are only created for the names
+        matching the text typed."""
+        cache_key = (obj_type, suggestion.schema)
+        keyed = self._keyed_schema_objects.get(cache_key)
+        if keyed is None:
+            objects = self.populate_schema_objects(suggestion.schema, obj_type)
+            keyed_objects = defaultdict(list)
+            for obj in objects:
+                keyed_objects[obj.name.lower()].append(obj)
+            # find_matches only goes through the names of the index.
+            self.name_index.add(keyed_objects)
+            keyed = (dict(keyed_objects), len(objects))
+            self._keyed_schema_objects[cache_key] = keyed
+
+        keyed_objects, count = keyed
+        return _KeyedCandidates(
+            keyed_objects, count,
+            lambda obj: self._make_cand(obj, alias, suggestion), list(unkeyed))
+
     def get_alias_matches(self, suggestion, word_before_cursor):
         aliases = suggestion.aliases
         return self.find_matches(word_before_cursor, aliases,
@@ -921,6 +1210,9 @@ class MssqlCompleter(Completer):
                 else:
                     for reltype in ('tables', 'views'):
                         cols = meta[reltype].get(schema, {}).get(relname)
+                        if cols is not None and self.column_loader:
+                            cols = self.column_loader.get_columns(
+                                reltype, schema, relname)
                         if cols:
                             cols = cols.values()
                             addcols(schema, relname, tbl.alias, reltype, cols)
@@ -982,3 +1274,40 @@ class MssqlCompleter(Completer):
             for meta in metas
             if filter_func(meta)
         ]
+
+
+class CancellableCompleter(Completer):
+    """Completer for the MssqlCompleter returned by get_completer, whose
+    completions stop when cancel() is called or the next completion starts.
+
+    Completions run in a background thread, and prompt_toolkit only starts the
+    completion of the current text once the running one ends, so cancel()
+    should be called when the text changes.
+    """
+
+    def __init__(self, get_completer):
+        super(CancellableCompleter, self).__init__()
+        self.get_completer = get_completer
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Cancels the running completion."""
+        with self._lock:
+            self._cancelled.set()
+
+    def get_completions(self, document, complete_event):
+        cancelled = threading.Event()
+        with self._lock:
+            self._cancelled.set()
+            self._cancelled = cancelled
+
+        try:
+            completions = self.get_completer().get_completions(
+                document, complete_event, cancelled=cancelled)
+            for completion in completions:
+                if cancelled.is_set():
+                    return
+                yield completion
+        except CompletionCancelled:
+            _logger.debug('Completion cancelled: %r', document.text_before_cursor)
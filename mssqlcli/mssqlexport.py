@@ -0,0 +1,46 @@
+import json
+
+from mssqlcli.encodingutils import text_type
+from mssqlcli.mssqlcliclient import ResultSetRows
+
+_DELIMITERS = {u'csv': u',', u'tsv': u'\t'}
+
+
+def export_rows(export_format, rows, columns):
+    """
+        Yields the lines of a result set in an export format: csv or tsv with a header line, or
+        jsonl with an object per row. Values are written as returned by the server, without
+        the alignment and number formatting of tabular output. Null values are empty fields in
+        csv and tsv, where empty strings are quoted, and null in jsonl.
+    """
+    values = rows.values() if isinstance(rows, ResultSetRows) else rows
+
+    if export_format == u'jsonl':
+        return _export_json_lines(values, columns)
+    return _export_delimited(values, columns, _DELIMITERS[export_format])
+
+
+def _export_delimited(values, columns, delimiter):
+    special_characters = (delimiter, u'"', u'\n', u'\r')
+
+    def quote(value):
+        if value is None:
+            return u''
+        if not isinstance(value, text_type):
+            value = text_type(value)
+        if not value or any(character in value for character in special_characters):
+            return u'"' + value.replace(u'"', u'""') + u'"'
+        return value
+
+    yield delimiter.join(quote(column) for column in columns)
+    for row in values:
+        yield delimiter.join(quote(value) for value in row)
+
+
+def _export_json_lines(values, columns):
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    # Objects are built by hand to keep the column order and duplicate column names.
+    keys = [encoder.encode(column) + u': ' for column in columns]
+    for row in values:
+        yield u'{' + u', '.join(key + encoder.encode(value)
+                                for key, value in zip(keys, row)) + u'}'
@@ -0,0 +1,10 @@
+from prompt_toolkit.history import FileHistory
+from mssqlcli.util import security_words_found_in
+
+
+class MssqlFileHistory(FileHistory):
+    def append_string(self, string):
+        if security_words_found_in(string):
+            return
+
+        super(MssqlFileHistory, self).append_string(string)
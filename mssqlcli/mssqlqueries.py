@@ -178,6 +178,188 @@ def get_foreignkeys():
     return normalize(sql)
 
 
+def get_relation_columns(schema, name):
+    """
+    Query string to retrieve the columns of a table or view.
+    :return: string
+    """
+    sql = '''
+        SELECT  name,
+                TYPE_NAME(system_type_id),
+                OBJECT_DEFINITION(default_object_id)
+        FROM sys.columns
+        WHERE object_id = OBJECT_ID(QUOTENAME(%s) + N'.' + QUOTENAME(%s))
+        ORDER BY column_id''' % (quote_string(schema), quote_string(name))
+    return normalize(sql)
+
+
+def get_metadata_version():
+    """
+    Query string to retrieve a version of the metadata used for completions, which changes when
+    objects, schemas, user defined types or databases are created, altered or dropped.
+    :return: string
+    """
+    sql = '''
+        SELECT  objects.object_count,
+                objects.last_modified,
+                objects.object_checksum,
+                schemas.schema_checksum,
+                types.type_checksum,
+                dbs.database_checksum
+        FROM
+        (
+            SELECT  COUNT(*) AS object_count,
+                    CONVERT(NVARCHAR(23), MAX(modify_date), 121) AS last_modified,
+                    CHECKSUM_AGG(object_id) AS object_checksum
+            FROM sys.objects) AS objects
+        CROSS JOIN
+        (
+            SELECT CHECKSUM_AGG(CHECKSUM(name)) AS schema_checksum
+            FROM sys.schemas) AS schemas
+        CROSS JOIN
+        (
+            SELECT CHECKSUM_AGG(CHECKSUM(name)) AS type_checksum
+            FROM sys.types
+            WHERE is_user_defined = 1) AS types
+        CROSS JOIN
+        (
+            SELECT CHECKSUM_AGG(CHECKSUM(name)) AS database_checksum
+            FROM sys.databases) AS dbs'''
+    return normalize(sql)
+
+
+def get_relation_objects():
+    """
+    Query string to retrieve the object id and modification date of all tables and views.
+    :return: string
+    """
+    sql = '''
+        SELECT  o.object_id,
+                s.name,
+                o.name,
+                CASE o.type WHEN 'U' THEN 'tables' ELSE 'views' END,
+                CONVERT(NVARCHAR(23), o.modify_date, 121)
+        FROM sys.objects AS o
+        INNER JOIN sys.schemas AS s
+            ON s.schema_id = o.schema_id
+        WHERE o.type IN ('U', 'V')'''
+    return normalize(sql)
+
+
+def get_relation_changes(since):
+    """
+    Query string to retrieve the tables and views created or altered since a modification date.
+    :return: string
+    """
+    sql = '''
+        SELECT  o.object_id,
+                s.name,
+                o.name,
+                CASE o.type WHEN 'U' THEN 'tables' ELSE 'views' END,
+                CONVERT(NVARCHAR(23), o.modify_date, 121)
+        FROM sys.objects AS o
+        INNER JOIN sys.schemas AS s
+            ON s.schema_id = o.schema_id
+        WHERE o.type IN ('U', 'V') AND o.modify_date >= %s''' % quote_date(since)
+    return normalize(sql)
+
+
+def get_relation_column_changes(since):
+    """
+    Query string to retrieve the columns of the tables and views created or altered since a
+    modification date.
+    :return: string
+    """
+    sql = '''
+        SELECT  s.name,
+                o.name,
+                c.name,
+                TYPE_NAME(c.system_type_id),
+                OBJECT_DEFINITION(c.default_object_id),
+                CASE o.type WHEN 'U' THEN 'tables' ELSE 'views' END
+        FROM sys.columns AS c
+        INNER JOIN sys.objects AS o
+            ON o.object_id = c.object_id
+        INNER JOIN sys.schemas AS s
+            ON s.schema_id = o.schema_id
+        WHERE o.type IN ('U', 'V') AND o.modify_date >= %s
+        ORDER BY 1, 2, c.column_id''' % quote_date(since)
+    return normalize(sql)
+
+
+def get_foreignkey_changes(since):
+    """
+    Query string for returning the foreign keys of the tables created or altered since a
+    modification date, or referencing them.
+    :return: string
+    """
+    sql = '''
+        SELECT
+            fs.name AS fk_table_schema,
+            fo.name AS fk_table_name,
+            fc.name AS fk_column_name,
+            rs.name AS referenced_table_schema,
+            ro.name AS referenced_table_name,
+            rc.name AS referenced_column_name
+        FROM sys.foreign_key_columns AS fkc
+        INNER JOIN sys.objects AS fo
+            ON fo.object_id = fkc.parent_object_id
+        INNER JOIN sys.schemas AS fs
+            ON fs.schema_id = fo.schema_id
+        INNER JOIN sys.columns AS fc
+            ON fc.object_id = fkc.parent_object_id AND fc.column_id = fkc.parent_column_id
+        INNER JOIN sys.objects AS ro
+            ON ro.object_id = fkc.referenced_object_id
+        INNER JOIN sys.schemas AS rs
+            ON rs.schema_id = ro.schema_id
+        INNER JOIN sys.columns AS rc
+            ON rc.object_id = fkc.referenced_object_id
+            AND rc.column_id = fkc.referenced_column_id
+        WHERE fo.modify_date >= %s OR ro.modify_date >= %s
+        ORDER BY 3, 4''' % (quote_date(since), quote_date(since))
+    return normalize(sql)
+
+
+def get_relation_count():
+    """
+    Query string to retrieve the number of tables and views.
+    :return: string
+    """
+    sql = '''
+        SELECT COUNT(*)
+        FROM sys.objects
+        WHERE type IN ('U', 'V')'''
+    return normalize(sql)
+
+
+def get_relation_object_ids():
+    """
+    Query string to retrieve the object ids of all tables and views.
+    :return: string
+    """
+    sql = '''
+        SELECT object_id
+        FROM sys.objects
+        WHERE type IN ('U', 'V')'''
+    return normalize(sql)
+
+
+def quote_string(value):
+    """
+    Returns a string as a unicode string literal.
+    :return: string
+    """
+    return "N'%s'" % value.replace("'", "''")
+
+
+def quote_date(date):
+    """
+    Returns a date string, as retrieved with CONVERT style 121, as a string literal.
+    :return: string
+    """
+    return "'%s'" % date.replace("'", "''")
+
+
 def normalize(sql):
     if (sql == '' or sql is None):
         return sql
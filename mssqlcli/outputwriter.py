@@ -0,0 +1,42 @@
+import click
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+class OutputWriter(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Writes lines of output to a file, or stdout if no file is given, in blocks of about
+        buffer_size characters. Lines are written as they are produced instead of being joined
+        into one string, so memory use does not grow with the size of the output.
+    """
+
+    def __init__(self, output_file=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.output_file = output_file
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffered_size = 0
+        self.lines_written = 0
+
+    def write_lines(self, lines):
+        """ Writes each line followed by a newline. """
+        for line in lines:
+            self.buffer.append(line)
+            self.buffered_size += len(line) + 1
+            self.lines_written += 1
+            if self.buffered_size >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        """ Writes the buffered lines. """
+        if self.buffer:
+            self.buffer.append(u'')
+            click.echo(u'\n'.join(self.buffer), file=self.output_file, nl=False)
+            self.buffer = []
+            self.buffered_size = 0
+
+    def close(self):
+        """ Flushes the buffered lines, writing an empty line if there was no output. """
+        if not self.lines_written:
+            self.write_lines([u''])
+        self.flush()
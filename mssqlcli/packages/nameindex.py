@@ -0,0 +1,86 @@
+from __future__ import unicode_literals
+
+import re
+import threading
+
+
+def _char_mask(text):
+    # Characters are hashed to 64 bits, so a name lacking a bit of the text
+    # lacks one of its characters.
+    mask = 0
+    for c in text:
+        mask |= 1 << (ord(c) & 63)
+    return mask
+
+
+class NameIndex(object):
+    # pylint: disable=useless-object-inheritance
+    """Index of completion names for fuzzy matching.
+
+    Names are looked up lower-cased. matching() returns the names that
+    contain the text typed as a subsequence, which is a superset of the names
+    fuzzy matching accepts. Each name is stored with a mask of its characters,
+    so most names are rejected without running a regex. The matches of the last
+    text are kept, and a text that extends it is only searched for among them,
+    so each keystroke narrows down the previous matches.
+
+    Names are added in place, under a lock which matching() also holds.
+    """
+
+    def __init__(self, names=()):
+        self.masks = {}
+        self._last_matches = (None, None)
+        self._lock = threading.Lock()
+        self.add(names)
+
+    def __contains__(self, key):
+        return key in self.masks
+
+    def __len__(self):
+        return len(self.masks)
+
+    def copy(self):
+        """Return an index of the same names."""
+        index = NameIndex()
+        with self._lock:
+            index.masks = dict(self.masks)
+        return index
+
+    def add(self, names):
+        """Add names to the index."""
+        with self._lock:
+            masks = self.masks
+            count = len(masks)
+            for name in names:
+                if name:
+                    key = name.lower()
+                    if key not in masks:
+                        masks[key] = _char_mask(key)
+
+            if len(masks) != count:
+                self._last_matches = (None, None)
+
+    def matching(self, text):
+        """Return the set of keys that contain text as a subsequence.
+
+        :param text: lower-cased text
+        """
+        with self._lock:
+            last_text, last_matches = self._last_matches
+            if last_text is not None and text.startswith(last_text):
+                if text == last_text:
+                    return last_matches
+                keys = last_matches
+            else:
+                text_mask = _char_mask(text)
+                keys = [key for key, mask in self.masks.items()
+                        if mask & text_mask == text_mask]
+
+            if len(text) == 1:
+                matches = set(key for key in keys if text in key)
+            else:
+                pattern = re.compile('.*?'.join(map(re.escape, text)))
+                matches = set(key for key in keys if pattern.search(key))
+
+            self._last_matches = (text, matches)
+            return matches
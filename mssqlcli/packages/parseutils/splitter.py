@@ -0,0 +1,263 @@
+from __future__ import unicode_literals
+import bisect
+import re
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# Tokens that change how the text following them is split. Keywords must not be part of a
+# longer identifier, a variable (@name), a temporary table (#name) or a qualified name (x.name).
+_TOKEN = re.compile(r"""['"\[;()]|--|/\*|(?<![\w@#$.])(BEGIN|END|CASE|GO)(?![\w@#$])""",
+                    re.IGNORECASE | re.UNICODE)
+# The longest prefix of a token that may be cut off at the end of the text.
+_MAX_PARTIAL_TOKEN = len('BEGIN') - 1
+_BLOCK_COMMENT = re.compile(r'/\*|\*/')
+_NEXT_WORD = re.compile(r'\s*(\w*)', re.UNICODE)
+# What may follow GO on its line: an optional count and comment.
+_GO_LINE_END = re.compile(r'[ \t]*(\d*)[ \t]*(?:--[^\n]*)?\r?(?:\n|\Z)')
+_COMMENTS_ONLY = re.compile(r'\s*(?:(?:--[^\n]*|/\*.*?\*/)\s*)*\Z', re.DOTALL)
+
+# BEGIN starts a block closed by END, except at the start of these statements.
+_BEGIN_STATEMENTS = frozenset(['TRAN', 'TRANSACTION', 'DISTRIBUTED', 'DIALOG', 'CONVERSATION'])
+# END CONVERSATION is a statement and does not close a block.
+_END_STATEMENTS = frozenset(['CONVERSATION'])
+_CLOSING_QUOTES = {"'": "'", '"': '"', '[': ']'}
+
+
+def split_statements(text):
+    """Split T-SQL text into a list of statements."""
+    splitter = StatementSplitter()
+    return splitter.feed(text) + splitter.close()
+
+
+def iter_statements(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the statements of a T-SQL text stream as soon as they have been read."""
+    splitter = StatementSplitter()
+    for chunk in iter(lambda: stream.read(chunk_size), ''):
+        for statement in splitter.feed(chunk):
+            yield statement
+
+    for statement in splitter.close():
+        yield statement
+
+
+def statement_boundaries(text, start=0):
+    """Return the offsets in text after start where statements begin.
+
+    start must be 0 or an offset returned for a text beginning the same way up
+    to it.
+    """
+    # pylint: disable=protected-access
+    splitter = StatementSplitter()
+    splitter.text = text
+    splitter.start = splitter.pos = start
+    # The last statement ends with the text, not at a boundary.
+    return [next_start for _, _, next_start in splitter._split(final=True)][:-1]
+
+
+class StatementBoundaries(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """Statement boundaries of a text being edited.
+
+    The boundaries found in the previous text are kept up to its first change,
+    and the new text is only scanned from the last of them.
+    """
+
+    def __init__(self):
+        self._last = ('', [])
+
+    def find(self, text):
+        """Return the offsets in text where statements begin."""
+        last_text, last_boundaries = self._last
+        unchanged = _common_prefix_length(text, last_text)
+        # A boundary at the first change may depend on the changed text, as
+        # GO at the end of the text does.
+        kept = bisect.bisect_left(last_boundaries, unchanged)
+        boundaries = last_boundaries[:kept]
+        boundaries += statement_boundaries(text, boundaries[-1] if boundaries else 0)
+
+        self._last = (text, boundaries)
+        return boundaries
+
+
+def _common_prefix_length(text, other):
+    low, high = 0, min(len(text), len(other))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text[low:middle] == other[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class StatementSplitter(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    """Incrementally split T-SQL text fed in chunks into statements.
+
+    Statements end with a semicolon outside of parentheses, BEGIN...END and
+    CASE...END blocks, or with a GO line, which also ends any open block. The
+    GO line is not part of the statement unless it has a count, in which case
+    it is kept so the batch is repeated. String literals, quoted and bracketed
+    identifiers and comments are skipped. Unlike sqlparse.split, only the
+    current statement is kept and nothing is tokenized beyond that.
+    """
+
+    def __init__(self):
+        # Text not split yet, starting with the current statement.
+        self.text = ''
+        # Whether the current line is blank before the start of text, where the text of
+        # completed statements was dropped. GO must be the first word on its line.
+        self.line_blank = True
+        # Offset of the current statement in text.
+        self.start = 0
+        # Offset in text up to which tokens have been processed.
+        self.pos = 0
+        # Nesting level of parentheses and BEGIN...END or CASE...END blocks.
+        self.depth = 0
+        # Closing quote or comment the scan is in, if any.
+        self.closing = None
+        self.comment_depth = 0
+
+    def feed(self, text):
+        """Add text, returning the statements it completed."""
+        self.text += text
+        statements = self._texts(self._split(final=False))
+
+        # Drop the text of completed statements, remembering what GO lines need of it.
+        if self.start:
+            line_start = self.text.rfind('\n', 0, self.start) + 1
+            self.line_blank = (not self.text[line_start:self.start].strip() and
+                               (self.line_blank or line_start > 0))
+            self.text = self.text[self.start:]
+            self.pos -= self.start
+            self.start = 0
+
+        return statements
+
+    def close(self):
+        """Return the statements left at the end of the text."""
+        statements = self._texts(self._split(final=True))
+        self.__init__()
+        return statements
+
+    def _texts(self, spans):
+        statements = []
+        for start, end, _ in spans:
+            statement = self.text[start:end].strip()
+            if statement and not _COMMENTS_ONLY.match(statement):
+                statements.append(statement)
+        return statements
+
+    def _split(self, final):
+        # pylint: disable=too-many-branches, too-many-statements
+        text = self.text
+
+        while True:
+            if self.closing:
+                if not self._skip_quoted(final):
+                    break
+                continue
+
+            match = _TOKEN.search(text, self.pos)
+            if not match:
+                self.pos = max(self.pos, len(text) - _MAX_PARTIAL_TOKEN)
+                break
+
+            # A keyword at the end of the text may be the start of a longer word.
+            if match.group(1) and match.end() == len(text) and not final:
+                self.pos = match.start()
+                break
+
+            token = match.group()
+            self.pos = match.end()
+
+            if token == ';':
+                if self.depth <= 0:
+                    for span in self._end_statement(self.pos, self.pos):
+                        yield span
+            elif token == '(':
+                self.depth += 1
+            elif token == ')':
+                self.depth = max(self.depth - 1, 0)
+            elif token in _CLOSING_QUOTES:
+                self.closing = _CLOSING_QUOTES[token]
+            elif token == '--':
+                self.closing = '\n'
+            elif token == '/*':
+                self.closing = '*/'
+                self.comment_depth = 1
+            else:
+                keyword = token.upper()
+                if keyword == 'CASE':
+                    self.depth += 1
+                elif keyword in ('BEGIN', 'END'):
+                    next_word = _NEXT_WORD.match(text, self.pos)
+                    if next_word.end() == len(text) and not final:
+                        self.pos = match.start()
+                        break
+                    next_word = next_word.group(1).upper()
+
+                    if keyword == 'BEGIN' and next_word not in _BEGIN_STATEMENTS:
+                        self.depth += 1
+                    elif keyword == 'END' and next_word not in _END_STATEMENTS:
+                        self.depth = max(self.depth - 1, 0)
+                elif keyword == 'GO':
+                    line_start = text.rfind('\n', 0, match.start()) + 1
+                    line_end = _GO_LINE_END.match(text, self.pos)
+                    if (line_end is None or text[line_start:match.start()].strip() or
+                            (not line_start and not self.line_blank)):
+                        continue
+
+                    if not line_end.group().endswith('\n') and not final:
+                        self.pos = match.start()
+                        break
+
+                    # Keep GO with a count so the batch is repeated.
+                    end = line_end.end() if line_end.group(1) else match.start()
+                    for span in self._end_statement(end, line_end.end()):
+                        yield span
+
+        if final:
+            for span in self._end_statement(len(text), len(text)):
+                yield span
+
+    def _skip_quoted(self, final):
+        """
+        Move past the closing quote or comment. Returns False if more text is needed to find it.
+        """
+        text = self.text
+
+        if self.closing == '*/':
+            # Block comments nest.
+            while self.comment_depth:
+                match = _BLOCK_COMMENT.search(text, self.pos)
+                if not match:
+                    self.pos = max(self.pos, len(text) - 1)
+                    return False
+                self.pos = match.end()
+                self.comment_depth += 1 if match.group() == '/*' else -1
+            self.closing = None
+            return True
+
+        closing_index = text.find(self.closing, self.pos)
+        if closing_index == -1:
+            self.pos = len(text)
+            return False
+
+        self.pos = closing_index + 1
+        if self.closing != '\n':
+            # A doubled closing quote is escaped.
+            if self.pos == len(text) and not final:
+                self.pos = closing_index
+                return False
+            if text.startswith(self.closing, self.pos):
+                self.pos += 1
+                return True
+
+        self.closing = None
+        return True
+
+    def _end_statement(self, end, next_start):
+        start, self.start = self.start, next_start
+        self.depth = 0
+        yield start, end, next_start
@@ -7,18 +7,22 @@ from sqlparse.tokens import Name
 from .mssqlliterals.main import get_literals
 
 
-white_space_regex = re.compile('\\s+', re.MULTILINE)
+# A word and the whitespace after it. Words of a multi-word keyword are
+# separated by whitespace only, so they are consecutive matches.
+word_regex = re.compile(r'(\w+)(\s*)', re.UNICODE)
 
+# Keywords by their upper-cased words, and the most words of a keyword, built
+# on first use.
+_keyword_table = []
 
-def _compile_regex(keyword):
-    # Surround the keyword with word boundaries and replace interior whitespace
-    # with whitespace wildcards
-    pattern = '\\b' + white_space_regex.sub(r'\\s+', keyword) + '\\b'
-    return re.compile(pattern, re.MULTILINE | re.IGNORECASE)
 
-
-keywords = get_literals('keywords')
-keyword_regexs = dict((kw, _compile_regex(kw)) for kw in keywords)
+def get_keyword_table():
+    if not _keyword_table:
+        keyword_words = dict((tuple(kw.upper().split()), kw)
+                             for kw in get_literals('keywords'))
+        _keyword_table[:] = [keyword_words,
+                             max(len(words) for words in keyword_words)]
+    return _keyword_table
 
 
 class PrevalenceCounter:
@@ -41,10 +45,23 @@ class PrevalenceCounter:
 
     def update_keywords(self, text):
         # Count keywords. Can't rely for sqlparse for this, because it's
-        # database agnostic
-        for keyword, regex in keyword_regexs.items():
-            for _ in regex.finditer(text):
-                self.keyword_counts[keyword] += 1
+        # database agnostic. The words of the text are matched against all
+        # keywords in a single pass, each word ending the keywords made of
+        # it and the words right before it.
+        keyword_words, max_keyword_words = get_keyword_table()
+        words = []
+        words_end = -1
+        for match in word_regex.finditer(text):
+            if match.start() != words_end:
+                words = []
+            words.append(match.group(1).upper())
+            del words[:-max_keyword_words]
+            words_end = match.end()
+
+            for i in range(len(words)):
+                keyword = keyword_words.get(tuple(words[i:]))
+                if keyword:
+                    self.keyword_counts[keyword] += 1
 
     def keyword_count(self, keyword):
         return self.keyword_counts[keyword]
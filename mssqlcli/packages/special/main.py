@@ -60,16 +60,7 @@ def execute(mssqlcliclient, sql):
     is not supported a KeyError will be raised.
     """
     command, verbose, pattern = parse_special_command(sql)
-
-    if (command not in COMMANDS) and (command.lower() not in COMMANDS):
-        raise CommandNotFound('Command not found: %s' % command)
-
-    try:
-        special_cmd = COMMANDS[command]
-    except KeyError:
-        special_cmd = COMMANDS[command.lower()]
-        if special_cmd.case_sensitive:
-            raise CommandNotFound('Command not found: %s' % command)
+    special_cmd = _find_special_command(command)
 
     logger.debug(u'Executing special command %s with argument %s.', command, pattern)
 
@@ -83,6 +74,29 @@ def execute(mssqlcliclient, sql):
     return None
 
 
+@export
+def is_special_command(sql):
+    """Return True if sql starts with a special command, without executing it."""
+    try:
+        _find_special_command(parse_special_command(sql)[0])
+    except CommandNotFound:
+        return False
+    return True
+
+
+def _find_special_command(command):
+    if (command not in COMMANDS) and (command.lower() not in COMMANDS):
+        raise CommandNotFound('Command not found: %s' % command)
+
+    try:
+        return COMMANDS[command]
+    except KeyError:
+        special_cmd = COMMANDS[command.lower()]
+        if special_cmd.case_sensitive:
+            raise CommandNotFound('Command not found: %s' % command)
+        return special_cmd
+
+
 @special_command('help', '\\?', 'Show this help.', arg_type=NO_QUERY, aliases=('\\?', '?'))
 def show_help():  # All the parameters are ignored.
     headers = ['Command', 'Shortcut', 'Description']
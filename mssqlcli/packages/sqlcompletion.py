@@ -2,6 +2,7 @@
 
 from __future__ import print_function, unicode_literals
 from collections import namedtuple
+import bisect
 import re
 import sqlparse
 from sqlparse.sql import Comparison, Identifier, Where
@@ -9,6 +10,7 @@ from mssqlcli.packages.parseutils.utils import (
     last_word, find_prev_keyword, parse_partial_identifier)
 from mssqlcli.packages.parseutils.tables import extract_tables
 from mssqlcli.packages.parseutils.ctes import isolate_query_ctes
+from mssqlcli.packages.parseutils.splitter import StatementBoundaries
 from mssqlcli.packages.special.main import parse_special_command
 
 try:
@@ -53,19 +55,46 @@ Alias = namedtuple('Alias', ['aliases'])
 
 Path = namedtuple('Path', [])
 
+# The parsed statements are cleared when there are more than this.
+PARSED_STATEMENTS_MAX_SIZE = 100
+
+# Statement boundaries of the text being edited, kept across keystrokes.
+_statement_boundaries = StatementBoundaries()
+# Parsed state of SqlStatement by statement text, text before the cursor and
+# word before the cursor.
+_parsed_statements = {}
+
 
 class SqlStatement:
     def __init__(self, full_text, text_before_cursor):
-        self.identifier = None
         self.word_before_cursor = word_before_cursor = last_word(
             text_before_cursor, include='many_punctuations')
         full_text = _strip_named_query(full_text)
         text_before_cursor = _strip_named_query(text_before_cursor)
 
-        full_text, text_before_cursor, self.local_tables = \
+        # Only the statement being edited is parsed, and it is only parsed
+        # again once it changes.
+        full_text, text_before_cursor = \
+            _isolate_current_statement(full_text, text_before_cursor)
+        key = (full_text, text_before_cursor, word_before_cursor)
+        state = _parsed_statements.get(key)
+        if state is None:
+            state = self._parse(full_text, text_before_cursor, word_before_cursor)
+            if len(_parsed_statements) >= PARSED_STATEMENTS_MAX_SIZE:
+                _parsed_statements.clear()
+            _parsed_statements[key] = state
+
+        (self.identifier, self.local_tables,
+         self.text_before_cursor_including_last_word, self.full_text,
+         self.text_before_cursor, self.parsed, self.last_token) = state
+
+    @staticmethod
+    def _parse(full_text, text_before_cursor, word_before_cursor):
+        identifier = None
+        full_text, text_before_cursor, local_tables = \
             isolate_query_ctes(full_text, text_before_cursor)
 
-        self.text_before_cursor_including_last_word = text_before_cursor
+        text_before_cursor_including_last_word = text_before_cursor
 
         # If we've partially typed a word then word_before_cursor won't be an
         # empty string. In that case we want to remove the partially typed
@@ -73,27 +102,26 @@ class SqlStatement:
         # will always be the partially typed string which renders the smart
         # completion useless because it will always return the list of
         # keywords as completion.
-        if self.word_before_cursor:
+        if word_before_cursor:
             if word_before_cursor[-1] == '(' or word_before_cursor[0] == '\\':
                 parsed = sqlparse.parse(text_before_cursor)
             else:
                 text_before_cursor = text_before_cursor[:-
                                                         len(word_before_cursor)]
                 parsed = sqlparse.parse(text_before_cursor)
-                self.identifier = parse_partial_identifier(word_before_cursor)
+                identifier = parse_partial_identifier(word_before_cursor)
         else:
             parsed = sqlparse.parse(text_before_cursor)
 
         full_text, text_before_cursor, parsed = \
             _split_multiple_statements(full_text, text_before_cursor, parsed)
 
-        self.full_text = full_text
-        self.text_before_cursor = text_before_cursor
-        self.parsed = parsed
-
-        self.last_token = parsed.token_prev(len(parsed.tokens))[1] \
+        last_token = parsed.token_prev(len(parsed.tokens))[1] \
             if parsed and parsed.token_prev(len(parsed.tokens))[1] else ''
 
+        return (identifier, local_tables, text_before_cursor_including_last_word,
+                full_text, text_before_cursor, parsed, last_token)
+
     def is_insert(self):
         return self.parsed.token_first().value.lower() == 'insert'
 
@@ -175,6 +203,25 @@ def _strip_named_query(txt):
     return txt
 
 
+def _isolate_current_statement(full_text, text_before_cursor):
+    """
+    Returns the full text and text before the cursor of the statement the cursor is in. The
+    cursor is in the previous statement until a character other than whitespace is typed after
+    it.
+    """
+    cursor = len(text_before_cursor)
+    boundaries = _statement_boundaries.find(full_text)
+    start = 0
+    for boundary in reversed(boundaries[:bisect.bisect_right(boundaries, cursor)]):
+        if full_text[boundary:cursor].strip():
+            start = boundary
+            break
+
+    following = bisect.bisect_left(boundaries, cursor)
+    end = boundaries[following] if following < len(boundaries) else len(full_text)
+    return full_text[start:end], text_before_cursor[start:]
+
+
 function_body_pattern = re.compile(r'(\$.*?\$)([\s\S]*?)\1', re.M)
 
 
@@ -1,6 +1,10 @@
+from queue import Queue
 import logging
+import os
 import subprocess
 import io
+import sys
+import threading
 import time
 import uuid
 
@@ -13,6 +17,18 @@ from .config import config_location
 logger = logging.getLogger(u'mssqlcli.sqltoolsclient')
 
 
+def get_process_group_options():
+    """
+        Returns the Popen arguments starting the SqlToolsService in its own process group, so
+        Ctrl+C in the terminal only interrupts the CLI, which then cancels the running query.
+    """
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    if sys.version_info < (3, 2):
+        return {'preexec_fn': os.setpgrp}
+    return {'start_new_session': True}
+
+
 class SqlToolsClient:
     """
         Create sql tools service requests.
@@ -20,12 +36,17 @@ class SqlToolsClient:
     CONNECTION_REQUEST = u'connection_request'
     QUERY_EXECUTE_STRING_REQUEST = u'query_execute_string_request'
     QUERY_SUBSET_REQUEST = u'query_subset_request'
+    QUERY_CANCEL_REQUEST = u'query_cancel_request'
+    DISCONNECT_REQUEST = u'disconnect_request'
 
-    def __init__(self, input_stream=None, output_stream=None, enable_logging=False):
+    def __init__(self, input_stream=None, output_stream=None, enable_logging=False,
+                 enable_asyncio_transport=False):
         """
             Initializes the sql tools client.
             Input and output streams for JsonRpcClient are taken as optional params,
             Else a SqlToolsService process is started and its stdin and stdout is used.
+            With enable_asyncio_transport the process is run by an AsyncJsonRpcClient on a
+            shared event loop, if the Python version supports it.
         """
         self.current_id = uuid.uuid4().int
         self.tools_service_process = None
@@ -37,15 +58,23 @@ class SqlToolsClient:
             sqltoolsservice_args.append('--log-dir')
             sqltoolsservice_args.append(config_location())
 
+        if enable_asyncio_transport and not (input_stream and output_stream):
+            enable_asyncio_transport = self._asyncio_transport_supported()
+
         if input_stream and output_stream:
             self.json_rpc_client = json_rpc_client.JsonRpcClient(
                 input_stream, output_stream)
+        elif enable_asyncio_transport:
+            from mssqlcli.jsonrpc.asyncjsonrpcclient import AsyncJsonRpcClient
+            self.json_rpc_client = AsyncJsonRpcClient(sqltoolsservice_args,
+                                                      get_process_group_options())
         else:
             self.tools_service_process = subprocess.Popen(
                 sqltoolsservice_args,
                 bufsize=0,
                 stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE)
+                stdout=subprocess.PIPE,
+                **get_process_group_options())
 
             self.json_rpc_client = json_rpc_client.JsonRpcClient(
                 self.tools_service_process.stdin,
@@ -58,33 +87,57 @@ class SqlToolsClient:
             logger.info(u'SqlToolsService process id: %s', self.tools_service_process.pid)
 
         self.json_rpc_client.start()
+        if enable_asyncio_transport:
+            logger.info(u'SqlToolsService process id: %s', self.json_rpc_client.process.pid)
         logger.info(u'Sql Tools Client Initialized')
 
+    @staticmethod
+    def _asyncio_transport_supported():
+        if sys.version_info >= (3, 8):
+            return True
+
+        logger.warning(u'The asyncio transport requires Python 3.8 or later, '
+                       u'falling back to the threaded transport.')
+        return False
+
     def create_request(self, request_type, parameters, owner_uri):
         """
             Create request of request type passed in.
         """
         request = None
-        self.current_id = str(uuid.uuid4().int)
+        # Kept in a local, as requests may be created by several threads at once.
+        request_id = self.current_id = str(uuid.uuid4().int)
 
         if request_type == u'connection_request':
             logger.info(u'SqlToolsClient connection request Id %s and owner Uri %s',
-                        self.current_id, owner_uri)
-            request = connection.ConnectionRequest(self.current_id, owner_uri, self.json_rpc_client,
+                        request_id, owner_uri)
+            request = connection.ConnectionRequest(request_id, owner_uri, self.json_rpc_client,
                                                    parameters)
 
         if request_type == u'query_execute_string_request':
             logger.info(u'SqlToolsClient execute string request Id %s and owner Uri %s',
-                        self.current_id, owner_uri)
-            request = query.QueryExecuteStringRequest(self.current_id, owner_uri,
+                        request_id, owner_uri)
+            request = query.QueryExecuteStringRequest(request_id, owner_uri,
                                                       self.json_rpc_client, parameters)
 
         if request_type == u'query_subset_request':
             logger.info(u'SqlToolsClient subset request Id %s and owner Uri %s',
-                        self.current_id, owner_uri)
-            request = query.QuerySubsetRequest(self.current_id, owner_uri,
+                        request_id, owner_uri)
+            request = query.QuerySubsetRequest(request_id, owner_uri,
                                                self.json_rpc_client, parameters)
 
+        if request_type == u'query_cancel_request':
+            logger.info(u'SqlToolsClient cancel request Id %s and owner Uri %s',
+                        request_id, parameters[u'OwnerUri'])
+            request = query.QueryCancelRequest(request_id, owner_uri,
+                                               self.json_rpc_client, parameters)
+
+        if request_type == u'disconnect_request':
+            logger.info(u'SqlToolsClient disconnect request Id %s and owner Uri %s',
+                        request_id, parameters[u'OwnerUri'])
+            request = connection.DisconnectRequest(request_id, owner_uri,
+                                                   self.json_rpc_client, parameters)
+
         return request
 
     def shutdown(self):
@@ -110,3 +163,65 @@ class SqlToolsClient:
                 if not self.tools_service_process.poll():
                     logger.warning(
                         u'\nSql Tools Service process was not shut down properly.')
+
+
+class SqlToolsClientPool(object):
+    # pylint: disable=useless-object-inheritance
+    """
+        Keeps a spare SqlToolsClient whose service process is started in the background by
+        start_spare(), so get_client() hands out a client whose service is already running
+        instead of starting one. The clients are created with the SqlToolsClient arguments
+        given.
+    """
+
+    def __init__(self, **client_args):
+        self.client_args = client_args
+        # Holds the spare client, or the error raised starting it, once it is started.
+        self.spare = None
+        self.lock = threading.Lock()
+
+    def get_client(self):
+        """
+            Returns the spare client, waiting for it to start if needed, or a new client if
+            no spare was started.
+        """
+        with self.lock:
+            spare, self.spare = self.spare, None
+        client = spare.get() if spare else SqlToolsClient(**self.client_args)
+
+        if isinstance(client, Exception):
+            logger.warning(u'Starting a spare Sql Tools Client failed: %s', client)
+            client = SqlToolsClient(**self.client_args)
+        return client
+
+    def shutdown(self):
+        """
+            Shuts down the spare client.
+        """
+        with self.lock:
+            spare, self.spare = self.spare, None
+        if spare:
+            client = spare.get()
+            if not isinstance(client, Exception):
+                client.shutdown()
+
+    def start_spare(self):
+        """
+            Starts a spare client in the background, unless one was already started. Call it
+            once the client in use is initialized, so both do not start at the same time.
+        """
+        spare = Queue(maxsize=1)
+        with self.lock:
+            if self.spare is not None:
+                return
+            self.spare = spare
+
+        def start():
+            try:
+                spare.put(SqlToolsClient(**self.client_args))
+            except Exception as error:  # pylint: disable=broad-except
+                spare.put(error)
+
+        spare_thread = threading.Thread(target=start, name=u'spare_sql_tools_client')
+        spare_thread.daemon = True
+        spare_thread.start()
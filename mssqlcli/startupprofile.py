@@ -0,0 +1,89 @@
+"""
+    Startup time profile of mssql-cli.
+
+    mssql-cli --profile-startup runs the invocation with the other arguments in a child process,
+    with -X importtime on Python 3.7 or later, and reports to stderr the import time of each
+    top-level package, and the time of each phase of the invocation marked with mark().
+"""
+import os
+import subprocess
+import sys
+import time
+
+PROFILE_STARTUP = u'MSSQL_CLI_PROFILE_STARTUP'
+_PHASE_PREFIX = u'mssql-cli startup phase:'
+_IMPORT_PREFIX = u'import time:'
+# Number of packages listed in the report.
+TOP_PACKAGES = 15
+
+_enabled = os.environ.get(PROFILE_STARTUP) == u'1'
+_last_mark = [time.time()]
+
+
+def mark(phase):
+    """ Records the time since the previous mark, or the import of this module, as a phase. """
+    if not _enabled:
+        return
+    now = time.time()
+    elapsed = (now - _last_mark[0]) * 1000000
+    sys.stderr.write(u'{} {} | {:.0f}\n'.format(_PHASE_PREFIX, phase, elapsed))
+    sys.stderr.flush()
+    _last_mark[0] = now
+
+
+def profile_startup(args):
+    """ Runs mssql-cli with the arguments in a child process, and returns its exit code. """
+    command = [sys.executable]
+    if sys.version_info >= (3, 7):
+        command += [u'-X', u'importtime']
+    command += [u'-m', u'mssqlcli.main'] + list(args)
+    env = dict(os.environ)
+    env[PROFILE_STARTUP] = u'1'
+
+    start = time.time()
+    child = subprocess.Popen(command, env=env, stderr=subprocess.PIPE, universal_newlines=True)
+    import_times = {}
+    phases = []
+    for line in child.stderr:
+        if line.startswith(_IMPORT_PREFIX):
+            _add_import_time(import_times, line)
+        elif line.startswith(_PHASE_PREFIX):
+            phase, microseconds = line[len(_PHASE_PREFIX):].rsplit(u'|', 1)
+            phases.append((phase.strip(), int(microseconds)))
+        else:
+            # Errors of the invocation are passed through as they are written.
+            sys.stderr.write(line)
+    exit_code = child.wait()
+
+    sys.stderr.write(format_report(import_times, phases, time.time() - start))
+    return exit_code
+
+
+def _add_import_time(import_times, line):
+    # Lines are "import time: self [us] | cumulative | imported package", where the package
+    # name is indented by its depth.
+    fields = line[len(_IMPORT_PREFIX):].split(u'|')
+    try:
+        self_time = int(fields[0])
+    except ValueError:
+        # The header line.
+        return
+    package = fields[2].strip().split(u'.')[0]
+    import_times[package] = import_times.get(package, 0) + self_time
+
+
+def format_report(import_times, phases, total_time):
+    lines = [u'', u'Startup profile (ms)', u'  Phases:']
+    lines.extend(u'    {:<32}{:>10.1f}'.format(phase, microseconds / 1000.0)
+                 for phase, microseconds in phases)
+    lines.append(u'    {:<32}{:>10.1f}'.format(u'total, with interpreter startup',
+                                               total_time * 1000))
+
+    if import_times:
+        lines.append(u'  Imports by top-level package:')
+        by_time = sorted(import_times.items(), key=lambda item: item[1], reverse=True)
+        lines.extend(u'    {:<32}{:>10.1f}'.format(package, microseconds / 1000.0)
+                     for package, microseconds in by_time[:TOP_PACKAGES])
+        lines.append(u'    {:<32}{:>10.1f}'.format(
+            u'all {} packages'.format(len(import_times)), sum(import_times.values()) / 1000.0))
+    return u'\n'.join(lines) + u'\n'
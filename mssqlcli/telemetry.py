@@ -12,7 +12,6 @@ from functools import wraps
 from datetime import datetime, timedelta
 from mssqlcli import __version__ as mssql_cli_version
 import mssqlcli.config as config
-import mssqlcli.telemetry_upload as telemetry_core
 import mssqlcli.decorators as decorators
 
 PRODUCT_NAME = 'mssqlcli'
@@ -22,7 +21,14 @@ MSSQL_CLI_TELEMETRY_OPT_OUT = 'MSSQL_CLI_TELEMETRY_OPTOUT'
 MSSQL_CLI_IN_DOCKER = 'MSSQL_CLI_IN_DOCKER'
 MSSQL_CLI_TELEMETRY_ID_FILE = 'mssqlcli_telemetry_id.txt'
 
-decorators.is_diagnostics_mode = telemetry_core.in_diagnostic_mode
+
+def _in_diagnostic_mode():
+    # telemetry_upload loads applicationinsights, so it is only imported when needed.
+    import mssqlcli.telemetry_upload as telemetry_core  # pylint: disable=import-outside-toplevel
+    return telemetry_core.in_diagnostic_mode()
+
+
+decorators.is_diagnostics_mode = _in_diagnostic_mode
 
 
 def _user_agrees_to_telemetry(func):
@@ -134,9 +140,13 @@ def upload_payload(payload, service_endpoint_uri, separate_process):
     payload_uploaded = None
     if payload:
         if not separate_process:
+            # pylint: disable=import-outside-toplevel
+            import mssqlcli.telemetry_upload as telemetry_core
             telemetry_core.upload(payload, service_endpoint_uri)
         else:
-            subprocess.Popen([sys.executable, os.path.realpath(telemetry_core.__file__),
+            # Not imported, as it is only run in the separate process.
+            telemetry_upload_file = os.path.join(os.path.dirname(__file__), 'telemetry_upload.py')
+            subprocess.Popen([sys.executable, os.path.realpath(telemetry_upload_file),
                               payload, service_endpoint_uri])
         payload_uploaded = payload
     return payload_uploaded
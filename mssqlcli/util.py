@@ -34,3 +34,14 @@ def is_command_valid(command):
         return False
     else:
         return True
+
+
+security_keywords = ['password', 'secret', 'encrypted_value']
+
+
+def security_words_found_in(query):
+    try:
+        tokens = query.lower()
+        return any([keyword for keyword in security_keywords if keyword in tokens])
+    except AttributeError:
+        return False
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Benchmark of MssqlCompleter table matches with and without the name index.
+
+Generates catalogs of table names and reports the time to get the table matches of a name
+typed one character at a time, as on each keystroke, and the number of matches of the last
+keystroke. With the index, only the candidates of the names it matches are created and
+matched. The index is disabled by raising the number of candidates it is used from. Each run
+starts with empty caches of values derived from names, except the last one, which types the
+name again with the caches filled.
+
+Usage, from the root of the repository:
+    PYTHONPATH=. python tests/benchmarks/bench_find_matches.py [names ...]
+"""
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from mssqlcli import mssqlcompleter
+from mssqlcli.mssqlcompleter import MssqlCompleter
+from mssqlcli.packages.sqlcompletion import Table
+
+WORDS = [u'order', u'item', u'customer', u'invoice', u'line', u'product', u'sales', u'date',
+         u'status', u'amount', u'region', u'store', u'account', u'shipment', u'payment']
+TYPED = u'cust_inv'
+SUGGESTION = Table(schema=None, table_refs=(), local_tables=[])
+
+
+def generate_completer(names):
+    random.seed(names)
+    tables = set()
+    while len(tables) < names:
+        tables.add(u'{0}_{1}_{2}'.format(
+            random.choice(WORDS), random.choice(WORDS), random.randint(0, names)))
+
+    completer = MssqlCompleter()
+    completer.extend_schemas([u'dbo'])
+    completer.extend_relations([(u'dbo', table) for table in tables], kind=u'tables')
+    return completer
+
+
+def type_name(completer):
+    start = time.time()
+    for end in range(1, len(TYPED) + 1):
+        matches = completer.get_table_matches(SUGGESTION, TYPED[:end])
+    return len(matches), time.time() - start
+
+
+def main(*names):
+    # pylint: disable=protected-access
+    print(u'{0:>9} {1:>9} {2:>15} {3:>13} {4:>19}'.format(
+        u'names', u'matches', u'no index (s)', u'index (s)', u'index, cached (s)'))
+    for count in names or (10000, 100000, 1000000):
+        completer = generate_completer(count)
+
+        min_candidates = mssqlcompleter.NAME_INDEX_MIN_CANDIDATES
+        mssqlcompleter.NAME_INDEX_MIN_CANDIDATES = count + 1
+        match_count, scan_time = type_name(completer)
+        mssqlcompleter.NAME_INDEX_MIN_CANDIDATES = min_candidates
+        completer._clear_match_caches()
+        _, index_time = type_name(completer)
+        _, cached_time = type_name(completer)
+        print(u'{0:>9} {1:>9} {2:>15.3f} {3:>13.3f} {4:>19.3f}'.format(
+            count, match_count, scan_time, index_time, cached_time))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for JsonRpcReader buffer management.
+
+Replays the JSON RPC baselines in tests/jsonrpc/baselines, followed by large synthetic
+query/subset responses, through a stream that hands out data in pipe-sized chunks. Reports
+the number of bytes copied per message by the compacting reader and by the previous strategy
+of reallocating the buffer after every message.
+
+Usage, from the root of the repository:
+    PYTHONPATH=. python tests/benchmarks/bench_jsonrpc_reader.py [repeat]
+"""
+from __future__ import print_function
+
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from mssqlcli.jsonrpc.jsonrpcclient import JsonRpcReader
+
+_BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), u'..', u'jsonrpc',
+                             u'baselines')
+CHUNK_SIZE = 65536
+
+
+class ChunkedStream(io.RawIOBase):
+    """ Stream returning at most CHUNK_SIZE bytes per read, like a pipe. """
+
+    def __init__(self, data):
+        super(ChunkedStream, self).__init__()
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        length = min(len(b), CHUNK_SIZE, len(self.data) - self.offset)
+        b[:length] = self.data[self.offset:self.offset + length]
+        self.offset += length
+        return length
+
+
+class ReallocatingJsonRpcReader(JsonRpcReader):
+    """
+        Counts the copies made by the previous reader, which doubled the buffer by copying
+        all of it and reallocated the buffer after every message to drop the bytes read.
+    """
+
+    def compact_buffer(self):
+        self.bytes_copied += len(self.buffer)
+        resized_buffer = bytearray(len(self.buffer) * 2)
+        resized_buffer[:len(self.buffer)] = self.buffer
+        self.buffer = resized_buffer
+
+    def read_response(self):
+        response = super(ReallocatingJsonRpcReader, self).read_response()
+        leftover = self.buffer_end_offset - self.read_offset
+        new_buffer = bytearray(max(len(self.buffer) - self.read_offset,
+                                   self.DEFAULT_BUFFER_SIZE))
+        new_buffer[:leftover] = self.buffer[self.read_offset:self.buffer_end_offset]
+        self.bytes_copied += leftover
+        self.buffer = new_buffer
+        self.read_offset = 0
+        self.buffer_end_offset = leftover
+        return response
+
+
+def encode_message(content):
+    return b'Content-Length: ' + str(len(content)).encode(u'ascii') + b'\r\n\r\n' + content
+
+
+def load_baselines():
+    # Baselines may be checked out with different line endings, which invalidates their
+    # Content-Length headers, so the messages are re-encoded from their content.
+    data = b''
+    for file_name in sorted(os.listdir(_BASELINE_DIR)):
+        with open(os.path.join(_BASELINE_DIR, file_name), 'rb') as baseline:
+            contents = re.split(b'Content-Length: [0-9]+\r?\n\r?\n', baseline.read())
+        data += b''.join(encode_message(content.strip()) for content in contents if content)
+    return data
+
+
+def subset_response(row_count):
+    rows = [[{u'displayValue': u'value {0} {1}'.format(row, col), u'rowId': row,
+              u'isNull': False} for col in range(8)] for row in range(row_count)]
+    return encode_message(json.dumps({u'jsonrpc': u'2.0', u'id': u'1', u'result': {
+        u'resultSubset': {u'rowCount': row_count, u'rows': rows}}}).encode(u'utf-8'))
+
+
+def run(reader_class, data):
+    reader = reader_class(ChunkedStream(data))
+    messages = 0
+    start = time.time()
+    try:
+        while True:
+            reader.read_response()
+            messages += 1
+    except EOFError:
+        pass
+    return messages, reader.bytes_copied, time.time() - start
+
+
+def main(repeat=50):
+    scenarios = [
+        (u'baselines x{0}'.format(repeat), load_baselines() * repeat),
+        (u'subset 5000 rows x20', subset_response(5000) * 20),
+        (u'subset 50000 rows x2', subset_response(50000) * 2),
+    ]
+    print(u'{0:<24} {1:<12} {2:>9} {3:>14} {4:>12} {5:>9}'.format(
+        u'scenario', u'reader', u'messages', u'bytes copied', u'copied/msg', u'seconds'))
+    for name, data in scenarios:
+        for label, reader_class in ((u'compacting', JsonRpcReader),
+                                    (u'reallocating', ReallocatingJsonRpcReader)):
+            messages, bytes_copied, elapsed = run(reader_class, data)
+            print(u'{0:<24} {1:<12} {2:>9} {3:>14} {4:>12.0f} {5:>9.3f}'.format(
+                name, label, messages, bytes_copied, bytes_copied / float(messages), elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
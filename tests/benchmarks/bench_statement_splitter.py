@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Benchmark of the incremental statement splitter against sqlparse.split.
+
+Generates T-SQL scripts of inserts, selects, procedures with BEGIN...END blocks and GO
+separated batches, and reports the time to split each script with sqlparse.split, with
+split_statements, and the time until iter_statements yields the first statement of the
+script read from a stream.
+
+Usage, from the root of the repository:
+    PYTHONPATH=. python tests/benchmarks/bench_statement_splitter.py [megabytes ...]
+"""
+from __future__ import print_function
+
+import io
+import sys
+import time
+
+import sqlparse
+
+from mssqlcli.packages.parseutils.splitter import iter_statements, split_statements
+
+STATEMENTS = [
+    u"INSERT INTO [dbo].[Orders] (Id, Customer, Note) VALUES ({0}, N'Customer {0}', "
+    u"'it''s; fine');\n",
+    u"SELECT o.Id, CASE WHEN o.Id > {0} THEN 'big' ELSE 'small' END AS Size "
+    u"FROM dbo.Orders AS o WHERE o.Id IN (1, 2, {0}); -- lookup {0}\n",
+    u"CREATE PROCEDURE dbo.Proc{0} AS\nBEGIN\n    /* procedure {0}; */\n"
+    u"    SELECT {0};\n    UPDATE dbo.Orders SET Note = 'x' WHERE Id = {0};\nEND;\nGO\n",
+]
+
+
+def generate_script(megabytes):
+    parts = []
+    size = 0
+    i = 0
+    while size < megabytes * 1024 * 1024:
+        part = STATEMENTS[i % len(STATEMENTS)].format(i)
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return u''.join(parts)
+
+
+def timed(function, *args):
+    start = time.time()
+    result = function(*args)
+    return result, time.time() - start
+
+
+def first_statement(script):
+    return next(iter_statements(io.StringIO(script)))
+
+
+def main(*megabytes):
+    print(u'{0:>6} {1:>11} {2:>15} {3:>16} {4:>20}'.format(
+        u'MB', u'statements', u'sqlparse (s)', u'splitter (s)', u'first statement (s)'))
+    for size in megabytes or (1, 5):
+        script = generate_script(size)
+        _, sqlparse_time = timed(sqlparse.split, script)
+        statements, splitter_time = timed(split_statements, script)
+        _, first_statement_time = timed(first_statement, script)
+        print(u'{0:>6} {1:>11} {2:>15.3f} {3:>16.3f} {4:>20.5f}'.format(
+            size, len(statements), sqlparse_time, splitter_time, first_statement_time))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
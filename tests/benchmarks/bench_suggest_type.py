@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Benchmark of suggest_type parsing only the statement being edited.
+
+Takes the suggest_type inputs of tests/test_sqlcompletion.py, prefixes them with a number of
+statements as in a long script, and reports the time to get the suggestions of all inputs by
+parsing the whole text before the cursor, and by parsing only the statement the cursor is in,
+as well as the number of inputs whose suggestions differ. Inputs with GO separated batches are
+left out of that count, as only parsing the current statement keeps the batches apart.
+
+Usage, from the root of the repository:
+    PYTHONPATH=. python tests/benchmarks/bench_suggest_type.py [statements ...]
+"""
+from __future__ import print_function
+
+import ast
+import io
+import os
+import re
+import sys
+import time
+
+from mssqlcli.packages import sqlcompletion
+from mssqlcli.packages.sqlcompletion import suggest_type
+
+STATEMENT = (u'SELECT o.Id, o.Name, c.City FROM dbo.Orders o JOIN dbo.Customers c '
+             u'ON c.Id = o.CustomerId WHERE o.Id > {0};\n')
+GO_LINE = re.compile(r'^\s*GO\s*$', re.IGNORECASE | re.MULTILINE)
+TESTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                     u'test_sqlcompletion.py')
+
+
+def collect_inputs():
+    """ Returns the (full_text, text_before_cursor) literals passed to suggest_type. """
+    with io.open(TESTS, encoding=u'utf-8') as f:
+        tree = ast.parse(f.read())
+
+    inputs = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'suggest_type':
+            try:
+                inputs.append(tuple(ast.literal_eval(arg) for arg in node.args))
+            except ValueError:
+                continue
+    return inputs
+
+
+def parse_whole_text(full_text, text_before_cursor):
+    return full_text, text_before_cursor
+
+
+def suggest(inputs, prefix):
+    start = time.time()
+    suggestions = []
+    for full_text, text_before_cursor in inputs:
+        suggestions.append(suggest_type(prefix + full_text, prefix + text_before_cursor))
+    return suggestions, time.time() - start
+
+
+def main(*counts):
+    # pylint: disable=protected-access
+    inputs = collect_inputs()
+    print(u'{0:>10} {1:>7} {2:>14} {3:>22} {4:>8}'.format(
+        u'statements', u'inputs', u'whole text (s)', u'current statement (s)', u'differ'))
+    for count in counts or (10, 100):
+        prefix = u''.join(STATEMENT.format(i) for i in range(count))
+
+        isolate = sqlcompletion._isolate_current_statement
+        sqlcompletion._isolate_current_statement = parse_whole_text
+        try:
+            expected, whole_time = suggest(inputs, prefix)
+        finally:
+            sqlcompletion._isolate_current_statement = isolate
+        sqlcompletion._parsed_statements.clear()
+        actual, current_time = suggest(inputs, prefix)
+
+        differ = sum(1 for (full_text, _), e, a in zip(inputs, expected, actual)
+                     if set(e) != set(a) and not GO_LINE.search(full_text))
+        print(u'{0:>10} {1:>7} {2:>14.3f} {3:>22.3f} {4:>8}'.format(
+            count, len(inputs), whole_time, current_time, differ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
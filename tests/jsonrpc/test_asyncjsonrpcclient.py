@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import unittest
+import pytest
+
+# Echoes every request back as its response, preceded by an event for the request's owner uri.
+ECHO_SERVICE = u'''
+import json
+import sys
+
+stdin = sys.stdin.buffer
+stdout = sys.stdout.buffer
+while True:
+    header = b''
+    while not header.endswith(b'\\r\\n\\r\\n'):
+        byte = stdin.read(1)
+        if not byte:
+            sys.exit(0)
+        header += byte
+    request = json.loads(stdin.read(int(header.split(b':')[1])).decode('utf-8'))
+    for message in ({'method': 'test/event', 'params': {'ownerUri': request['params']['OwnerUri']}},
+                    {'id': request['id'], 'result': request['params']}):
+        content = json.dumps(message).encode('utf-8')
+        stdout.write(b'Content-Length: ' + str(len(content)).encode('ascii') + b'\\r\\n\\r\\n')
+        stdout.write(content)
+        stdout.flush()
+'''
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason=u'Requires Python 3.8 or later.')
+class AsyncJsonRpcClientTests(unittest.TestCase):
+    """
+        Async Json Rpc client tests.
+    """
+
+    def setUp(self):
+        # pylint: disable=import-outside-toplevel
+        from mssqlcli.jsonrpc.asyncjsonrpcclient import AsyncJsonRpcClient
+        self.test_client = AsyncJsonRpcClient([sys.executable, u'-c', ECHO_SERVICE])
+        self.test_client.start()
+
+    def tearDown(self):
+        self.test_client.shutdown()
+
+    def test_sync_facade(self):
+        """
+            Verify responses and events are retrieved through get_response.
+        """
+        params = {u'OwnerUri': u'test_uri', u'Key': u'Value'}
+        self.test_client.submit_request(u'test/echo', params, u'1')
+
+        responses = [self.test_client.get_response(u'1', u'test_uri', timeout=5)
+                     for _ in range(2)]
+
+        self.assertIn({u'id': u'1', u'result': params}, responses)
+        self.assertIn({u'method': u'test/event', u'params': {u'ownerUri': u'test_uri'}},
+                      responses)
+
+    def test_awaitable_request_and_events(self):
+        """
+            Verify request() returns its response and events() iterates over events.
+        """
+        params = {u'OwnerUri': u'test_uri', u'Key': u'Value'}
+
+        async def echo():
+            events = self.test_client.events(u'test_uri')
+            response = await self.test_client.request(u'test/echo', params, u'2')
+            event = await events.__anext__()
+            events.close()
+            return response, event
+
+        response, event = asyncio.run_coroutine_threadsafe(
+            echo(), self.test_client.loop).result(5)
+
+        self.assertEqual(response, {u'id': u'2', u'result': params})
+        self.assertEqual(event[u'params'], {u'ownerUri': u'test_uri'})
+        # Nothing was left for the sync facade.
+        self.assertIsNone(self.test_client.get_response(u'2', u'test_uri'))
+
+    def test_shutdown(self):
+        """
+            Verify shutdown stops the service process.
+        """
+        self.test_client.shutdown()
+        self.assertIsNotNone(self.test_client.process.returncode)
+
+
+if __name__ == u'__main__':
+    unittest.main()
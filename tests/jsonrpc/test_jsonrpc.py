@@ -185,24 +185,56 @@ class JsonRpcTest(unittest.TestCase):
         response = json_rpc_reader.read_response()
         baseline = {u'key': u'value'}
         self.assertEqual(response, baseline)
-        # Verify message buffer was reset to it's default max size.
-        self.assertEqual(len(json_rpc_reader.buffer), 8192)
+        # Verify message buffer was doubled until the headers fit, after which the content
+        # was read by moving it to the front of the buffer, and that pointers were rewound.
+        self.assertEqual(len(json_rpc_reader.buffer), 32)
+        self.assertEqual(json_rpc_reader.read_offset, 0)
+        self.assertEqual(json_rpc_reader.buffer_end_offset, 0)
 
     def test_max_buffer_resize(self):
         """
-            Verify max buffer resize.
+            Verify the buffer is reused after reading a message.
         """
         test_stream = io.BytesIO(b'Content-Length: 15\r\n\r\n{"key":"value"}')
         json_rpc_reader = jsonrpc.JsonRpcReader(test_stream)
-        # Double buffer size to max to verify resize takes leftover size.
-        json_rpc_reader.buffer = bytearray(16384)
-        # Verify initial buffer size was set.
-        self.assertEqual(len(json_rpc_reader.buffer), 16384)
+        buffer = bytearray(16384)
+        json_rpc_reader.buffer = buffer
         response = json_rpc_reader.read_response()
         baseline = {u'key': u'value'}
         self.assertEqual(response, baseline)
-        # Verify buffer size decreased by bytes_read.
-        self.assertEqual(len(json_rpc_reader.buffer), 16347)
+        # Verify no bytes were copied and the buffer was not reallocated.
+        self.assertIs(json_rpc_reader.buffer, buffer)
+        self.assertEqual(json_rpc_reader.bytes_copied, 0)
+
+    def test_drained_buffer_shrinks_to_default(self):
+        """
+            Verify a buffer grown for a large message is released once it is drained.
+        """
+        content = b'{"key":"' + b'v' * (2 * 1024 * 1024) + b'"}'
+        test_stream = io.BytesIO(
+            b'Content-Length: ' + str(len(content)).encode() + b'\r\n\r\n' + content)
+        json_rpc_reader = jsonrpc.JsonRpcReader(test_stream)
+        response = json_rpc_reader.read_response()
+        self.assertEqual(len(response[u'key']), 2 * 1024 * 1024)
+        self.assertEqual(len(json_rpc_reader.buffer), jsonrpc.JsonRpcReader.DEFAULT_BUFFER_SIZE)
+
+    def test_compact_buffer_moves_only_unread_bytes(self):
+        """
+            Verify leftover bytes of a partial message are moved to the front of the buffer.
+        """
+        message = b'Content-Length: 15\r\n\r\n{"key":"value"}'
+        test_stream = io.BytesIO(message * 3)
+        json_rpc_reader = jsonrpc.JsonRpcReader(test_stream)
+        buffer = bytearray(len(message) * 2 + 10)
+        json_rpc_reader.buffer = buffer
+
+        baseline = {u'key': u'value'}
+        for _ in range(3):
+            self.assertEqual(json_rpc_reader.read_response(), baseline)
+
+        # The 10 bytes of the third message read with the first chunk were moved in place.
+        self.assertIs(json_rpc_reader.buffer, buffer)
+        self.assertEqual(json_rpc_reader.bytes_copied, 10)
 
     def test_read_state(self):
         """
@@ -218,6 +250,26 @@ class JsonRpcTest(unittest.TestCase):
         self.assertTrue(header_read)
         self.assertEqual(json_rpc_reader.read_state, jsonrpc.ReadState.Content)
 
+    def test_header_scan_resumes_across_chunks(self):
+        """
+            Verify headers split across chunks are found without rescanning read bytes.
+        """
+        test_stream = io.BytesIO(b'Content-Length: 15\r\n\r\n{"key":"value"}')
+        json_rpc_reader = jsonrpc.JsonRpcReader(test_stream)
+        json_rpc_reader.buffer = bytearray(20)
+
+        # The first chunk ends in the middle of the CRLFCRLF.
+        json_rpc_reader.read_next_chunk()
+        self.assertFalse(json_rpc_reader.try_read_headers())
+        self.assertEqual(json_rpc_reader.header_scan_length, 20)
+
+        json_rpc_reader.compact_buffer()
+        json_rpc_reader.read_next_chunk()
+        self.assertTrue(json_rpc_reader.try_read_headers())
+        self.assertEqual(json_rpc_reader.header_scan_length, 0)
+        self.assertEqual(json_rpc_reader.expected_content_length, 15)
+        self.assertEqual(json_rpc_reader.read_offset, 22)
+
     def test_case_insensitive_header(self):
         """
             Verify case insensitivty when reading headers.
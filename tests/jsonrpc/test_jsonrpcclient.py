@@ -58,6 +58,48 @@ class JsonRpcClientTests(unittest.TestCase):
         self.assertFalse(test_client.request_thread.is_alive())
         self.assertFalse(test_client.response_thread.is_alive())
 
+    def test_get_response_waits_for_response(self):
+        """
+            Verify get_response with a timeout blocks until the response is read.
+        """
+        input_stream = io.BytesIO()
+        output_stream = io.BytesIO(
+            b'Content-Length: 15\r\n\r\n{"key":"value"}')
+
+        test_client = json_rpc_client.JsonRpcClient(
+            input_stream, output_stream)
+        test_client.start()
+        response = test_client.get_response(timeout=5)
+        baseline = {u'key': u'value'}
+
+        self.assertEqual(response, baseline)
+        JsonRpcClientTests.shutdown_background_threads(test_client)
+
+    def test_get_response_timeout(self):
+        """
+            Verify get_response returns None once the timeout expires without a response.
+        """
+        test_client = json_rpc_client.JsonRpcClient(io.BytesIO(), io.BytesIO())
+
+        start = time.time()
+        self.assertIsNone(test_client.get_response(request_id=1, timeout=.1))
+        self.assertGreaterEqual(time.time() - start, .1)
+
+    def test_request_finished_removes_response_queue(self):
+        """
+            Verify the responses of a finished request are dropped, but not the events.
+        """
+        test_client = json_rpc_client.JsonRpcClient(io.BytesIO(), io.BytesIO())
+        test_client._enqueue_response({u'id': u'1', u'result': {}})
+        test_client._enqueue_response({u'params': {u'ownerUri': u'test_uri'}})
+        self.assertIn(u'1', test_client.response_map)
+        self.assertIn(u'test_uri', test_client.response_map)
+
+        test_client.request_finished(u'1')
+        test_client.request_finished(u'test_uri')
+        test_client.request_finished(0)
+        self.assertEqual(list(test_client.response_map), [0])
+
     def test_submit_simple_request(self):
         """
             Verify simple request submitted.
@@ -0,0 +1,116 @@
+import io
+import pytest
+from mssqlcli.packages.parseutils.splitter import (
+    StatementBoundaries, StatementSplitter, iter_statements, split_statements,
+    statement_boundaries)
+
+
+@pytest.mark.parametrize('sql, statements', [
+    ('select 1; select 2;', ['select 1;', 'select 2;']),
+    ('select 1;\n\n  select 2', ['select 1;', 'select 2']),
+    ("select 'a;b', N'it''s;'; select 2", ["select 'a;b', N'it''s;';", 'select 2']),
+    ('select [a;]]b], "c;""d" from t; select 2',
+     ['select [a;]]b], "c;""d" from t;', 'select 2']),
+    ('select 1 -- not; the end\n; select 2', ['select 1 -- not; the end\n;', 'select 2']),
+    ('select /* a /* nested; */ b; */ 1; select 2',
+     ['select /* a /* nested; */ b; */ 1;', 'select 2']),
+    ('select (1;2); select 3', ['select (1;2);', 'select 3']),
+])
+def test_split_on_semicolons(sql, statements):
+    assert split_statements(sql) == statements
+
+
+def test_begin_end_blocks_are_not_split():
+    sql = ('create procedure p as\nbegin\n  select 1;\n'
+           '  select case when 1 = 1 then 2 end;\nend;\nselect 3;')
+    assert split_statements(sql) == [
+        'create procedure p as\nbegin\n  select 1;\n  select case when 1 = 1 then 2 end;\nend;',
+        'select 3;']
+
+
+def test_try_catch_blocks_are_not_split():
+    sql = 'begin try select 1/0; end try begin catch select 2; end catch; select 3'
+    assert split_statements(sql) == [
+        'begin try select 1/0; end try begin catch select 2; end catch;', 'select 3']
+
+
+def test_begin_transaction_is_not_a_block():
+    assert split_statements('begin tran; select 1; commit;') == \
+        ['begin tran;', 'select 1;', 'commit;']
+
+
+def test_split_on_go():
+    sql = 'select 1\ngo\nselect 2\n  GO 5  \nselect @go, #end, x.begin, go_away\nGo -- done\n'
+    assert split_statements(sql) == [
+        'select 1', 'select 2\n  GO 5', 'select @go, #end, x.begin, go_away']
+
+
+def test_go_not_on_its_own_line_is_not_a_separator():
+    assert split_statements('select 1 go\nselect 2') == ['select 1 go\nselect 2']
+
+
+def test_go_ends_open_blocks():
+    assert split_statements('begin\nselect 1;\ngo\nselect 2; select 3') == \
+        ['begin\nselect 1;', 'select 2;', 'select 3']
+
+
+def test_comment_only_statements_are_skipped():
+    assert split_statements('select 1;\n-- trailing comment\n') == ['select 1;']
+    assert split_statements('/* only a comment */') == []
+    assert split_statements('  \n ') == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 64])
+def test_iter_statements_matches_split_statements(chunk_size):
+    sql = ("select 'a;''b' from [t;]]]; -- c;\nbegin\nselect case when 1=1 then 2 end;\nend;\n"
+           "/* x /* y */ ; */ select 1\nGO\nselect @begin, #end;\nGO 2\nselect 3")
+    assert list(iter_statements(io.StringIO(sql), chunk_size)) == split_statements(sql)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 64])
+def test_go_after_statement_on_the_same_line_is_not_a_separator(chunk_size):
+    sql = 'select 1; go\nselect 2;  \n  GO\nselect 3'
+    assert list(iter_statements(io.StringIO(sql), chunk_size)) == \
+        ['select 1;', 'go\nselect 2;', 'select 3']
+
+
+def test_feed_keeps_only_the_current_statement():
+    splitter = StatementSplitter()
+    assert splitter.feed('select 1; select 2; sel') == ['select 1;', 'select 2;']
+    assert splitter.text == ' sel'
+    assert splitter.feed('ect 3;') == ['select 3;']
+    assert splitter.close() == []
+
+def test_iter_statements_is_lazy():
+    class Stream(object):
+        # pylint: disable=useless-object-inheritance, too-few-public-methods
+        def __init__(self, chunks):
+            self.chunks = chunks
+
+        def read(self, _):
+            return self.chunks.pop(0) if self.chunks else ''
+
+    stream = Stream(['select 1; sel', 'ect 2;'])
+    statements = iter_statements(stream, 10)
+
+    assert next(statements) == 'select 1;'
+    assert stream.chunks == ['ect 2;']
+    assert list(statements) == ['select 2;']
+
+
+def test_statement_boundaries():
+    sql = 'select 1; select 2;\nselect 3\nGO\nselect 4'
+    assert statement_boundaries(sql) == [9, 19, 32]
+    assert statement_boundaries(sql, 19) == [32]
+
+
+@pytest.mark.parametrize('before, after', [
+    ('select 1; select 2; select 3', 'select 1; select 2; select 3; select 4'),
+    ('select 1; select 2; select 3', 'select 1; select 5; select 3'),
+    ('select 1;\nGO', 'select 1;\nGOTO x; select 2'),
+    ("select 1; select ';", "select 1; select ''; select 2"),
+])
+def test_statement_boundaries_of_edited_text(before, after):
+    boundaries = StatementBoundaries()
+    assert boundaries.find(before) == statement_boundaries(before)
+    assert boundaries.find(after) == statement_boundaries(after)
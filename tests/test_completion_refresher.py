@@ -1,7 +1,15 @@
+import os
+import shutil
+import tempfile
+import threading
 import time
 import unittest
 from mock import Mock, patch
 from mssqlcli.completion_refresher import CompletionRefresher
+from mssqlcli.metadatacache import METADATA_METHODS, MetadataCache
+from mssqlcli.mssqlcompleter import MssqlCompleter
+from mssqlcli.packages.parseutils.tables import TableReference
+from mssqlcli.packages.parseutils.meta import ForeignKey
 
 class CompletionRefresherTests(unittest.TestCase):
 
@@ -76,6 +84,10 @@ class CompletionRefresherTests(unittest.TestCase):
             def connect_to_database():
                 return 'connectionservicetest', []
 
+            @staticmethod
+            def release_connection():
+                pass
+
         mssqlcliclient = MssqlCliClientMock()
         callbacks = [Mock()]
         refresher = CompletionRefresher()
@@ -85,3 +97,270 @@ class CompletionRefresherTests(unittest.TestCase):
         refresher.refresh(mssqlcliclient, callbacks)
         time.sleep(1)  # Wait for the thread to work.
         assert callbacks[0].call_count == 1
+
+    def test_refresh_with_metadata_cache(self):
+        """
+        Metadata should be queried once and replayed from the cache while its version is unchanged
+        """
+        class MssqlCliClientMock:   #pylint: disable=too-few-public-methods
+            server_name = 'localhost'
+            connected_database = 'master'
+            database = None
+            version = '1'
+            queries = []
+
+            def connect_to_database(self):
+                return 'connectionservicetest', []
+
+            def release_connection(self):
+                pass
+
+            def get_metadata_version(self):
+                return self.version
+
+            def __getattr__(self, name):
+                rows = {
+                    'get_schemas': ['dbo'],
+                    'get_tables': [('dbo', 'orders'), ('dbo', 'users')],
+                    'get_table_columns': [('dbo', 'orders', 'user_id', 'int', None)],
+                    'get_foreign_keys': [ForeignKey('dbo', 'users', 'id',
+                                                    'dbo', 'orders', 'user_id')],
+                }.get(name, [])
+
+                def query():
+                    self.queries.append(name)
+                    return iter(rows)
+                return query
+
+        def refresh_completer(mssqlcliclient):
+            completers = []
+            refresher.refresh(mssqlcliclient, completers.append)
+            refresher._completer_thread.join()  #pylint: disable=protected-access
+            return completers[0]
+
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        refresher = CompletionRefresher(
+            metadata_cache=MetadataCache(os.path.join(cache_dir, 'metadata_cache.db')))
+        mssqlcliclient = MssqlCliClientMock()
+
+        completer = refresh_completer(mssqlcliclient)
+        assert 'get_tables' in mssqlcliclient.queries
+
+        del mssqlcliclient.queries[:]
+        cached_completer = refresh_completer(mssqlcliclient)
+        assert not mssqlcliclient.queries
+        assert cached_completer.dbmetadata == completer.dbmetadata
+        assert cached_completer.all_completions == completer.all_completions
+
+        mssqlcliclient.version = '2'
+        refresh_completer(mssqlcliclient)
+        assert 'get_tables' in mssqlcliclient.queries
+
+    @staticmethod
+    def test_refresh_delta():
+        """
+        Delta refresh should update the completer with the created, altered and dropped objects
+        """
+        class MssqlCliClientMock:   #pylint: disable=too-few-public-methods
+            queries = []
+            releases = []
+
+            @staticmethod
+            def connect_to_database():
+                return 'connectionservicetest', []
+
+            def release_connection(self):
+                self.releases.append(self)
+
+            @staticmethod
+            def get_schemas():
+                return ['dbo', 'sales']
+
+            @staticmethod
+            def get_relation_changes(since):
+                assert since == '2020-01-01 00:00:00.000'
+                return [(2, 'dbo', 'orders', 'tables', '2020-01-02 00:00:00.000'),
+                        (4, 'sales', 'invoices', 'tables', '2020-01-03 00:00:00.000')]
+
+            @staticmethod
+            def get_relation_count():
+                return 3
+
+            @staticmethod
+            def get_relation_object_ids():
+                return set([1, 2, 4])
+
+            @staticmethod
+            def get_relation_column_changes(_):
+                return [('dbo', 'orders', 'id', 'int', None, 'tables'),
+                        ('dbo', 'orders', 'user_id', 'int', None, 'tables'),
+                        ('sales', 'invoices', 'order_id', 'int', None, 'tables')]
+
+            @staticmethod
+            def get_foreign_key_changes(_):
+                return [ForeignKey('sales', 'invoices', 'order_id', 'dbo', 'orders', 'id'),
+                        ForeignKey('dbo', 'orders', 'user_id', 'dbo', 'users', 'id')]
+
+            @staticmethod
+            def get_user_defined_types():
+                return []
+
+            @staticmethod
+            def get_databases():
+                return ['master']
+
+        completer = MssqlCompleter()
+        completer.extend_schemas(['dbo'])
+        completer.extend_relations([('dbo', 'users'), ('dbo', 'orders'), ('dbo', 'items')],
+                                   kind='tables')
+        completer.extend_columns([('dbo', 'users', 'id', 'int', None),
+                                  ('dbo', 'orders', 'user', 'int', None),
+                                  ('dbo', 'items', 'order_id', 'int', None)], kind='tables')
+        completer.extend_foreignkeys([ForeignKey('dbo', 'items', 'order_id',
+                                                 'dbo', 'orders', 'user')])
+        completer.extend_relation_objects([
+            (1, 'dbo', 'users', 'tables', '2019-01-01 00:00:00.000'),
+            (2, 'dbo', 'orders', 'tables', '2019-01-01 00:00:00.000'),
+            (3, 'dbo', 'items', 'tables', '2020-01-01 00:00:00.000')])
+
+        callbacks = [Mock()]
+        refresher = CompletionRefresher()
+        mssqlcliclient = MssqlCliClientMock()
+        refresher.refresh_delta(mssqlcliclient, completer, threading.Lock(), callbacks)
+        refresher._completer_thread.join()  #pylint: disable=protected-access
+
+        callbacks[0].assert_called_once()
+        assert MssqlCliClientMock.releases == [mssqlcliclient]
+        # The completer in use is left as is, the callback gets an updated copy.
+        assert set(completer.dbmetadata['tables']['"dbo"']) == \
+            set(['"users"', '"orders"', '"items"'])
+        assert len(completer.dbmetadata['tables']['"dbo"']['"orders"']['"user"'].foreignkeys) == 1
+        completer = callbacks[0].call_args[0][0]
+        tables = completer.dbmetadata['tables']
+        assert set(tables['"dbo"']) == set(['"users"', '"orders"'])
+        assert list(tables['"dbo"']['"orders"']) == ['"id"', '"user_id"']
+        assert list(tables['"sales"']['"invoices"']) == ['"order_id"']
+        assert tables['"dbo"']['"users"']['"id"'].foreignkeys == [
+            ForeignKey('"dbo"', '"orders"', '"user_id"', '"dbo"', '"users"', '"id"')]
+        assert len(tables['"dbo"']['"orders"']['"id"'].foreignkeys) == 1
+        assert set(completer.relation_objects) == set([1, 2, 4])
+        assert completer.metadata_modified == '2020-01-03 00:00:00.000'
+
+    @staticmethod
+    def test_refresh_delta_without_snapshot():
+        """
+        Delta refresh should fall back to a full refresh if the completer was not refreshed
+        """
+        callbacks = Mock()
+        refresher = CompletionRefresher()
+
+        with patch.object(refresher, '_bg_refresh') as bg_refresh:
+            refresher.refresh_delta(Mock(), MssqlCompleter(), threading.Lock(), callbacks)
+            refresher._completer_thread.join()  #pylint: disable=protected-access
+            bg_refresh.assert_called_once()
+            callbacks.assert_not_called()
+
+    @staticmethod
+    def test_refresh_on_several_connections():
+        """
+        Metadata should be queried once, on every connection, and merged into the new completer
+        """
+        class MssqlCliClientMock:   #pylint: disable=too-few-public-methods
+            queries = []
+            connections = []
+            releases = []
+
+            def __init__(self, name):
+                self.name = name
+
+            def connect_to_database(self):
+                self.connections.append(self.name)
+                return 'connectionservicetest', []
+
+            def release_connection(self):
+                self.releases.append(self.name)
+
+            def clone(self):
+                return MssqlCliClientMock('clone')
+
+            def __getattr__(self, name):
+                rows = {
+                    'get_schemas': ['dbo'],
+                    'get_tables': [('dbo', 'orders')],
+                    'get_table_columns': [('dbo', 'orders', 'id', 'int', None)],
+                }.get(name, [])
+
+                def query():
+                    self.queries.append(name)
+                    time.sleep(0.1)
+                    return iter(rows)
+                return query
+
+        completers = []
+        refresher = CompletionRefresher(connections=3)
+        refresher.refresh(MssqlCliClientMock('main'), completers.append)
+        refresher._completer_thread.join()  #pylint: disable=protected-access
+
+        assert sorted(MssqlCliClientMock.connections) == ['clone', 'clone', 'main']
+        # The connections are returned to the pool for the next refresh.
+        assert sorted(MssqlCliClientMock.releases) == ['clone', 'clone', 'main']
+        assert sorted(MssqlCliClientMock.queries) == sorted(METADATA_METHODS)
+        assert list(completers[0].dbmetadata['tables']['"dbo"']['"orders"']) == ['"id"']
+
+    @staticmethod
+    def test_refresh_with_lazy_columns():
+        """
+        In lazy column mode, columns should be loaded on first use and evicted when least recently
+        used
+        """
+        class MssqlCliClientMock:   #pylint: disable=too-few-public-methods
+            queries = []
+
+            @staticmethod
+            def connect_to_database():
+                return 'connectionservicetest', []
+
+            def get_relation_columns(self, schema, name):
+                self.queries.append(('get_relation_columns', schema, name))
+                return [('id', 'int', None), (name + '_name', 'nvarchar', None)]
+
+            def __getattr__(self, name):
+                rows = {
+                    'get_schemas': ['dbo'],
+                    'get_tables': [('dbo', 'orders'), ('dbo', 'users')],
+                }.get(name, [])
+
+                def query():
+                    self.queries.append(name)
+                    return iter(rows)
+                return query
+
+        def scoped_columns(completer, relname):
+            scoped_cols = completer.populate_scoped_cols(
+                [TableReference('dbo', relname, None, False)])
+            return [column.name for columns in scoped_cols.values() for column in columns]
+
+        def load_columns(completer, relname):
+            assert scoped_columns(completer, relname) == []
+            for _ in range(50):
+                columns = scoped_columns(completer, relname)
+                if columns:
+                    return columns
+                time.sleep(0.1)
+            return None
+
+        completers = []
+        refresher = CompletionRefresher()
+        refresher.refresh(MssqlCliClientMock(), completers.append,
+                          settings={'lazy_columns': True, 'column_cache_size': 1})
+        refresher._completer_thread.join()  #pylint: disable=protected-access
+        completer = completers[0]
+
+        assert 'get_tables' in MssqlCliClientMock.queries
+        assert 'get_table_columns' not in MssqlCliClientMock.queries
+        assert load_columns(completer, 'orders') == ['"id"', '"orders_name"']
+        assert load_columns(completer, 'users') == ['"id"', '"users_name"']
+        # Only the columns of the most recently used relation are kept.
+        assert scoped_columns(completer, 'orders') == []
+        completer.column_loader.close()
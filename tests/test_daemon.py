@@ -0,0 +1,142 @@
+import io
+import os
+import sys
+import threading
+import time
+from argparse import Namespace
+
+import click
+import pytest
+from mssqlcli.daemon import Daemon, forward_to_daemon, is_supported
+
+pytestmark = pytest.mark.skipif(not is_supported(), reason=u'Requires Unix sockets.')
+
+
+class FakeSqlToolsClient(object):
+    # pylint: disable=useless-object-inheritance, too-few-public-methods
+    def __init__(self):
+        self.is_shutdown = False
+
+    def shutdown(self):
+        self.is_shutdown = True
+
+
+class EchoDaemon(Daemon):
+    """ Daemon writing the query and input of invocations back instead of running them. """
+
+    def _start_service(self):
+        return FakeSqlToolsClient()
+
+    def run(self, options, input_stream):
+        click.echo(u'query: {}'.format(options.query))
+        click.echo(u'input: {}'.format(u''.join(iter(lambda: input_stream.read(), u''))))
+        click.secho(u'warning', err=True)
+        sys.exit(3)
+
+
+def test_no_daemon_listening(tmp_path):
+    options = Namespace(query=u'select 1', input_file=False, output_file=False)
+    assert forward_to_daemon(options, str(tmp_path / u'daemon.sock')) is None
+
+
+def test_invocation_forwarded_to_daemon(tmp_path, monkeypatch):
+    # Replaced here rather than in a fixture, as the streams are captured again between them.
+    monkeypatch.setattr(sys, 'stdout', io.StringIO())
+    stderr = io.StringIO()
+    monkeypatch.setattr(sys, 'stderr', stderr)
+    daemon = EchoDaemon(str(tmp_path / u'daemon.sock'))
+    daemon_thread = threading.Thread(target=daemon.serve_forever)
+    daemon_thread.start()
+    while not os.path.exists(daemon.socket_path):
+        time.sleep(0.01)
+
+    input_file = tmp_path / u'input.sql'
+    input_file.write_text(u'select 1\ngo\n' * 10000)
+    output_file = tmp_path / u'output.txt'
+    options = Namespace(query=u'select 2', input_file=str(input_file),
+                        output_file=str(output_file))
+    try:
+        exit_code = forward_to_daemon(options, daemon.socket_path)
+    finally:
+        daemon.shutdown()
+        daemon_thread.join()
+
+    assert exit_code == 3
+    assert output_file.read_text() == u'query: select 2\ninput: {}\n'.format(
+        u'select 1\ngo\n' * 10000)
+    assert stderr.getvalue() == u'warning\n'
+    assert daemon.sqltoolsclient.is_shutdown
+    assert not os.path.exists(daemon.socket_path)
+
+
+def test_invocation_connection_closed(monkeypatch):
+    """ Connections are not reused by the next invocation, which would see their session. """
+    clients = []
+
+    class FakeClient(object):
+        # pylint: disable=useless-object-inheritance
+        def __init__(self, options, sqltoolsclient):
+            # pylint: disable=unused-argument
+            self.is_connected = True
+            clients.append(self)
+
+        def disconnect(self):
+            self.is_connected = False
+
+    class FakeMssqlCli(object):
+        # pylint: disable=useless-object-inheritance
+        def __init__(self, options, mssqlcliclient):
+            pass
+
+        @staticmethod
+        def connect_to_database():
+            pass
+
+        @staticmethod
+        def execute_query_to_output(query):
+            # An invocation leaving a transaction open.
+            assert query == u'begin tran'
+
+    monkeypatch.setattr(u'mssqlcli.mssqlcliclient.MssqlCliClient', FakeClient)
+    monkeypatch.setattr(u'mssqlcli.mssql_cli.MssqlCli', FakeMssqlCli)
+
+    daemon = EchoDaemon()
+    for _ in range(2):
+        Daemon.run(daemon, Namespace(query=u'begin tran', input_file=False), None)
+    assert len(clients) == 2
+    assert not any(client.is_connected for client in clients)
+
+
+def test_invocation_connection_reused(monkeypatch):
+    """ With reuse_connections, connections are reset and released to the daemon's pool. """
+    released = []
+
+    class FakeClient(object):
+        # pylint: disable=useless-object-inheritance, too-few-public-methods
+        def __init__(self, options, sqltoolsclient):
+            # pylint: disable=unused-argument
+            self.connection_pool = None
+
+        def release_connection(self, reset_session=False):
+            released.append((self.connection_pool, reset_session))
+
+    class FakeMssqlCli(object):
+        # pylint: disable=useless-object-inheritance
+        def __init__(self, options, mssqlcliclient):
+            pass
+
+        @staticmethod
+        def connect_to_database():
+            pass
+
+        @staticmethod
+        def execute_query_to_output(query):
+            assert query == u'select 1'
+
+    monkeypatch.setattr(u'mssqlcli.mssqlcliclient.MssqlCliClient', FakeClient)
+    monkeypatch.setattr(u'mssqlcli.mssql_cli.MssqlCli', FakeMssqlCli)
+
+    daemon = EchoDaemon(reuse_connections=True)
+    for _ in range(2):
+        Daemon.run(daemon, Namespace(query=u'select 1', input_file=False), None)
+    assert released == [(daemon.connection_pool, True)] * 2
@@ -81,3 +81,21 @@ class FuzzyCompletionTests(unittest.TestCase):
         collection = ['Foo', 'FOO', 'fOO']
         matches = completer.find_matches(text, collection)
         assert len(matches) == 3
+
+    def test_cached_matches_follow_casing(self):
+        """Matches of a name computed before and after a casing change.
+
+        Values derived from a candidate name are cached between calls, so
+        this test checks that they are recomputed when the casing changes,
+        and that an unchanged name gives the same Completion.
+
+        """
+        completer = self.getCompleter()
+        collection = ['user_group']
+        first = completer.find_matches('user', collection)
+        again = completer.find_matches('user', collection)
+        assert again[0].completion is first[0].completion
+
+        completer.extend_casing(['User_Group'])
+        matches = completer.find_matches('user', collection)
+        assert matches[0].completion.text == 'User_Group'
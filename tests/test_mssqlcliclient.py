@@ -4,7 +4,14 @@ import io
 from time import sleep
 import pytest
 import mssqlcli.sqltoolsclient as sqltoolsclient
-from mssqlcli.jsonrpc.jsonrpcclient import JsonRpcWriter
+from mssqlcli.jsonrpc.jsonrpcclient import JsonRpcClient, JsonRpcWriter
+from mssqlcli.jsonrpc.contracts.queryexecutestringservice import (
+    QueryCompleteEvent,
+    QueryMessageEvent,
+    ResultSubset
+)
+import mssqlcli.mssqlcliclient as mssqlcliclient
+from mssqlcli.mssqlcliclient import ResultSetFetchError, ResultSetRows
 from mssqltestutils import (
     create_mssql_cli,
     create_mssql_cli_options,
@@ -247,6 +254,24 @@ class TestMssqlCliClientMultipleStatement(MssqlCliClient):
             assert len(rows) == rows_outputted[i]
             assert (is_error and len(rows) == 0) or (not is_error)
 
+    @staticmethod
+    @pytest.mark.parametrize("query_str, rows_outputted", test_data)
+    def test_mssqlcliclient_pipelined_statements(query_str, rows_outputted):
+        """
+            Verify queries separated by semi-colon are executed as batches of one request
+        """
+        client = create_mssql_cli_client(create_mssql_cli_options(pipeline_statements=True))
+        try:
+            for (i, (rows, _, _, query_executed, is_error)) in \
+                enumerate(client.execute_query(query_str)):
+
+                queries = ["{};".format(query) for query in query_str.split(';')]
+                assert query_executed == queries[i].strip()
+                assert len(rows) == rows_outputted[i]
+                assert (is_error and len(rows) == 0) or (not is_error)
+        finally:
+            shutdown(client)
+
     @staticmethod
     def test_mssqlcliclient_multiple_merge(client_with_db):
         """
@@ -259,3 +284,416 @@ class TestMssqlCliClientMultipleStatement(MssqlCliClient):
             if is_error:
                 raise AssertionError("Query execution failed: {}".format(status))
             assert () == rows
+
+
+class TestResultSetRows:
+    """ Unit tests for paged fetching of result set rows. """
+
+    @staticmethod
+    def result_subset(start, count):
+        return ResultSubset({u'result': {u'resultSubset': {
+            u'rowCount': count,
+            u'rows': [[{u'displayValue': str(row_id), u'rowId': row_id, u'isNull': False}]
+                      for row_id in range(start, start + count)]
+        }}})
+
+    @staticmethod
+    @pytest.mark.parametrize("row_count, page_size, expected_pages", [
+        (10, 3, [(0, 3), (3, 3), (6, 3), (9, 1)]),
+        (10, 10, [(0, 10)]),
+        (10, 0, [(0, 10)]),
+        (0, 5, [])
+    ])
+    def test_rows_fetched_in_pages(row_count, page_size, expected_pages):
+        """
+            Verify rows are requested page by page while iterating.
+        """
+        pages_requested = []
+
+        def fetch_page(start, count):
+            pages_requested.append((start, count))
+            return TestResultSetRows.result_subset(start, count), False
+
+        rows = ResultSetRows(fetch_page, row_count, page_size)
+
+        assert len(rows) == row_count
+        assert not pages_requested
+        assert list(rows) == [[str(row_id)] for row_id in range(row_count)]
+        assert pages_requested == expected_pages
+
+    @staticmethod
+    def test_first_page_is_not_requested_again():
+        """
+            Verify an already fetched first page is used by every iteration.
+        """
+        pages_requested = []
+
+        def fetch_page(start, count):
+            pages_requested.append((start, count))
+            return TestResultSetRows.result_subset(start, count), False
+
+        rows = ResultSetRows(fetch_page, 4, 2,
+                             first_page=TestResultSetRows.result_subset(0, 2))
+        rows_iter = iter(rows)
+        assert next(rows_iter) == ['0']
+        assert not pages_requested
+        assert list(rows_iter) == [['1'], ['2'], ['3']]
+        assert pages_requested == [(2, 2)]
+
+        assert list(rows) == [['0'], ['1'], ['2'], ['3']]
+        assert pages_requested == [(2, 2), (2, 2)]
+
+    @staticmethod
+    def test_page_error_raised():
+        """
+            Verify iteration raises after the fetched rows when a page could not be fetched.
+        """
+        def fetch_page(start, count):
+            if start:
+                return ResultSubset(None, error_message=u'fetch failed'), True
+            return TestResultSetRows.result_subset(start, count), False
+
+        rows = []
+        with pytest.raises(ResultSetFetchError, match=u'stopped at row 2: fetch failed'):
+            rows.extend(ResultSetRows(fetch_page, 4, 2))
+        assert rows == [['0'], ['1']]
+
+
+class TestPipelinedStatements:
+    """ Unit tests for demultiplexing the batches of pipelined statements. """
+
+    @staticmethod
+    def batch_summary(batch_id, start_line, row_count=None):
+        result_set_summaries = [] if row_count is None else [{
+            u'id': 0, u'batchId': batch_id, u'rowCount': row_count,
+            u'columnInfo': [{u'columnName': u'value', u'dataTypeName': u'int'}]
+        }]
+        return {u'hasError': False, u'id': batch_id, u'executionElapsed': u'00:00:00',
+                u'selection': {u'startLine': start_line, u'startColumn': 0,
+                               u'endLine': start_line, u'endColumn': 0},
+                u'resultSetSummaries': result_set_summaries}
+
+    @staticmethod
+    def query_message(batch_id, message):
+        return QueryMessageEvent({u'params': {u'ownerUri': u'test_uri', u'message': {
+            u'batchId': batch_id, u'isError': False, u'message': message}}})
+
+    @staticmethod
+    def test_batches_matched_to_statements():
+        """
+            Verify statements are sent as one request and results are matched by batch.
+        """
+        client = mssqlcliclient.MssqlCliClient(
+            create_mssql_cli_options(pipeline_statements=True), None)
+        client.is_connected = True
+        executed_queries = []
+
+        def execute_request(query):
+            executed_queries.append(query)
+            query_response = QueryCompleteEvent({u'params': {
+                u'ownerUri': u'test_uri',
+                u'batchSummaries': [TestPipelinedStatements.batch_summary(0, 0, 1),
+                                    TestPipelinedStatements.batch_summary(1, 2, 2),
+                                    TestPipelinedStatements.batch_summary(2, 5)]}})
+            query_messages = [TestPipelinedStatements.query_message(0, u'(1 row affected)'),
+                              TestPipelinedStatements.query_message(1, u'(2 rows affected)'),
+                              TestPipelinedStatements.query_message(2, u'done')]
+            return query_response, query_messages, False
+
+        client._execute_query_execute_request_for = execute_request
+        client._execute_query_subset_page = lambda owner_uri, result_set_summary, start, count: \
+            (TestResultSetRows.result_subset(start, count), False)
+
+        results = [(list(rows), columns, status, query, is_error) for
+                   rows, columns, status, query, is_error in
+                   client.execute_query(u"select 1;\nselect\nvalue from t;\nprint 'done';")]
+
+        assert executed_queries == [u"select 1;\nGO\nselect\nvalue from t;\nGO\nprint 'done';"]
+        assert results == [
+            ([['0']], [u'value'], u'(1 row affected)', u'select 1;', False),
+            ([['0'], ['1']], [u'value'], u'(2 rows affected)', u'select\nvalue from t;', False),
+            ([], None, u'done', u"print 'done';", False)
+        ]
+
+    @staticmethod
+    def test_statements_pipelined_in_groups():
+        """
+            Verify statements read lazily are sent in groups of at most PIPELINE_STATEMENT_COUNT.
+        """
+        client = mssqlcliclient.MssqlCliClient(
+            create_mssql_cli_options(pipeline_statements=True), None)
+        client.PIPELINE_STATEMENT_COUNT = 2
+        requests = []
+        statements_read = []
+
+        def read_statements():
+            for i in range(5):
+                statements_read.append(i)
+                yield u'select {};'.format(i)
+
+        def execute(queries):
+            requests.append(queries)
+            return iter([((), None, u'', query, False) for query in queries])
+
+        client._execute_pipelined_queries = execute
+        client._execute_query = lambda query: execute([query])
+
+        results = client.execute_statements(read_statements())
+        next(results)
+        assert statements_read == [0, 1]
+
+        assert len(list(results)) == 4
+        assert requests == [[u'select 0;', u'select 1;'], [u'select 2;', u'select 3;'],
+                            [u'select 4;']]
+
+
+    @staticmethod
+    def test_special_commands_run_between_groups():
+        """
+            Verify special commands among the statements are run as such, after the statements
+            before them and without being sent to the service.
+        """
+        client = mssqlcliclient.MssqlCliClient(
+            create_mssql_cli_options(pipeline_statements=True), None)
+        requests = []
+
+        def execute(queries):
+            requests.append(queries)
+            return iter([((), None, u'', query, False) for query in queries])
+
+        client._execute_pipelined_queries = execute
+        client._execute_query = lambda query: execute([query])
+
+        results = list(client.execute_statements(
+            [u'select 0;', u'select 1;', u'\\?', u'select 2;']))
+
+        assert requests == [[u'select 0;', u'select 1;'], [u'select 2;']]
+        assert [query for _, _, _, query, _ in results] == \
+            [u'select 0;', u'select 1;', None, u'select 2;']
+        assert results[2][1] == ['Command', 'Shortcut', 'Description']
+
+class TestQueryCancellation:
+    """ Unit tests for cancelling an interrupted query with query/cancel. """
+
+    @staticmethod
+    def create_client(cancel_result):
+        """
+            Returns a client running a query on a service replying to query/cancel with
+            cancel_result, followed by the completion of the query.
+        """
+        json_rpc_client = JsonRpcClient(io.BytesIO(), io.BytesIO())
+        sql_tools_client = sqltoolsclient.SqlToolsClient.__new__(sqltoolsclient.SqlToolsClient)
+        sql_tools_client.json_rpc_client = json_rpc_client
+        submitted = []
+
+        def submit_request(method, params, request_id=None):
+            submitted.append(method)
+            if method == u'query/cancel':
+                json_rpc_client._enqueue_response(dict(cancel_result, id=request_id))
+                json_rpc_client._enqueue_response({u'method': u'query/complete', u'params': {
+                    u'ownerUri': params[u'OwnerUri'], u'batchSummaries': []}})
+
+        json_rpc_client.submit_request = submit_request
+
+        client = mssqlcliclient.MssqlCliClient(create_mssql_cli_options(), sql_tools_client,
+                                               owner_uri=u'test_uri')
+        client.active_query_request = sql_tools_client.create_request(
+            sql_tools_client.QUERY_EXECUTE_STRING_REQUEST,
+            {u'OwnerUri': u'test_uri', u'Query': u'waitfor delay \'01:00\''}, u'test_uri')
+        client.active_query_request.execute()
+        return client, submitted
+
+    def test_cancel_waits_for_query_completion(self):
+        client, submitted = self.create_client({u'result': {u'messages': None}})
+        query_request = client.active_query_request
+
+        assert client.cancel_query() is None
+        assert submitted == [u'query/executeString', u'query/cancel']
+        assert query_request.completed()
+        assert client.active_query_request is None
+        # The completion of the cancelled query is not left for the next one.
+        assert client.sql_tools_client.json_rpc_client.get_response(0, u'test_uri') is None
+
+    def test_cancel_error(self):
+        client, _ = self.create_client({u'error': {u'code': 1, u'message': u'failed'}})
+
+        assert client.cancel_query() == u'failed'
+        assert client.active_query_request is not None
+
+    @staticmethod
+    def test_nothing_to_cancel():
+        client = mssqlcliclient.MssqlCliClient(create_mssql_cli_options(), None)
+
+        assert client.cancel_query() is None
+
+
+class TestSqlToolsClientPool:
+    """ Unit tests for handing out pre-started Sql Tools Clients. """
+
+    @staticmethod
+    def fake_client_class(started, failures=0):
+        class FakeSqlToolsClient(object):
+            # pylint: disable=useless-object-inheritance, too-few-public-methods
+            failures_left = [failures]
+
+            def __init__(self, **kwargs):
+                if self.failures_left[0]:
+                    self.failures_left[0] -= 1
+                    raise OSError(u'service not found')
+                self.args = kwargs
+                self.is_shut_down = False
+                started.append(self)
+
+            def shutdown(self):
+                self.is_shut_down = True
+
+        return FakeSqlToolsClient
+
+    def test_spare_client_handed_out(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(sqltoolsclient, 'SqlToolsClient', self.fake_client_class(started))
+
+        pool = sqltoolsclient.SqlToolsClientPool(enable_logging=True)
+        # No spare is started until the first client is initialized.
+        assert not started
+        first = pool.get_client()
+        assert started == [first]
+        assert first.args == {u'enable_logging': True}
+
+        pool.start_spare()
+        second = pool.get_client()
+        assert started == [first, second]
+
+        pool.start_spare()
+        pool.shutdown()
+        assert len(started) == 3
+        assert started[2].is_shut_down
+        assert not second.is_shut_down
+
+    def test_spare_client_failure(self, monkeypatch):
+        started = []
+        monkeypatch.setattr(sqltoolsclient, 'SqlToolsClient',
+                            self.fake_client_class(started, failures=1))
+
+        pool = sqltoolsclient.SqlToolsClientPool()
+        pool.start_spare()
+        client = pool.get_client()
+        pool.shutdown()
+        # The client is started on demand once the spare failed to start.
+        assert started == [client]
+        assert not client.is_shut_down
+
+
+class TestConnectionPool:
+    """ Unit tests for reusing the connections of clones with the same parameters. """
+
+    @staticmethod
+    def create_client(monkeypatch, connections, disconnections, transaction_count=0):
+        """ Returns a client whose connections are counted instead of being opened. """
+        def connect(self, _):
+            connections.append(self.owner_uri)
+            self.is_connected = True
+            self.connected_database = self.database or u'master'
+            return self.owner_uri, []
+
+        def disconnect(self):
+            disconnections.append(self.owner_uri)
+            self.is_connected = False
+
+        monkeypatch.setattr(mssqlcliclient.MssqlCliClient, '_execute_connection_request_with',
+                            connect)
+        monkeypatch.setattr(mssqlcliclient.MssqlCliClient, 'disconnect', disconnect)
+        monkeypatch.setattr(mssqlcliclient.MssqlCliClient, 'get_transaction_count',
+                            lambda self: transaction_count)
+        return mssqlcliclient.MssqlCliClient(create_mssql_cli_options(), None)
+
+    def test_released_connection_reused(self, monkeypatch):
+        connections = []
+        client = self.create_client(monkeypatch, connections, [])
+
+        first = client.clone()
+        first.connect_to_database()
+        first.release_connection()
+        second = client.clone()
+        second.connect_to_database()
+        assert connections == [first.owner_uri]
+        assert second.owner_uri == first.owner_uri and second.is_connected
+
+        # Clones connecting with other parameters, or whose connection is in use, connect.
+        other = client.clone()
+        other.database = u'other'
+        other.connect_to_database()
+        third = client.clone()
+        third.connect_to_database()
+        assert connections == [first.owner_uri, other.owner_uri, third.owner_uri]
+
+    @pytest.mark.parametrize("transaction_count", [1, None])
+    def test_connection_in_transaction_not_reused(self, monkeypatch, transaction_count):
+        connections, disconnections = [], []
+        client = self.create_client(monkeypatch, connections, disconnections,
+                                    transaction_count)
+
+        first = client.clone()
+        first.connect_to_database()
+        first.release_connection()
+        second = client.clone()
+        second.connect_to_database()
+        assert disconnections == [first.owner_uri]
+        assert connections == [first.owner_uri, second.owner_uri]
+        assert not client.connection_pool.idle_clients
+
+    def test_connection_reused_for_database_changed_to(self, monkeypatch):
+        connections = []
+        client = self.create_client(monkeypatch, connections, [])
+
+        first = client.clone()
+        first.connect_to_database()
+        first.connected_database = u'other'
+        first.release_connection()
+
+        client.clone().connect_to_database()
+        other = client.clone()
+        other.database = u'other'
+        other.connect_to_database()
+        assert len(connections) == 2
+        assert other.owner_uri == first.owner_uri
+
+    def test_failed_ping_and_idle_eviction(self, monkeypatch):
+        connections, disconnections = [], []
+        client = self.create_client(monkeypatch, connections, disconnections)
+        monkeypatch.setattr(mssqlcliclient.MssqlCliClient, 'ping', lambda self: False)
+        client.connection_pool.ping_idle_time = 0
+
+        first = client.clone()
+        first.connect_to_database()
+        first.release_connection()
+        second = client.clone()
+        second.connect_to_database()
+        assert disconnections == [first.owner_uri]
+        assert connections == [first.owner_uri, second.owner_uri]
+
+        client.connection_pool.max_idle_time = 0
+        second.release_connection()
+        sleep(0.01)
+        client.connection_pool.evict()
+        assert disconnections == [first.owner_uri, second.owner_uri]
+        assert not client.connection_pool.idle_clients
+
+    @pytest.mark.parametrize("temporary_objects, reused", [(0, True), (1, False)])
+    def test_session_reset_before_reuse(self, monkeypatch, temporary_objects, reused):
+        connections, disconnections = [], []
+        client = self.create_client(monkeypatch, connections, disconnections)
+        queries = []
+
+        def execute_query(self, query):
+            queries.append(query)
+            yield [[temporary_objects]], [u''], u'', query, False
+
+        monkeypatch.setattr(mssqlcliclient.MssqlCliClient, '_execute_query', execute_query)
+
+        first = client.clone()
+        first.connect_to_database()
+        first.release_connection(reset_session=True)
+        assert queries == [mssqlcliclient.MssqlCliClient.SESSION_RESET_QUERY]
+        assert disconnections == ([] if reused else [first.owner_uri])
+        assert bool(client.connection_pool.idle_clients) == reused
@@ -0,0 +1,97 @@
+# coding=utf-8
+import json
+import pytest
+from mssqlcli.jsonrpc.contracts.queryexecutestringservice import ResultSubset
+from mssqlcli.mssqlcliclient import ResultSetRows
+from mssqlcli.mssqlexport import export_rows
+from mssqlcli.mssql_cli import MssqlCli
+from mssqltestutils import create_mssql_cli_options
+
+COLUMNS = [u'id', u'name']
+ROWS = [[u'1', u'plain'], [u'2', u'with, comma'], [u'3', u'with "quotes"'],
+        [u'4', u'two\nlines'], [u'5', u''], [u'6', None], [u'7', u'ünicode\ttab']]
+
+
+def test_export_csv():
+    assert list(export_rows(u'csv', ROWS, COLUMNS)) == [
+        u'id,name',
+        u'1,plain',
+        u'2,"with, comma"',
+        u'3,"with ""quotes"""',
+        u'4,"two\nlines"',
+        u'5,""',
+        u'6,',
+        u'7,ünicode\ttab',
+    ]
+
+
+def test_export_tsv():
+    assert list(export_rows(u'tsv', ROWS, COLUMNS)) == [
+        u'id\tname',
+        u'1\tplain',
+        u'2\twith, comma',
+        u'3\t"with ""quotes"""',
+        u'4\t"two\nlines"',
+        u'5\t""',
+        u'6\t',
+        u'7\t"ünicode\ttab"',
+    ]
+
+
+def test_export_jsonl():
+    lines = list(export_rows(u'jsonl', ROWS, COLUMNS))
+
+    assert lines[0] == u'{"id": "1", "name": "plain"}'
+    assert [json.loads(line) for line in lines] == \
+        [{u'id': row[0], u'name': row[1]} for row in ROWS]
+
+
+def test_export_jsonl_keeps_duplicate_columns():
+    assert list(export_rows(u'jsonl', [[u'1', u'2']], [u'', u''])) == [u'{"": "1", "": "2"}']
+
+
+@pytest.mark.parametrize("export_format, expected", [
+    (u'csv', [u'value', u'NULL', u'', u'""']),
+    (u'jsonl', [u'{"value": "NULL"}', u'{"value": null}', u'{"value": ""}']),
+])
+def test_export_result_set_rows_nulls(export_format, expected):
+    subset = ResultSubset({u'result': {u'resultSubset': {u'rowCount': 3, u'rows': [
+        [{u'displayValue': u'NULL', u'rowId': 0, u'isNull': False}],
+        [{u'displayValue': u'NULL', u'rowId': 1, u'isNull': True}],
+        [{u'displayValue': u'', u'rowId': 2, u'isNull': False}],
+    ]}}})
+    rows = ResultSetRows(None, 3, 3, first_page=subset)
+
+    assert list(export_rows(export_format, rows, [u'value'])) == expected
+
+
+def test_export_exits_with_error_when_rows_cannot_be_fetched(tmp_path, capsys):
+    class FailingPageClient(object):
+        # pylint: disable=useless-object-inheritance
+        @staticmethod
+        def connect_to_database():
+            return u'owner_uri', []
+
+        @staticmethod
+        def execute_query(query):
+            def fetch_page(start, count):
+                # pylint: disable=unused-argument
+                return ResultSubset(None, error_message=u'fetch failed'), True
+
+            subset = ResultSubset({u'result': {u'resultSubset': {u'rowCount': 1, u'rows': [
+                [{u'displayValue': u'1', u'rowId': 0, u'isNull': False}],
+            ]}}})
+            yield ResultSetRows(fetch_page, 2, 1, first_page=subset), [u'value'], u'', query, \
+                False
+
+    output_file = tmp_path / u'output.csv'
+    options = create_mssql_cli_options(query=u'select value', interactive_mode=False,
+                                       export_format=u'csv',
+                                       output_file=str(output_file))
+    mssqlcli = MssqlCli(options, mssqlcliclient=FailingPageClient())
+
+    with pytest.raises(SystemExit) as e:
+        mssqlcli.execute_query_to_output(options.query)
+    assert e.value.code == 1
+    assert output_file.read_text() == u'value\n1\n'
+    assert u'stopped at row 1: fetch failed' in capsys.readouterr().err
@@ -1,4 +1,5 @@
 from __future__ import unicode_literals
+import threading
 import unittest
 from prompt_toolkit.completion import Completion
 from prompt_toolkit.document import Document
@@ -100,6 +101,54 @@ class NaiveCompletionTests(unittest.TestCase):
         not_expected = [Completion(text="CREATE", display_meta="keyword")]
         assert not self.contains(actual, not_expected)
 
+    def test_top_k_completions(self):
+        text = ''
+        position = 0
+        document = Document(text=text, cursor_position=position)
+        expected = list(self.get_completer().get_completions(
+            document, self.get_complete_event()))
+
+        completer = mssqlcompleter.MssqlCompleter(
+            smart_completion=True, settings={'completion_top_k': 5})
+        actual = completer.get_completions(document, self.get_complete_event())
+        assert len(expected) > 5
+        assert [next(actual).text for _ in range(5)] == [c.text for c in expected[:5]]
+        # The rest of the completions follows in the same order.
+        assert [c.text for c in actual] == [c.text for c in expected[5:]]
+
+    def test_cancelled_completion(self):
+        completer = self.get_completer()
+        cancelled = threading.Event()
+        cancelled.set()
+        with self.assertRaises(mssqlcompleter.CompletionCancelled):
+            completer.get_completions(Document(text='SEL', cursor_position=3),
+                                      self.get_complete_event(), cancelled=cancelled)
+
+    def test_cancelled_before_sorting_rest_of_completions(self):
+        completer = mssqlcompleter.MssqlCompleter(
+            smart_completion=True, settings={'completion_top_k': 5})
+        cancelled = threading.Event()
+        actual = completer.get_completions(Document(text='', cursor_position=0),
+                                           self.get_complete_event(), cancelled=cancelled)
+        for _ in range(5):
+            next(actual)
+        cancelled.set()
+        with self.assertRaises(mssqlcompleter.CompletionCancelled):
+            next(actual)
+
+    def test_newer_completion_supersedes_running_one(self):
+        completer = mssqlcompleter.CancellableCompleter(self.get_completer)
+        document = Document(text='', cursor_position=0)
+        first = completer.get_completions(document, self.get_complete_event())
+        assert next(first)
+
+        second = completer.get_completions(document, self.get_complete_event())
+        assert next(second)
+        assert not list(first)
+
+        completer.cancel()
+        assert not list(second)
+
     @staticmethod
     def get_completer():
         return mssqlcompleter.MssqlCompleter(smart_completion=True)
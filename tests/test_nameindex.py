@@ -0,0 +1,80 @@
+import random
+import unittest
+from mock import patch
+from mssqlcli.packages.nameindex import NameIndex
+from mssqlcli.packages.sqlcompletion import Table
+from mssqlcli.mssqlcompleter import MssqlCompleter
+
+
+class NameIndexTests(unittest.TestCase):
+
+    @staticmethod
+    def test_matching():
+        index = NameIndex(['"Orders"', '"order_items"', '"Users"', 'SELECT'])
+        assert index.matching('ord') == set(['"orders"', '"order_items"'])
+        assert index.matching('oi') == set(['"order_items"'])
+        assert index.matching('s') == set(['"orders"', '"order_items"', '"users"', 'select'])
+        assert index.matching('ordx') == set()
+        assert '"users"' in index
+        assert '"Users"' not in index
+
+    @staticmethod
+    def test_matching_narrows_previous_matches():
+        index = NameIndex(['"orders"', '"users"'])
+        assert index.matching('r') == set(['"orders"', '"users"'])
+        assert index.matching('rd') == set(['"orders"'])
+        assert index.matching('u') == set(['"users"'])
+
+        index.add(['"uno"'])
+        assert index.matching('u') == set(['"users"', '"uno"'])
+
+    @staticmethod
+    def test_find_matches_with_index():
+        """
+        Matches of a large collection should not change when the name index is used
+        """
+        random.seed(0)
+        words = ['order', 'item', 'user', 'invoice', 'line', 'product', 'date', 'id']
+        completer = MssqlCompleter()
+        tables = set()
+        while len(tables) < 2000:
+            tables.add('%s_%s%s' % (random.choice(words), random.choice(words),
+                                    random.randint(0, 999)))
+        completer.extend_schemas(['dbo'])
+        completer.extend_relations([('dbo', table) for table in tables], kind='tables')
+        candidates = list(completer.dbmetadata['tables']['"dbo"'])
+
+        def find_matches(text):
+            return sorted((m.completion.text, m.priority)
+                          for m in completer.find_matches(text, candidates, meta='table'))
+
+        texts = ['o', 'or', 'ord', 'ordi', 'u_i', 'pd1', '"use', 'zz']
+        indexed = [find_matches(text) for text in texts]
+        completer.name_index = NameIndex()
+        assert indexed == [find_matches(text) for text in texts]
+        assert indexed[2]
+
+    @staticmethod
+    def test_table_matches_with_index():
+        """
+        Table matches should not change when only the candidates of indexed matches are created
+        """
+        random.seed(0)
+        words = ['order', 'item', 'user', 'invoice', 'line', 'product', 'date', 'id']
+        completer = MssqlCompleter()
+        completer.extend_schemas(['dbo', 'sales'])
+        completer.extend_relations([(random.choice(['dbo', 'sales']),
+                                     '%s_%s%s' % (random.choice(words), random.choice(words),
+                                                  random.randint(0, 999)))
+                                    for _ in range(2000)], kind='tables')
+        suggestion = Table(schema=None, table_refs=(), local_tables=[])
+
+        def get_table_matches(text):
+            return sorted((m.completion.text, m.priority)
+                          for m in completer.get_table_matches(suggestion, text))
+
+        texts = ['o', 'or', 'ord', 'ordi', 'u_i', 'pd1', '"use', 'zz']
+        indexed = [get_table_matches(text) for text in texts]
+        with patch('mssqlcli.mssqlcompleter.NAME_INDEX_MIN_CANDIDATES', 100000):
+            assert indexed == [get_table_matches(text) for text in texts]
+        assert indexed[2]
@@ -0,0 +1,53 @@
+import io
+import pytest
+from mssqlcli.outputwriter import OutputWriter
+
+
+class CountingStream(io.StringIO):
+    """ StringIO counting the number of writes. """
+
+    def __init__(self):
+        super(CountingStream, self).__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super(CountingStream, self).write(s)
+
+
+@pytest.mark.parametrize("lines", [
+    [u'one'],
+    [u'one', u'', u'three'],
+    [u'line {}'.format(i) for i in range(1000)],
+])
+def test_output_matches_joined_lines(lines):
+    output_file = io.StringIO()
+    writer = OutputWriter(output_file, buffer_size=64)
+    writer.write_lines(iter(lines))
+    writer.close()
+
+    assert output_file.getvalue() == u'\n'.join(lines) + u'\n'
+
+
+def test_lines_written_in_blocks():
+    output_file = CountingStream()
+    writer = OutputWriter(output_file, buffer_size=20)
+
+    writer.write_lines([u'123456789'])
+    assert output_file.writes == 0
+
+    writer.write_lines([u'123456789'])
+    assert output_file.getvalue() == u'123456789\n123456789\n'
+
+    writer.write_lines([u'1'])
+    writer.close()
+    assert output_file.getvalue() == u'123456789\n123456789\n1\n'
+
+
+def test_empty_output_writes_newline():
+    output_file = io.StringIO()
+    writer = OutputWriter(output_file)
+    writer.write_lines([])
+    writer.close()
+
+    assert output_file.getvalue() == u'\n'
@@ -21,3 +21,14 @@ class PrioritizationTests(unittest.TestCase):
         names = ['foo', 'bar', 'baz']
         name_counts = [counter.name_count(x) for x in names]
         assert name_counts == [3, 2, 2]
+
+    @staticmethod
+    def test_keyword_counter_matches_whole_words():
+        counter = PrevalenceCounter()
+        counter.update_keywords('''select selected, t.from FROM t GROUP -- by
+                                   BY x WITHIN  group (ORDER
+                                   by x) order_by''')
+
+        keywords = ['SELECT', 'FROM', 'GROUP', 'BY', 'GROUP BY', 'WITHIN GROUP', 'ORDER']
+        expected = [1, 2, 2, 3, 0, 1, 1]
+        assert [counter.keyword_count(x) for x in keywords] == expected
@@ -752,6 +752,21 @@ on ''',
         assert set(suggestions) == self.cols_etc('b', last_keyword='SELECT')
 
 
+    def test_statements_separated_by_go(self):
+        suggestions = suggest_type('select * from a\nGO\nselect  from b\nGO\nselect * from c',
+                                   'select * from a\nGO\nselect ')
+        assert set(suggestions) == self.cols_etc('b', last_keyword='SELECT')
+
+
+    def test_edited_statement_after_unchanged_statements(self):
+        script = 'select * from a;\nselect * from b;\n'
+        suggestions = suggest_type(script + 'select  from c', script + 'select ')
+        assert set(suggestions) == self.cols_etc('c', last_keyword='SELECT')
+
+        suggestions = suggest_type(script + 'select  from d', script + 'select ')
+        assert set(suggestions) == self.cols_etc('d', last_keyword='SELECT')
+
+
     @staticmethod
     def test_statements_in_function_body():
         texts = [ \
@@ -0,0 +1,29 @@
+from mssqlcli.startupprofile import _add_import_time, format_report
+
+
+def test_import_times_added_by_top_level_package():
+    import_times = {}
+    for line in (u'import time: self [us] | cumulative | imported package\n',
+                 u'import time:       120 |        120 |   pygments.token\n',
+                 u'import time:       300 |        420 | pygments\n',
+                 u'import time:      1000 |       1000 | prompt_toolkit\n'):
+        _add_import_time(import_times, line)
+
+    assert import_times == {u'pygments': 420, u'prompt_toolkit': 1000}
+
+
+def test_report_lists_phases_and_slowest_packages():
+    report = format_report({u'pygments': 420, u'prompt_toolkit': 1000},
+                           [(u'import main', 2500), (u'connect', 150000)], 0.2)
+
+    assert report.splitlines()[1:] == [
+        u'Startup profile (ms)',
+        u'  Phases:',
+        u'    import main                            2.5',
+        u'    connect                              150.0',
+        u'    total, with interpreter startup      200.0',
+        u'  Imports by top-level package:',
+        u'    prompt_toolkit                         1.0',
+        u'    pygments                               0.4',
+        u'    all 2 packages                         1.4',
+    ]